@@ -19,10 +19,11 @@ class CommitRevealProtocol:
     - Privacy: Verifier learns the answer only after commitment is locked in
     """
     
-    def __init__(self):
+    def __init__(self, verbose=True):
         self.key = Fernet.generate_key()
         self.cipher = Fernet(self.key)
         self.commitments = {}
+        self.verbose = verbose  # False suppresses console output (batch mode)
     
     def commit(self, secret_number: int, player_id: str) -> str:
         """
@@ -59,10 +60,11 @@ class CommitRevealProtocol:
             'revealed': False
         }
         
-        print(f"\n✓ COMMITMENT CREATED")
-        print(f"  Player: {player_id}")
-        print(f"  Commitment Hash: {commitment_hash[:16]}...")
-        print(f"  (Your secret is now locked in encrypted form)")
+        if self.verbose:
+            print(f"\n✓ COMMITMENT CREATED")
+            print(f"  Player: {player_id}")
+            print(f"  Commitment Hash: {commitment_hash[:16]}...")
+            print(f"  (Your secret is now locked in encrypted form)")
         
         return commitment_hash
     
@@ -86,21 +88,35 @@ class CommitRevealProtocol:
             raise ValueError(f"Commitment for {player_id} already revealed")
         
         # Decrypt the commitment
-        encrypted_bytes = self.commitments[player_id]['encrypted'].encode()
-        decrypted = self.cipher.decrypt(encrypted_bytes).decode()
-        commitment_data = json.loads(decrypted)
+        commitment_data = self._decrypt(player_id)
         
         # Mark as revealed
         self.commitments[player_id]['revealed'] = True
         
-        print(f"\n✓ COMMITMENT REVEALED")
-        print(f"  Player: {player_id}")
-        print(f"  Secret Number: {commitment_data['number']}")
-        print(f"  Timestamp: {commitment_data['timestamp']}")
-        print(f"  (This proves the number was decided beforehand)")
+        if self.verbose:
+            print(f"\n✓ COMMITMENT REVEALED")
+            print(f"  Player: {player_id}")
+            print(f"  Secret Number: {commitment_data['number']}")
+            print(f"  Timestamp: {commitment_data['timestamp']}")
+            print(f"  (This proves the number was decided beforehand)")
         
         return commitment_data
     
+    def peek(self, player_id: str) -> dict:
+        """
+        Decrypt a commitment without revealing it, for the game's own use:
+        feedback on guesses needs the number while it is still secret.
+        Nothing returned here may reach the guesser.
+        """
+        if player_id not in self.commitments:
+            raise ValueError(f"No commitment found for {player_id}")
+        return self._decrypt(player_id)
+    
+    def _decrypt(self, player_id: str) -> dict:
+        encrypted_bytes = self.commitments[player_id]['encrypted'].encode()
+        decrypted = self.cipher.decrypt(encrypted_bytes).decode()
+        return json.loads(decrypted)
+    
     def verify_commitment(self, player_id: str, commitment_hash: str) -> bool:
         """
         Verify that a commitment hash matches stored data.
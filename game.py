@@ -5,6 +5,7 @@ Demonstrates privacy-preserving game mechanics using Arcium principles.
 
 from encryption import CommitRevealProtocol, PrivacyExplanation
 import random
+import secret_cache
 
 
 class GuessTheNumberGame:
@@ -17,19 +18,24 @@ class GuessTheNumberGame:
     3. Each guess gets feedback (hot/cold)
     4. After guesses, Player A reveals commitment
     5. Verify Player A was honest (commitment hash matches)
+    
+    The secret itself is never part of the game state: it stays inside
+    the encrypted commitment, and feedback reads it through a short-lived
+    cache of decrypted secrets (see secret_cache.py).
     """
     
-    def __init__(self, min_num=1, max_num=100, max_guesses=10):
+    def __init__(self, min_num=1, max_num=100, max_guesses=10, verbose=True, secrets=None):
         self.min_num = min_num
         self.max_num = max_num
         self.max_guesses = max_guesses
-        self.protocol = CommitRevealProtocol()
+        self.verbose = verbose  # False suppresses console output (batch mode)
+        self.protocol = CommitRevealProtocol(verbose=verbose)
+        self.secrets = secrets if secrets is not None else secret_cache.shared
         self.game_state = {
             'phase': 'setup',
             'committer': None,
             'guesser': None,
             'commitment_hash': None,
-            'secret_number': None,
             'guesses': [],
             'game_over': False,
             'winner': None
@@ -40,11 +46,12 @@ class GuessTheNumberGame:
         self.game_state['committer'] = committer_name
         self.game_state['guesser'] = guesser_name
         self.game_state['phase'] = 'commitment'
-        print(f"\n🎮 GAME SETUP")
-        print(f"  Committer (secret keeper): {committer_name}")
-        print(f"  Guesser: {guesser_name}")
-        print(f"  Range: {self.min_num}-{self.max_num}")
-        print(f"  Max Guesses: {self.max_guesses}")
+        if self.verbose:
+            print(f"\n🎮 GAME SETUP")
+            print(f"  Committer (secret keeper): {committer_name}")
+            print(f"  Guesser: {guesser_name}")
+            print(f"  Range: {self.min_num}-{self.max_num}")
+            print(f"  Max Guesses: {self.max_guesses}")
     
     def commit_number(self, secret_number: int) -> str:
         """
@@ -54,13 +61,33 @@ class GuessTheNumberGame:
         if not (self.min_num <= secret_number <= self.max_num):
             raise ValueError(f"Number must be between {self.min_num} and {self.max_num}")
         
-        self.game_state['secret_number'] = secret_number
-        
         # Show Arcium privacy concept
-        PrivacyExplanation.explain_commitment()
+        if self.verbose:
+            PrivacyExplanation.explain_commitment()
         
         # Create encrypted commitment
         commitment_hash = self.protocol.commit(secret_number, self.game_state['committer'])
+        # Cached now so the first guess doesn't decrypt what we just encrypted
+        self.secrets.put(commitment_hash, secret_number)
+        self.game_state['commitment_hash'] = commitment_hash
+        self.game_state['phase'] = 'guessing'
+        
+        return commitment_hash
+    
+    def adopt_commitment(self, protocol, secret_number: int, commitment_hash: str) -> str:
+        """
+        COMMITMENT PHASE (precomputed):
+        Use a commitment the committer made ahead of time, e.g. one taken
+        from a CommitmentPool, instead of encrypting now.
+        """
+        if not (self.min_num <= secret_number <= self.max_num):
+            raise ValueError(f"Number must be between {self.min_num} and {self.max_num}")
+        if not protocol.verify_commitment(self.game_state['committer'], commitment_hash):
+            raise ValueError("Commitment was not made by this game's committer")
+        
+        protocol.verbose = self.verbose
+        self.protocol = protocol
+        self.secrets.put(commitment_hash, secret_number)
         self.game_state['commitment_hash'] = commitment_hash
         self.game_state['phase'] = 'guessing'
         
@@ -81,7 +108,7 @@ class GuessTheNumberGame:
                 'message': f"Guess must be between {self.min_num} and {self.max_num}"
             }
         
-        secret = self.game_state['secret_number']
+        secret = self._secret()
         self.game_state['guesses'].append(guess)
         
         # Provide feedback (hot/cold)
@@ -106,15 +133,27 @@ class GuessTheNumberGame:
             'remaining': self.max_guesses - len(self.game_state['guesses'])
         }
         
-        print(f"\n📍 Guess #{len(self.game_state['guesses'])}: {guess}")
-        print(f"   {feedback}")
+        if self.verbose:
+            print(f"\n📍 Guess #{len(self.game_state['guesses'])}: {guess}")
+            print(f"   {feedback}")
         
         if len(self.game_state['guesses']) >= self.max_guesses:
             self.game_state['game_over'] = True
             self.game_state['phase'] = 'reveal'
+        if self.game_state['game_over']:
+            self.secrets.discard(self.game_state['commitment_hash'])
         
         return result
     
+    def _secret(self) -> int:
+        """The committed number: cached, or decrypted from the commitment on a miss."""
+        commitment_hash = self.game_state['commitment_hash']
+        secret = self.secrets.get(commitment_hash)
+        if secret is None:
+            secret = self.protocol.peek(self.game_state['committer'])['number']
+            self.secrets.put(commitment_hash, secret)
+        return secret
+    
     def reveal_and_verify(self) -> dict:
         """
         REVEAL PHASE:
@@ -128,7 +167,8 @@ class GuessTheNumberGame:
             }
         
         # Show privacy concept
-        PrivacyExplanation.explain_reveal()
+        if self.verbose:
+            PrivacyExplanation.explain_reveal()
         
         # Reveal the commitment
         revealed = self.protocol.reveal(self.game_state['committer'])
@@ -160,11 +200,12 @@ class GuessTheNumberGame:
             'timestamp': revealed['timestamp']
         }
         
-        print(f"\n" + "="*70)
-        print(f"GAME RESULT: {result_msg}")
-        print(f"="*70)
-        if is_valid:
-            print("✓ Commitment verified - player was honest!")
+        if self.verbose:
+            print(f"\n" + "="*70)
+            print(f"GAME RESULT: {result_msg}")
+            print(f"="*70)
+            if is_valid:
+                print("✓ Commitment verified - player was honest!")
         
         return result
     
@@ -1,11 +1,41 @@
 """
 Interactive CLI interface for Guess the Number with Encrypted Commit/Reveal.
 Full teaching demonstration of Arcium's privacy model.
+
+Headless batch mode plays scripted games without prompts:
+    python main.py --batch games.jsonl
+    cat games.jsonl | python main.py --batch -
+
+Each script line is a JSON object, e.g.
+    {"player1": "Alice", "player2": "Bob", "secret": 42, "guesses": [50, 25, 42]}
+with optional "min", "max" and "max_guesses". Without "secret" the
+committer picks one at random. Blank lines and lines starting with # are
+skipped.
+
+Networked play against tcp_server.py, from two terminals or two machines:
+    python main.py --connect 127.0.0.1:7878
 """
 
 from game import GuessTheNumberGame
-from encryption import PrivacyExplanation
-import os
+from encryption import CommitRevealProtocol, PrivacyExplanation
+from commitment_pool import CommitmentPool, random_secret
+import netproto as proto
+import argparse
+import json
+import sys
+import time
+
+# ANSI: clear screen, then move the cursor home
+CLEAR_SCREEN = "\033[2J\033[H"
+
+COMPUTER_PLAYER = "Computer"
+
+
+def computer_commitment():
+    """Pick the computer's secret and commit to it (quietly, off the game path)."""
+    secret = random_secret(1, 100)
+    protocol = CommitRevealProtocol(verbose=False)
+    return protocol, secret, protocol.commit(secret, COMPUTER_PLAYER)
 
 
 class GameInterface:
@@ -13,10 +43,13 @@ class GameInterface:
     
     def __init__(self):
         self.game = None
+        # Filled in the background while the menu is up
+        self.computer_commitments = CommitmentPool(computer_commitment, capacity=4,
+                                                   low_watermark=1).start()
     
     def clear_screen(self):
-        """Clear terminal screen."""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        """Clear terminal screen (ANSI escape, no subprocess)."""
+        print(CLEAR_SCREEN, end="", flush=True)
     
     def print_header(self, title):
         """Print formatted header."""
@@ -146,11 +179,16 @@ This same pattern is used in Arcium for:
         print("The computer's number is encrypted until the end")
         
         self.game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
+        self.game.setup_game(COMPUTER_PLAYER, "You")
         
-        # Computer commits to random number
-        secret = __import__('random').randint(1, 100)
-        commitment_hash = self.game.commit_number(secret)
-        self.game.setup_game("Computer", "You")
+        # Computer commits to a random number, ready-made when the pool has one
+        item = self.computer_commitments.take()
+        if item is not None:
+            protocol, secret, commitment_hash = item
+            PrivacyExplanation.explain_commitment()
+            self.game.adopt_commitment(protocol, secret, commitment_hash)
+        else:
+            commitment_hash = self.game.commit_number(random_secret(1, 100))
         
         input("\n[Press Enter to start guessing...]")
         
@@ -248,8 +286,196 @@ This same pattern is used in Arcium for:
                 input("Press Enter...")
 
 
+def play_script(script: dict, verbose: bool = False) -> dict:
+    """Play one scripted game through GuessTheNumberGame and return its reveal result."""
+    min_num = script.get('min', 1)
+    max_num = script.get('max', 100)
+    game = GuessTheNumberGame(min_num=min_num, max_num=max_num,
+                              max_guesses=script.get('max_guesses', 10), verbose=verbose)
+    game.setup_game(script.get('player1', 'Player 1'), script.get('player2', 'Player 2'))
+    
+    secret = script.get('secret')
+    if secret is None:
+        secret = random_secret(min_num, max_num)
+    game.commit_number(secret)
+    
+    for guess in script.get('guesses', []):
+        if game.game_state['game_over']:
+            break
+        game.make_guess(guess)
+    
+    if not game.game_state['game_over']:
+        return {'success': False, 'message': 'Script ran out of guesses before the game ended'}
+    return game.reveal_and_verify()
+
+
+def run_batch(lines, verbose: bool = False, out=sys.stdout) -> dict:
+    """Play every script in `lines` and print a summary with games/sec."""
+    totals = {'games': 0, 'found': 0, 'not_found': 0, 'unfinished': 0, 'errors': 0}
+    started = time.perf_counter()
+    
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            result = play_script(json.loads(line), verbose=verbose)
+        except (ValueError, TypeError, AttributeError) as e:
+            totals['errors'] += 1
+            print(f"❌ line {line_number}: {e}", file=sys.stderr)
+            continue
+        
+        totals['games'] += 1
+        if not result['success']:
+            totals['unfinished'] += 1
+        elif result['game_winner']:
+            totals['found'] += 1
+        else:
+            totals['not_found'] += 1
+    
+    elapsed = time.perf_counter() - started
+    totals['elapsed'] = elapsed
+    totals['games_per_sec'] = totals['games'] / elapsed if elapsed else 0.0
+    
+    print(f"\n📊 BATCH SUMMARY", file=out)
+    print(f"  Games played: {totals['games']} in {elapsed:.2f}s "
+          f"({totals['games_per_sec']:.1f} games/sec)", file=out)
+    print(f"  Found: {totals['found']}  Not found: {totals['not_found']}  "
+          f"Unfinished: {totals['unfinished']}  Errors: {totals['errors']}", file=out)
+    return totals
+
+
+def _read_int(prompt: str, low: int, high: int) -> int:
+    while True:
+        try:
+            value = int(input(prompt))
+            if low <= value <= high:
+                return value
+            print(f"❌ Number must be between {low} and {high}")
+        except ValueError:
+            print("❌ Please enter a valid number")
+
+
+def _show_network_message(msg_type: int, fields: dict, role: int):
+    """Print a server message the way the local game would."""
+    if msg_type == proto.OPPONENT:
+        print(f"\n👋 {fields['player']} joined your game")
+    elif msg_type == proto.COMMITTED:
+        print(f"\n🔒 Commitment Hash: {fields['commitment'].hex()[:32]}...")
+    elif msg_type == proto.GUESSED:
+        who = "Your opponent guessed" if role == proto.ROLE_COMMITTER else "Guess"
+        print(f"\n📍 {who} #{fields['attempt']}: {fields['guess']}")
+        print(f"   {proto.FEEDBACK[fields['feedback']]}  ({fields['remaining']} left)")
+    elif msg_type == proto.REVEALED:
+        print("\n" + "="*70)
+        if fields['found']:
+            print(f"GAME RESULT: ✓ FOUND in {fields['guesses_made']} guesses! "
+                  f"Winner: {fields['winner']}")
+        else:
+            print(f"GAME RESULT: ✗ Not found in {fields['guesses_made']} guesses. "
+                  f"Secret was {fields['secret']}")
+        print("="*70)
+        if fields['commitment_valid']:
+            print("✓ Commitment verified - player was honest!")
+    elif msg_type == proto.ERROR:
+        print(f"❌ {fields['message']}")
+
+
+def network_play(host: str, port: int):
+    """Play one game against tcp_server.py: vs the computer, hosting, or joining."""
+    client = proto.GameClient(host, port)
+    try:
+        name = input("Your name: ").strip() or "Player"
+        print("\n1. Play against the computer")
+        print("2. Host a two-player game (you commit the secret)")
+        print("3. Join a two-player game (you guess)")
+        choice = input("\nEnter choice (1-3): ").strip()
+        if choice == '1':
+            client.send(proto.CREATE, mode=proto.MODE_SINGLE, min=1, max=100, max_guesses=10,
+                        player1=name, player2=COMPUTER_PLAYER)
+        elif choice == '2':
+            invited = input("Opponent's name (blank: anyone with the game ID): ").strip()
+            client.send(proto.CREATE, mode=proto.MODE_TWO, min=1, max=100, max_guesses=10,
+                        player1=name, player2=invited)
+        elif choice == '3':
+            game_id = _read_int("Game ID: ", 1, 0xFFFFFFFFFFFFFFFF)
+            client.send(proto.JOIN, game_id=game_id, player=name)
+        else:
+            print("❌ Invalid choice.")
+            return
+        
+        msg_type, game = client.receive()
+        if msg_type == proto.ERROR:
+            _show_network_message(msg_type, game, None)
+            return
+        role = game['role']
+        print(f"\n🎮 Game {game['game_id']}: range {game['min']}-{game['max']}, "
+              f"{game['max_guesses']} guesses")
+        if msg_type == proto.JOINED:
+            print(f"  Committer (secret keeper): {game['opponent']}")
+        elif role == proto.ROLE_COMMITTER:
+            print(f"  Tell your opponent to join game {game['game_id']}")
+            secret = _read_int(f"Enter your secret number ({game['min']}-{game['max']}): ",
+                               game['min'], game['max'])
+            client.send(proto.COMMIT, secret=secret)
+        if game['commitment']:
+            _show_network_message(proto.COMMITTED, game, role)
+        
+        # The committer watches; the guesser guesses once the secret is committed
+        committed = bool(game['commitment'])
+        while True:
+            if role == proto.ROLE_GUESSER and committed:
+                client.send(proto.GUESS, guess=_read_int(
+                    f"\nEnter your guess ({game['min']}-{game['max']}): ", game['min'], game['max']))
+            msg_type, fields = client.receive()
+            _show_network_message(msg_type, fields, role)
+            if msg_type == proto.COMMITTED:
+                committed = True
+            elif msg_type == proto.GUESSED and fields['game_over']:
+                # The committer reveals; against the computer, the guesser asks for it
+                if role == proto.ROLE_COMMITTER or choice == '1':
+                    client.send(proto.REVEAL)
+                committed = False   # no more guesses; wait for the reveal
+            elif msg_type == proto.REVEALED or \
+                    (msg_type == proto.ERROR and fields['code'] == proto.E_OPPONENT_LEFT):
+                return
+    except ConnectionError as e:
+        print(f"❌ {e}")
+    finally:
+        client.close()
+
+
+def _address(value: str):
+    host, _, port = value.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got {value!r}")
+
+
 def main():
     """Entry point."""
+    parser = argparse.ArgumentParser(description="Guess the Number with Encrypted Commit/Reveal")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="play scripted games from FILE ('-' for stdin) without prompts")
+    parser.add_argument('--verbose', action='store_true',
+                        help="in batch mode, print the full game narration")
+    parser.add_argument('--connect', metavar='HOST:PORT', type=_address,
+                        help="play over the network against tcp_server.py")
+    args = parser.parse_args()
+    
+    if args.connect:
+        network_play(*args.connect)
+        return
+    
+    if args.batch:
+        if args.batch == '-':
+            totals = run_batch(sys.stdin, verbose=args.verbose)
+        else:
+            with open(args.batch, encoding='utf-8') as f:
+                totals = run_batch(f, verbose=args.verbose)
+        sys.exit(1 if totals['errors'] else 0)
+    
     interface = GameInterface()
     interface.run()
 
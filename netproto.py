@@ -0,0 +1,210 @@
+"""
+Compact binary protocol for networked play (tcp_server.py, main.py --connect).
+
+Every message is a frame: a 3-byte header (payload length as an unsigned
+16-bit big-endian integer, then the message type) followed by the payload.
+A payload is a fixed run of big-endian integers. Strings and byte strings
+come at the end, each prefixed with its length in one byte. A guess and its
+answer are 7 and 13 bytes on the wire.
+
+One TCP connection is one player. It can be in one game at a time. Game
+IDs are random 64-bit numbers, so a two-player game can only be joined by
+someone its host told the ID to.
+
+Client to server:
+    CREATE   mode, min, max, max_guesses, player1, player2   (player2: who may join, or '')
+    JOIN     game_id, player              (the guesser joins a two-player game)
+    COMMIT   secret                       (committer only)
+    GUESS    guess                        (guesser only)
+    REVEAL                                (committer; the guesser against the computer)
+
+Server to client:
+    CREATED    game_id, role, min, max, max_guesses, commitment
+    JOINED     game_id, role, min, max, max_guesses, opponent, commitment
+    OPPONENT   player                     (someone joined your game)
+    COMMITTED  commitment                 (to both players)
+    GUESSED    guess, feedback, attempt, remaining, game_over   (to both)
+    REVEALED   secret, commitment_valid, found, guesses_made, winner (to both)
+    ERROR      code, message
+"""
+
+import socket
+import struct
+
+
+# Message types
+CREATE = 0x01
+JOIN = 0x02
+COMMIT = 0x03
+GUESS = 0x04
+REVEAL = 0x05
+CREATED = 0x81
+JOINED = 0x82
+OPPONENT = 0x83
+COMMITTED = 0x84
+GUESSED = 0x85
+REVEALED = 0x86
+ERROR = 0xFF
+
+# CREATE modes and player roles
+MODE_SINGLE = 0
+MODE_TWO = 1
+ROLE_COMMITTER = 0
+ROLE_GUESSER = 1
+
+# ERROR codes
+E_BAD_REQUEST = 1
+E_NOT_FOUND = 2
+E_NOT_ALLOWED = 3
+E_INVALID = 4
+E_GAME_FULL = 5
+E_OPPONENT_LEFT = 6
+
+# GuessTheNumberGame feedback, sent as its index
+FEEDBACK = ("🎯 CORRECT!", "🔥 Very close!", "🌡️ Getting warmer", "🧊 Getting colder", "❄️ Very cold")
+FEEDBACK_CODES = {text: code for code, text in enumerate(FEEDBACK)}
+
+HEADER = struct.Struct('!HB')
+MAX_PAYLOAD = 0xFFFF
+MAX_STRING = 0xFF
+
+
+class ProtocolError(ValueError):
+    """A frame that can't be encoded or decoded."""
+
+
+class _Spec:
+    """Layout of one message type: fixed integers, then length-prefixed tails."""
+
+    __slots__ = ('name', 'fixed', 'fields', 'tail')
+
+    def __init__(self, name: str, fmt: str = '', fields: tuple = (), tail: tuple = ()):
+        self.name = name
+        self.fixed = struct.Struct('!' + fmt)
+        self.fields = fields
+        self.tail = tail        # (field, 's' for str or 'b' for bytes)
+
+
+_SPECS = {
+    CREATE: _Spec('CREATE', 'BiiH', ('mode', 'min', 'max', 'max_guesses'),
+                  (('player1', 's'), ('player2', 's'))),
+    JOIN: _Spec('JOIN', 'Q', ('game_id',), (('player', 's'),)),
+    COMMIT: _Spec('COMMIT', 'i', ('secret',)),
+    GUESS: _Spec('GUESS', 'i', ('guess',)),
+    REVEAL: _Spec('REVEAL'),
+    CREATED: _Spec('CREATED', 'QBiiH', ('game_id', 'role', 'min', 'max', 'max_guesses'),
+                   (('commitment', 'b'),)),
+    JOINED: _Spec('JOINED', 'QBiiH', ('game_id', 'role', 'min', 'max', 'max_guesses'),
+                  (('opponent', 's'), ('commitment', 'b'))),
+    OPPONENT: _Spec('OPPONENT', '', (), (('player', 's'),)),
+    COMMITTED: _Spec('COMMITTED', '', (), (('commitment', 'b'),)),
+    GUESSED: _Spec('GUESSED', 'iBHHB', ('guess', 'feedback', 'attempt', 'remaining', 'game_over')),
+    REVEALED: _Spec('REVEALED', 'iBBH', ('secret', 'commitment_valid', 'found', 'guesses_made'),
+                    (('winner', 's'),)),
+    ERROR: _Spec('ERROR', 'B', ('code',), (('message', 's'),)),
+}
+
+
+def message_name(msg_type: int) -> str:
+    spec = _SPECS.get(msg_type)
+    return spec.name if spec is not None else f'0x{msg_type:02x}'
+
+
+def encode(msg_type: int, **values) -> bytes:
+    """One complete frame."""
+    spec = _SPECS.get(msg_type)
+    if spec is None:
+        raise ProtocolError(f"Unknown message type 0x{msg_type:02x}")
+    try:
+        parts = [spec.fixed.pack(*[values[field] for field in spec.fields])]
+    except (KeyError, struct.error) as e:
+        raise ProtocolError(f"Bad {spec.name} fields: {e}") from None
+    for field, kind in spec.tail:
+        value = values.get(field)
+        data = (value or '').encode('utf-8') if kind == 's' else bytes(value or b'')
+        if len(data) > MAX_STRING:
+            raise ProtocolError(f"{spec.name}.{field} is longer than {MAX_STRING} bytes")
+        parts.append(bytes((len(data),)))
+        parts.append(data)
+    payload = b''.join(parts)
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"{spec.name} payload is too large")
+    return HEADER.pack(len(payload), msg_type) + payload
+
+
+def decode(msg_type: int, payload) -> dict:
+    """Fields of one payload (bytes or memoryview)."""
+    spec = _SPECS.get(msg_type)
+    if spec is None:
+        raise ProtocolError(f"Unknown message type 0x{msg_type:02x}")
+    try:
+        values = dict(zip(spec.fields, spec.fixed.unpack_from(payload)))
+    except struct.error:
+        raise ProtocolError(f"Truncated {spec.name}") from None
+    pos = spec.fixed.size
+    for field, kind in spec.tail:
+        if pos >= len(payload):
+            raise ProtocolError(f"Truncated {spec.name}")
+        end = pos + 1 + payload[pos]
+        if end > len(payload):
+            raise ProtocolError(f"Truncated {spec.name}")
+        data = bytes(payload[pos + 1:end])
+        if kind == 's':
+            try:
+                values[field] = data.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ProtocolError(f"{spec.name}.{field} is not UTF-8") from None
+        else:
+            values[field] = data
+        pos = end
+    return values
+
+
+class FrameReader:
+    """Reassembles frames from a byte stream."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """Add received bytes; returns the complete (msg_type, fields) messages."""
+        buffer = self._buffer
+        buffer.extend(data)
+        messages = []
+        pos = 0
+        with memoryview(buffer) as view:
+            while len(buffer) - pos >= HEADER.size:
+                length, msg_type = HEADER.unpack_from(buffer, pos)
+                start = pos + HEADER.size
+                if len(buffer) - start < length:
+                    break
+                messages.append((msg_type, decode(msg_type, view[start:start + length])))
+                pos = start + length
+        if pos:
+            del buffer[:pos]
+        return messages
+
+
+class GameClient:
+    """Blocking client for main.py: send a message, read messages back."""
+
+    def __init__(self, host: str, port: int, timeout: float = None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = FrameReader()
+        self._pending = []
+
+    def send(self, msg_type: int, **values):
+        self.sock.sendall(encode(msg_type, **values))
+
+    def receive(self):
+        """Next (msg_type, fields) from the server; ConnectionError if it hung up."""
+        while not self._pending:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            self._pending.extend(self._reader.feed(data))
+        return self._pending.pop(0)
+
+    def close(self):
+        self.sock.close()
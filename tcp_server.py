@@ -0,0 +1,315 @@
+"""
+asyncio TCP server for networked Guess the Number (protocol: netproto.py).
+
+Games are plain GuessTheNumberGame objects held in memory, one event loop
+serves every connection, and each session is a lightweight asyncio.Protocol
+rather than a coroutine, so one process can hold tens of thousands of
+players. Guesses are answered straight from data_received(). When a
+client stops reading and its transport's write buffer fills up, the session
+stops reading from that client too, so it can't queue unbounded replies.
+The only slow step is a human player's commit, which encrypts in the loop (tens of
+microseconds); the computer's commitments come ready-made from a
+CommitmentPool.
+
+    python tcp_server.py --port 7878
+    python main.py --connect 127.0.0.1:7878
+"""
+
+import argparse
+import asyncio
+import secrets
+import socket
+
+import netproto as proto
+from commitment_pool import CommitmentPool, random_secret
+from game import GuessTheNumberGame
+from main import COMPUTER_PLAYER, computer_commitment
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7878
+COMPUTER_RANGE = (1, 100)
+MAX_GUESSES_LIMIT = 1000
+
+
+class Room:
+    """One game and the sessions playing it (None for the computer or an open seat)."""
+
+    __slots__ = ('game_id', 'game', 'mode', 'committer', 'guesser', 'invited')
+
+    def __init__(self, game_id: int, game: GuessTheNumberGame, mode: int, invited: str = ''):
+        self.game_id = game_id
+        self.game = game
+        self.mode = mode
+        self.committer = None
+        self.guesser = None
+        self.invited = invited      # the only player name that may join, if set
+
+    def players(self):
+        return [session for session in (self.committer, self.guesser) if session is not None]
+
+    def commitment(self) -> bytes:
+        commitment_hash = self.game.game_state['commitment_hash']
+        return bytes.fromhex(commitment_hash) if commitment_hash else b''
+
+
+class GameServer:
+    """Rooms by game ID, plus the computer's commitment pool."""
+
+    def __init__(self, pool_size: int = 256):
+        self.rooms = {}
+        self.sessions = 0
+        self.games_started = 0
+        self.games_finished = 0
+        self.computer_commitments = CommitmentPool(
+            computer_commitment, capacity=pool_size, low_watermark=pool_size // 4,
+            name='tcp-commitment-pool')
+
+    def stats(self) -> dict:
+        return {
+            'sessions': self.sessions,
+            'rooms': len(self.rooms),
+            'games_started': self.games_started,
+            'games_finished': self.games_finished,
+            'commitment_pool': self.computer_commitments.stats()
+        }
+
+    def _new_game_id(self) -> int:
+        """A random, unused 64-bit ID, so open games can't be found by counting."""
+        while True:
+            game_id = secrets.randbits(64)
+            if game_id and game_id not in self.rooms:
+                return game_id
+
+    # -- message handlers: each returns nothing and answers through sessions --
+
+    def create(self, session, fields):
+        if session.room is not None:
+            return session.error(proto.E_NOT_ALLOWED, "Already in a game")
+        mode = fields['mode']
+        min_num, max_num, max_guesses = fields['min'], fields['max'], fields['max_guesses']
+        if mode not in (proto.MODE_SINGLE, proto.MODE_TWO):
+            return session.error(proto.E_BAD_REQUEST, "Unknown mode")
+        if min_num >= max_num or not 1 <= max_guesses <= MAX_GUESSES_LIMIT:
+            return session.error(proto.E_INVALID, "Invalid range or guess limit")
+
+        room = Room(self._new_game_id(), GuessTheNumberGame(
+            min_num=min_num, max_num=max_num, max_guesses=max_guesses, verbose=False), mode)
+        if mode == proto.MODE_SINGLE:
+            room.game.setup_game(COMPUTER_PLAYER, fields['player1'] or 'You')
+            room.guesser = session
+            role = proto.ROLE_GUESSER
+            self._commit_for_computer(room.game)
+        else:
+            room.game.setup_game(fields['player1'] or 'Player 1', fields['player2'] or '')
+            room.invited = fields['player2']
+            room.committer = session
+            role = proto.ROLE_COMMITTER
+        self.rooms[room.game_id] = room
+        session.room = room
+        self.games_started += 1
+        session.send(proto.CREATED, game_id=room.game_id, role=role, min=min_num, max=max_num,
+                     max_guesses=max_guesses, commitment=room.commitment())
+
+    def _commit_for_computer(self, game):
+        item = None
+        if (game.min_num, game.max_num) == COMPUTER_RANGE:
+            item = self.computer_commitments.take()
+        if item is not None:
+            protocol, secret, commitment_hash = item
+            game.adopt_commitment(protocol, secret, commitment_hash)
+        else:
+            game.commit_number(random_secret(game.min_num, game.max_num))
+
+    def join(self, session, fields):
+        if session.room is not None:
+            return session.error(proto.E_NOT_ALLOWED, "Already in a game")
+        room = self.rooms.get(fields['game_id'])
+        if room is None or room.mode != proto.MODE_TWO:
+            return session.error(proto.E_NOT_FOUND, "Game not found")
+        if room.guesser is not None:
+            return session.error(proto.E_GAME_FULL, "Game already has a guesser")
+        if room.invited and fields['player'] != room.invited:
+            return session.error(proto.E_NOT_ALLOWED, "This game is reserved for another player")
+        state = room.game.game_state
+        state['guesser'] = fields['player'] or state['guesser'] or 'Player 2'
+        room.guesser = session
+        session.room = room
+        game = room.game
+        session.send(proto.JOINED, game_id=room.game_id, role=proto.ROLE_GUESSER,
+                     min=game.min_num, max=game.max_num, max_guesses=game.max_guesses,
+                     opponent=state['committer'], commitment=room.commitment())
+        room.committer.send(proto.OPPONENT, player=state['guesser'])
+
+    def commit(self, session, fields):
+        room = session.room
+        if room is None or room.committer is not session:
+            return session.error(proto.E_NOT_ALLOWED, "Only the committer can commit")
+        game = room.game
+        if game.game_state['phase'] != 'commitment':
+            return session.error(proto.E_NOT_ALLOWED, "Secret already committed")
+        try:
+            game.commit_number(fields['secret'])
+        except ValueError as e:
+            return session.error(proto.E_INVALID, str(e))
+        frame = proto.encode(proto.COMMITTED, commitment=room.commitment())
+        for player in room.players():
+            player.write(frame)
+
+    def guess(self, session, fields):
+        room = session.room
+        if room is None or room.guesser is not session:
+            return session.error(proto.E_NOT_ALLOWED, "Only the guesser can guess")
+        game = room.game
+        if game.game_state['phase'] != 'guessing' or game.game_state['game_over']:
+            return session.error(proto.E_NOT_ALLOWED, "Not accepting guesses")
+        result = game.make_guess(fields['guess'])
+        if not result['valid']:
+            return session.error(proto.E_INVALID, result['message'])
+        frame = proto.encode(
+            proto.GUESSED, guess=result['guess'], feedback=proto.FEEDBACK_CODES[result['feedback']],
+            attempt=result['attempt'], remaining=result['remaining'],
+            game_over=int(game.game_state['game_over']))
+        for player in room.players():
+            player.write(frame)
+
+    def reveal(self, session, fields):
+        room = session.room
+        if room is None:
+            return session.error(proto.E_NOT_FOUND, "Not in a game")
+        # The committer reveals; against the computer, the guesser asks for it
+        revealer = room.committer if room.mode == proto.MODE_TWO else room.guesser
+        if revealer is not session:
+            return session.error(proto.E_NOT_ALLOWED, "Only the committer can reveal")
+        result = room.game.reveal_and_verify()
+        if not result['success']:
+            return session.error(proto.E_NOT_ALLOWED, result['message'])
+        state = room.game.game_state
+        frame = proto.encode(
+            proto.REVEALED, secret=result['secret_number'],
+            commitment_valid=int(result['commitment_valid']),
+            found=int(result['secret_number'] in state['guesses']),
+            guesses_made=result['guesses_made'], winner=result['game_winner'] or '')
+        players = room.players()
+        self.close_room(room)
+        self.games_finished += 1
+        for player in players:
+            player.write(frame)
+
+    def close_room(self, room):
+        self.rooms.pop(room.game_id, None)
+        for player in room.players():
+            player.room = None
+
+    def leave(self, session):
+        """A player disconnected: end their game and tell the other player."""
+        room = session.room
+        if room is None:
+            return
+        self.close_room(room)
+        for player in room.players():
+            if player is not session:
+                player.error(proto.E_OPPONENT_LEFT, "Your opponent left the game")
+
+
+class GameSession(asyncio.Protocol):
+    """One connected player."""
+
+    def __init__(self, server: GameServer):
+        self.server = server
+        self.room = None
+        self.transport = None
+        self._reader = proto.FrameReader()
+        self._handlers = {
+            proto.CREATE: server.create,
+            proto.JOIN: server.join,
+            proto.COMMIT: server.commit,
+            proto.GUESS: server.guess,
+            proto.REVEAL: server.reveal,
+        }
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.sessions += 1
+
+    def connection_lost(self, exc):
+        self.server.sessions -= 1
+        self.server.leave(self)
+
+    def pause_writing(self):
+        # The client isn't keeping up with our replies; stop reading its requests
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        if not self.transport.is_closing():
+            self.transport.resume_reading()
+
+    def data_received(self, data):
+        try:
+            messages = self._reader.feed(data)
+        except proto.ProtocolError as e:
+            self.error(proto.E_BAD_REQUEST, str(e))
+            self.transport.close()
+            return
+        for msg_type, fields in messages:
+            handler = self._handlers.get(msg_type)
+            if handler is None:
+                self.error(proto.E_BAD_REQUEST, f"Unexpected {proto.message_name(msg_type)}")
+                continue
+            handler(self, fields)
+
+    def write(self, frame: bytes):
+        if not self.transport.is_closing():
+            self.transport.write(frame)
+
+    def send(self, msg_type: int, **values):
+        self.write(proto.encode(msg_type, **values))
+
+    def error(self, code: int, message: str):
+        self.send(proto.ERROR, code=code, message=message[:proto.MAX_STRING])
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, server: GameServer = None,
+                backlog: int = 4096):
+    """Run the game server until cancelled."""
+    server = server or GameServer()
+    server.computer_commitments.start()
+    loop = asyncio.get_running_loop()
+    listener = await loop.create_server(lambda: GameSession(server), host, port, backlog=backlog)
+    async with listener:
+        await listener.serve_forever()
+
+
+def _raise_open_file_limit():
+    """Each session is a socket; allow as many as the hard limit permits."""
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guess the Number TCP game server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pool-size', type=int, default=256,
+                        help="ready-made computer commitments to keep")
+    args = parser.parse_args()
+
+    _raise_open_file_limit()
+    server = GameServer(pool_size=args.pool_size)
+    print(f"🎮 Guess the Number TCP server on {args.host}:{args.port}")
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
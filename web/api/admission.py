@@ -0,0 +1,118 @@
+"""
+Admission control for the game API.
+
+Per-client token buckets, a global concurrency limit and a per-client cap
+on active games. All bookkeeping is O(1) per request and client state is
+held in a bounded LRU, so a flood of distinct clients cannot grow memory.
+A client pushed out of the LRU while it still has active games is kept
+aside until they end, so eviction never resets its game count.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+# A client is an address, and a NAT can put a whole office behind one, so
+# these only stop floods: a game is about 15 requests, and a burst of 200
+# covers a dozen played back to back.
+DEFAULT_RATE = 50.0             # sustained requests per second per client
+DEFAULT_BURST = 200             # bucket size
+DEFAULT_MAX_CONCURRENT = 64     # requests in flight across all clients
+DEFAULT_MAX_GAMES = 20          # active games per client
+DEFAULT_MAX_CLIENTS = 100000    # clients tracked before the LRU evicts
+
+
+class _ClientState:
+    __slots__ = ('tokens', 'updated', 'active_games')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.active_games = 0
+
+
+class AdmissionController:
+    """Decides whether a request may proceed, and if not, when to retry."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 max_games_per_client: int = DEFAULT_MAX_GAMES,
+                 max_clients: int = DEFAULT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_games_per_client = max_games_per_client
+        self.max_clients = max_clients
+        self.in_flight = 0
+        self.rejected = {'rate': 0, 'concurrency': 0, 'games': 0}
+        self._clients = OrderedDict()
+        self._playing = {}      # evicted from the LRU, games still active
+        self._lock = threading.Lock()
+
+    def _client(self, client_id: str, now: float) -> _ClientState:
+        """Fetch or create a client's state, refreshing its LRU position (lock held)."""
+        state = self._clients.get(client_id)
+        if state is not None:
+            self._clients.move_to_end(client_id)
+            return state
+        state = self._playing.pop(client_id, None)
+        if state is None:
+            state = _ClientState(self.burst, now)
+        self._clients[client_id] = state
+        if len(self._clients) > self.max_clients:
+            evicted_id, evicted = self._clients.popitem(last=False)
+            if evicted.active_games > 0:
+                self._playing[evicted_id] = evicted
+        return state
+
+    def admit(self, client_id: str):
+        """
+        Take a token and a concurrency slot for one request.
+
+        Returns None when admitted (the caller must later call finish()),
+        or the number of seconds the client should wait before retrying.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._client(client_id, now)
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+            state.updated = now
+            if state.tokens < 1:
+                self.rejected['rate'] += 1
+                return (1 - state.tokens) / self.rate
+            if self.in_flight >= self.max_concurrent:
+                self.rejected['concurrency'] += 1
+                return 1.0
+            state.tokens -= 1
+            self.in_flight += 1
+        return None
+
+    def finish(self):
+        """Release the concurrency slot taken by admit()."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def acquire_game(self, client_id: str) -> bool:
+        """Count a new active game for a client; False if it is at its cap."""
+        with self._lock:
+            state = self._client(client_id, time.monotonic())
+            if state.active_games >= self.max_games_per_client:
+                self.rejected['games'] += 1
+                return False
+            state.active_games += 1
+        return True
+
+    def release_game(self, client_id: str):
+        """Forget one of a client's active games."""
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None:
+                state = self._playing.get(client_id)
+            if state is not None and state.active_games > 0:
+                state.active_games -= 1
+                if not state.active_games:
+                    self._playing.pop(client_id, None)
+
+    def __len__(self):
+        return len(self._clients) + len(self._playing)
@@ -3,84 +3,652 @@ Flask API for Guess the Number game
 Handles all backend logic and crypto operations
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from encryption import CommitRevealProtocol
+from encryption import CommitRevealProtocol, set_timing_hook
 from game import GuessTheNumberGame
-import uuid
+from events import EventChannelRegistry, stream_events
+from broadcast import SpectatorRegistry
+from serialization import FastJSONProvider
+from metrics import registry as metrics, observe_crypto
+from idempotency import IdempotencyCache, IdempotencyConflict, IdempotencyPending
+from admission import (AdmissionController, DEFAULT_RATE, DEFAULT_BURST,
+                       DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_GAMES)
+from persistence import (GameHistoryWriter, build_record, open_reader, export_ndjson,
+                         iter_player_totals, load_totals, DEFAULT_DB_PATH)
+from leaderboard import GameAggregates, DEFAULT_MAX_PLAYERS
+from matchmaking import Matchmaker, DIFFICULTIES, MATCHED
+from commitment_pool import CommitmentPool, random_secret
+from validation import Field, Schema, max_body_limit, validate_body
+import ids
+import memory
+import secret_cache
+import serialization
+import atexit
+import functools
+import hmac
 import json
+import gzip
+import hashlib
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
+# Only behind a proxy is X-Forwarded-For believed: TRUSTED_PROXIES=N trusts the
+# last N hops, so remote_addr becomes the address the nearest proxy saw
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=0, x_host=0,
+                            x_port=0, x_prefix=0)
+
+if os.environ.get('PROFILE_DIR'):
+    import profiling
+    profiling.install_from_env(app)
+
 # Store active games in memory (in production, use database)
 active_games = {}
 
+# Game IDs by the client charged for them, to free a capped client's idle slots
+games_by_client = {}
+
+# Which shard this process is; new game IDs carry it so router.py can find the owner
+SHARD_ID = int(os.environ.get('SHARD_ID', '0'))
+if not 0 <= SHARD_ID <= ids.MAX_SHARD:
+    raise ValueError(f"SHARD_ID must be between 0 and {ids.MAX_SHARD}")
+
+# Push channels streaming each game's events to subscribed clients
+event_channels = EventChannelRegistry()
+
+# Fan-out hubs for games with live spectators
+spectator_hubs = SpectatorRegistry()
+
+# Games with no state change for this long are dropped as abandoned
+GAME_IDLE_TIMEOUT = 3600
+ABANDONED_SWEEP_INTERVAL = 60
+# A client at its game cap gives up its games idle this long to start a new one
+GAME_SLOT_IDLE_TIMEOUT = 600
+_last_abandoned_sweep = time.monotonic()
+
+# Cached responses for retried POSTs carrying an Idempotency-Key header
+idempotency_cache = IdempotencyCache()
+
+# Per-client rate limits and active-game caps; ADMISSION_CONTROL=off disables
+admission = None
+if os.environ.get('ADMISSION_CONTROL', 'on') != 'off':
+    admission = AdmissionController(
+        rate=float(os.environ.get('RATE_LIMIT_PER_SECOND', str(DEFAULT_RATE))),
+        burst=int(os.environ.get('RATE_LIMIT_BURST', str(DEFAULT_BURST))),
+        max_concurrent=int(os.environ.get('MAX_CONCURRENT_REQUESTS', str(DEFAULT_MAX_CONCURRENT))),
+        max_games_per_client=int(os.environ.get('MAX_GAMES_PER_CLIENT', str(DEFAULT_MAX_GAMES)))
+    )
+
+# Finished games are written behind to SQLite for analytics; GAME_HISTORY=off disables
+game_history = None
+if os.environ.get('GAME_HISTORY', 'on') != 'off':
+    game_history = GameHistoryWriter(os.environ.get('GAME_HISTORY_DB', DEFAULT_DB_PATH))
+
+# /api/history/export is only served when this is set, and requires it as X-Export-Token
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN') or None
+
+# /api/debug/memory is only served when this is set, and requires it as X-Debug-Token
+DEBUG_TOKEN = os.environ.get('DEBUG_TOKEN') or None
+
+# Sanitized copy of live traffic for replay.py; TRAFFIC_LOG=<file> enables
+traffic_recorder = None
+if os.environ.get('TRAFFIC_LOG'):
+    import traffic
+    traffic_recorder = traffic.TrafficRecorder(os.environ['TRAFFIC_LOG'])
+
+# Revealed commitments kept on disk for fairness audits; COMMITMENT_ARCHIVE=<directory> enables.
+# Each shard writes its own subdirectory: an archive has one writing process.
+commitment_archive = None
+if os.environ.get('COMMITMENT_ARCHIVE'):
+    import archive
+    commitment_archive = archive.CommitmentArchive(
+        archive.shard_directory(os.environ['COMMITMENT_ARCHIVE'], SHARD_ID))
+
+# Warm restarts: SNAPSHOT_PATH=<file> saves active games to <file>.shard-<SHARD_ID> on
+# shutdown, and the next process of the same shard restores each one from it the
+# first time it is requested. Per shard, so workers neither overwrite each other's
+# games nor restore games that requests never reach them for.
+SNAPSHOT_PATH = f"{os.environ['SNAPSHOT_PATH']}.shard-{SHARD_ID}" \
+    if os.environ.get('SNAPSHOT_PATH') else None
+restored_snapshot = None
+if SNAPSHOT_PATH:
+    import snapshot
+    if os.path.exists(SNAPSHOT_PATH):
+        try:
+            restored_snapshot = snapshot.Snapshot(SNAPSHOT_PATH)
+        except (OSError, ValueError) as e:
+            print(f"warning: not restoring games: {e}", file=sys.stderr)
+        else:
+            # Still readable through the mapping. Gone from disk, so a crash
+            # before the next snapshot can't bring finished games back.
+            try:
+                os.unlink(SNAPSHOT_PATH)
+            except OSError:
+                pass
+_restore_lock = threading.Lock()
+
+# Leaderboard and global stats, folded in as each game is revealed
+aggregates = GameAggregates(
+    max_players=int(os.environ.get('LEADERBOARD_MAX_PLAYERS', DEFAULT_MAX_PLAYERS)))
+
+def _restore_aggregates():
+    """
+    Load this shard's totals, which the history writer keeps next to the
+    games: the overall counts and the leaderboard now, other players in
+    the background so startup doesn't wait on them.
+    """
+    conn = open_reader(game_history.path)
+    if conn is None:
+        return
+    try:
+        stored = load_totals(conn, SHARD_ID, aggregates.top_k)
+    except sqlite3.Error as e:
+        # e.g. a history store from before the totals tables; they appear on the next write
+        print(f"warning: leaderboard totals not restored: {e}", file=sys.stderr)
+        stored = None
+    finally:
+        conn.close()
+    if stored is not None:
+        aggregates.restore(*stored)
+        threading.Thread(target=_restore_players, name='leaderboard-restore', daemon=True).start()
+
+def _restore_players():
+    conn = open_reader(game_history.path)
+    try:
+        for page in iter_player_totals(conn, SHARD_ID, aggregates.max_players):
+            aggregates.restore_players(page)
+    except sqlite3.Error as e:
+        print(f"warning: player totals not restored: {e}", file=sys.stderr)
+    finally:
+        conn.close()
+
+if game_history is not None:
+    _restore_aggregates()
+
+# Ready-made commitments for the computer opponent in single-player games
+COMPUTER_PLAYER = 'Computer'
+COMPUTER_RANGE = (1, 100)
+
+def _computer_commitment():
+    secret = random_secret(*COMPUTER_RANGE)
+    protocol = CommitRevealProtocol()
+    return protocol, secret, protocol.commit(secret, COMPUTER_PLAYER)
+
+computer_commitments = CommitmentPool(
+    _computer_commitment,
+    capacity=int(os.environ.get('COMMITMENT_POOL_SIZE', '64')),
+    low_watermark=int(os.environ.get('COMMITMENT_POOL_LOW_WATERMARK', '16'))
+)
+
+# Decrypted secrets, held briefly so guesses don't decrypt every time
+secret_cache.shared.ttl = float(os.environ.get('SECRET_CACHE_TTL', secret_cache.DEFAULT_TTL))
+secret_cache.shared.capacity = int(os.environ.get('SECRET_CACHE_SIZE', secret_cache.DEFAULT_CAPACITY))
+
+# Largest number a lobby game may range up to
+LOBBY_MAX_NUMBER = 1000000
+
+# Request bodies, checked by validate_body before the handlers run
+CREATE_BODY = Schema(
+    Field('mode', str, default='single', choices=('single', 'two')),
+    Field('player1', str, default='Player 1'),
+    Field('player2', str, default=None)
+)
+LOBBY_BODY = Schema(
+    Field('player', str, default='Player', error='Invalid player name'),
+    Field('min', int, default=1, min=1, max=LOBBY_MAX_NUMBER, error='Invalid range',
+          dest='min_num'),
+    Field('max', int, default=100, min=1, max=LOBBY_MAX_NUMBER, error='Invalid range',
+          dest='max_num'),
+    Field('difficulty', str, default='normal', choices=DIFFICULTIES,
+          error=f"Difficulty must be one of: {', '.join(DIFFICULTIES)}")
+)
+COMMIT_BODY = Schema(Field('secret', int, error='Invalid number'))
+GUESS_BODY = Schema(Field('guess', int, error='Invalid guess'))
+# Never read more of a chunked body than the largest schema allows
+app.config['MAX_CONTENT_LENGTH'] = max_body_limit(CREATE_BODY, LOBBY_BODY, COMMIT_BODY, GUESS_BODY)
+
+# Routes that are never throttled (probes and scrapes)
+ADMISSION_EXEMPT = {'/api/health', '/api/metrics'}
+
+_REJECTED_BODY = b'{"error":"Too many requests","success":false}\n'
+
+metrics.gauge('active_games', 'Games currently held in memory', lambda: len(active_games))
+metrics.counter('admission_rejections_total', 'Requests rejected by admission control')
+metrics.counter('idempotent_replays_total', 'Retried requests answered from the idempotency cache')
+if traffic_recorder is not None:
+    metrics.gauge('traffic_log_dropped', 'Requests not recorded because the writer fell behind',
+                  lambda: traffic_recorder.dropped)
+if game_history is not None:
+    metrics.gauge('game_history_backlog', 'Finished games waiting to be written',
+                  lambda: game_history.backlog)
+    metrics.gauge('game_history_dropped', 'Finished games dropped because the writer fell behind',
+                  lambda: game_history.dropped)
+if SNAPSHOT_PATH:
+    metrics.gauge('snapshot_pending_games', 'Snapshotted games not requested since the restart',
+                  lambda: len(restored_snapshot) if restored_snapshot is not None else 0)
+    metrics.counter('games_restored_total', 'Games restored from the warm-restart snapshot')
+if commitment_archive is not None:
+    metrics.gauge('commitment_archive_records', 'Revealed commitments in the audit archive',
+                  lambda: len(commitment_archive))
+    metrics.gauge('commitment_archive_segments', 'Sealed segments in the audit archive',
+                  lambda: commitment_archive.stats()['segments'])
+    metrics.gauge('commitment_archive_dropped', 'Commitments not archived because the writer fell behind',
+                  lambda: commitment_archive.dropped)
+metrics.gauge('commitment_pool_size', 'Ready-made computer commitments',
+              lambda: len(computer_commitments))
+metrics.gauge('commitment_pool_misses', 'Single-player games that found the pool empty',
+              lambda: computer_commitments.misses)
+metrics.gauge('secret_cache_size', 'Decrypted secrets currently cached',
+              lambda: len(secret_cache.shared))
+metrics.gauge('secret_cache_misses', 'Guesses that had to decrypt their commitment',
+              lambda: secret_cache.shared.misses)
+set_timing_hook(observe_crypto)
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+def _client_id():
+    """The peer address (the nearest trusted proxy's view of it with TRUSTED_PROXIES)."""
+    return request.remote_addr or 'unknown'
+
+def _too_many_requests(retry_after):
+    """Cheap 429: a constant body, no JSON encoding."""
+    response = app.response_class(_REJECTED_BODY, status=429, mimetype='application/json')
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+@app.before_request
+def _admit_request():
+    if admission is None or request.method == 'OPTIONS' or request.path in ADMISSION_EXEMPT:
+        return None
+    retry_after = admission.admit(_client_id())
+    if retry_after is not None:
+        metrics.inc('admission_rejections_total')
+        return _too_many_requests(retry_after)
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def _finish_request(exc):
+    _release_admission()
+
+def _release_admission():
+    """Give back this request's concurrency slot early, e.g. before a long wait."""
+    if g.pop('admitted', False):
+        admission.finish()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (('route', route), ('method', request.method))
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, labels)
+        metrics.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+    return response
+
+if traffic_recorder is not None:
+    # Registered after the metrics hook, so it runs first and still sees the start time.
+    # Bodies come from validate_body; a body it couldn't read isn't recorded.
+    @app.after_request
+    def _record_traffic(response):
+        started = g.get('request_started')
+        if started is None or request.method == 'OPTIONS' \
+                or not traffic_recorder.wants(request.path, request.endpoint):
+            return response
+        elapsed = time.perf_counter() - started
+        parsed = None
+        if request.endpoint in traffic.RESPONSE_FIELDS and not response.is_streamed:
+            try:
+                parsed = serialization.loads(response.get_data())
+            except ValueError:
+                pass
+        traffic_recorder.record(
+            time.time() - elapsed, _client_id(), request.method, request.path,
+            request.query_string.decode('latin-1'), request.endpoint, response.status_code,
+            int(elapsed * 1e6), g.get('json_body'),
+            parsed if isinstance(parsed, dict) else None)
+        return response
+
+def idempotent(view):
+    """
+    Replay the stored response for a repeated Idempotency-Key.
+    
+    A retried request is answered from the cache without touching the game,
+    so retries never use up extra guesses or hit a deleted game. Keys are
+    scoped to the client, so one client can't replay another's response.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        
+        cache_key = (_client_id(), request.path, key)
+        try:
+            claim, cached = idempotency_cache.reserve(
+                cache_key, IdempotencyCache.fingerprint(request.get_data()))
+        except IdempotencyConflict:
+            return jsonify({
+                'success': False,
+                'error': 'Idempotency-Key was already used with a different request'
+            }), 422
+        except IdempotencyPending:
+            response = jsonify({
+                'success': False,
+                'error': 'A request with this Idempotency-Key is still in progress'
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        
+        if cached is not None:
+            metrics.inc('idempotent_replays_total')
+            status, body, headers = cached
+            response = app.response_class(body, status=status, headers=headers)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency_cache.release(claim)
+            raise
+        if response.status_code >= 500:
+            idempotency_cache.release(claim)
+        else:
+            idempotency_cache.complete(
+                claim, response.status_code, response.get_data(),
+                [('Content-Type', response.headers.get('Content-Type', 'application/json'))])
+        return response
+    return wrapper
+
+def _acquire_game_slot(client_id):
+    """Charge a new game to a client; at its cap, its long-idle games are dropped first."""
+    if admission is None or admission.acquire_game(client_id):
+        return True
+    cutoff = time.monotonic() - GAME_SLOT_IDLE_TIMEOUT
+    idle = [game_id for game_id in games_by_client.get(client_id, ())
+            if active_games[game_id]['last_active'] < cutoff]
+    for game_id in idle:
+        _remove_game(game_id, 'abandoned')
+    return bool(idle) and admission.acquire_game(client_id)
+
+def _release_game_slot(client_id):
+    if admission is not None:
+        admission.release_game(client_id)
+
+def _track_game(game_id, game_data):
+    active_games[game_id] = game_data
+    games_by_client.setdefault(game_data['client_id'], set()).add(game_id)
+
+def _remove_game(game_id, outcome):
+    """Drop a game from memory; outcome is 'finished' or 'abandoned'."""
+    game_data = active_games.pop(game_id, None)
+    if game_data is None:
+        return
+    event_channels.close(game_id)
+    client_games = games_by_client.get(game_data['client_id'])
+    if client_games is not None:
+        client_games.discard(game_id)
+        if not client_games:
+            del games_by_client[game_data['client_id']]
+    _release_game_slot(game_data['client_id'])
+    metrics.inc(f'games_{outcome}_total')
+
+def _get_game(game_id):
+    """An active game's data; a snapshotted game is restored on first use."""
+    game_data = active_games.get(game_id)
+    if game_data is None and restored_snapshot is not None:
+        with _restore_lock:
+            game_data = active_games.get(game_id)
+            if game_data is None and restored_snapshot is not None:
+                game_data = _restore_game(game_id)
+    return game_data
+
+def _restore_game(game_id):
+    """Called with _restore_lock held."""
+    global restored_snapshot
+    record = restored_snapshot.take(game_id)
+    if not len(restored_snapshot):
+        restored_snapshot.close()
+        restored_snapshot = None
+    if record is None:
+        return None
+    now = time.monotonic()
+    game_data = snapshot.decode_game(record, time.time(), now)
+    if game_data['last_active'] < now - GAME_IDLE_TIMEOUT:
+        return None
+    game = game_data['game']
+    # Event IDs carry on from where the old process left off
+    event_channels.open(game_id, game).base_offset = game.version
+    if admission is not None:
+        admission.acquire_game(game_data['client_id'])
+    _track_game(game_id, game_data)
+    metrics.inc('games_restored_total')
+    return game_data
+
+def _save_snapshot():
+    """Write every active game, and those never restored, to SNAPSHOT_PATH."""
+    with _restore_lock:
+        count = snapshot.save_games(SNAPSHOT_PATH, active_games, restored_snapshot,
+                                    max_idle=GAME_IDLE_TIMEOUT)
+    print(f"Saved {count} active games to {SNAPSHOT_PATH}", file=sys.stderr)
+
+if SNAPSHOT_PATH:
+    atexit.register(_save_snapshot)
+    # Servers that leave SIGTERM alone would die without running atexit hooks
+    if threading.current_thread() is threading.main_thread() \
+            and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+def _sweep_abandoned_games():
+    """Drop idle games, at most once per ABANDONED_SWEEP_INTERVAL."""
+    global _last_abandoned_sweep
+    now = time.monotonic()
+    if now - _last_abandoned_sweep < ABANDONED_SWEEP_INTERVAL:
+        return
+    _last_abandoned_sweep = now
+    cutoff = now - GAME_IDLE_TIMEOUT
+    for game_id, game_data in list(active_games.items()):
+        if game_data['last_active'] < cutoff:
+            _remove_game(game_id, 'abandoned')
+
+def _start_game(mode, player1, player2, client_id, min_num=1, max_num=100, max_guesses=10):
+    """Create, set up and register a game; returns its id. If setup fails, nothing is kept."""
+    game = GuessTheNumberGame(min_num=min_num, max_num=max_num, max_guesses=max_guesses)
+    
+    # Generate game ID
+    game_id = ids.new_id(SHARD_ID)
+    
+    # Open the push channel before setup so it sees every event
+    event_channels.open(game_id, game)
+    game_data = {
+        'game': game,
+        'mode': mode,
+        'player1': player1,
+        'player2': player2,
+        'created_at': __import__('datetime').datetime.now().isoformat(),
+        'last_active': time.monotonic(),
+        'client_id': client_id
+    }
+    try:
+        if mode == 'single':
+            # The computer (player2) keeps the secret; the player guesses.
+            # No commit step: the secret is locked in before anyone sees the game.
+            game.setup_game(player2, player1)
+            game_data['commitment_hash'] = _commit_for_computer(game)
+        else:
+            game.setup_game(player1, player2)
+    except BaseException:
+        event_channels.discard(game_id)
+        raise
+    
+    # Store game
+    _track_game(game_id, game_data)
+    metrics.inc('games_created_total')
+    return game_id
+
+def _commit_for_computer(game):
+    """Commit the computer's secret, from the pool when one fits."""
+    item = None
+    if game.game_state['committer'] == COMPUTER_PLAYER \
+            and (game.min_num, game.max_num) == COMPUTER_RANGE:
+        item = computer_commitments.take()
+    if item is not None:
+        protocol, secret, commitment_hash = item
+        return game.adopt_commitment(protocol, secret, commitment_hash)
+    return game.commit_number(random_secret(game.min_num, game.max_num), validated=True)
+
+def _start_lobby_game(waiter, joiner):
+    """Matchmaker callback: the waiting player commits, the joiner guesses."""
+    min_num, max_num, difficulty = waiter.bucket
+    return _start_game('two', waiter.player, joiner.player, waiter.client_id,
+                       min_num, max_num, DIFFICULTIES[difficulty])
+
+# Pairs strangers into two-player games. A waiting ticket holds its
+# client's game slot until it is matched, cancelled or expires.
+lobby = Matchmaker(_start_lobby_game,
+                   on_drop=lambda ticket: _release_game_slot(ticket.client_id))
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'Game API is running'}), 200
+    return jsonify({'status': 'ok', 'message': 'Game API is running', 'shard': SHARD_ID}), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/game/create', methods=['POST'])
-def create_game():
+@validate_body(CREATE_BODY)
+def create_game(mode, player1, player2):
     """Create a new game session"""
     try:
-        data = request.json
-        mode = data.get('mode', 'single')  # 'single' or 'two'
-        player1 = data.get('player1', 'Player 1')
-        player2 = data.get('player2', 'Computer' if mode == 'single' else 'Player 2')
+        _sweep_abandoned_games()
         
-        # Create game instance
-        game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
-        game.setup_game(player1, player2)
+        if player2 is None:
+            player2 = 'Computer' if mode == 'single' else 'Player 2'
         
-        # Generate game ID
-        game_id = str(uuid.uuid4())
+        client_id = _client_id()
+        if not _acquire_game_slot(client_id):
+            metrics.inc('admission_rejections_total')
+            return _too_many_requests(60)
+        g.game_slot = client_id
         
-        # Store game
-        active_games[game_id] = {
-            'game': game,
-            'mode': mode,
-            'player1': player1,
-            'player2': player2,
-            'created_at': __import__('datetime').datetime.now().isoformat()
-        }
+        game_id = _start_game(mode, player1, player2, client_id)
+        game_data = active_games[game_id]
+        game = game_data['game']
         
-        return jsonify({
+        response = {
             'success': True,
             'game_id': game_id,
             'mode': mode,
             'player1': player1,
             'player2': player2,
-            'min': 1,
-            'max': 100,
-            'max_guesses': 10
-        }), 201
+            'min': game.min_num,
+            'max': game.max_num,
+            'max_guesses': game.max_guesses
+        }
+        if mode == 'single':
+            response['commitment_hash'] = game_data['commitment_hash']
+        
+        return jsonify(response), 201
     
     except Exception as e:
+        client_id = g.pop('game_slot', None)
+        if client_id is not None:
+            _release_game_slot(client_id)
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/lobby/join', methods=['POST'])
+@validate_body(LOBBY_BODY)
+def join_lobby(player, min_num, max_num, difficulty):
+    """Wait for an opponent with the same range and difficulty"""
+    try:
+        if min_num >= max_num:
+            return jsonify({'success': False, 'error': 'Invalid range'}), 400
+        
+        _sweep_abandoned_games()
+        client_id = _client_id()
+        if not _acquire_game_slot(client_id):
+            metrics.inc('admission_rejections_total')
+            return _too_many_requests(60)
+        
+        try:
+            ticket = lobby.join(player, client_id, min_num, max_num, difficulty)
+        except BaseException:
+            _release_game_slot(client_id)
+            raise
+        if ticket is None:
+            _release_game_slot(client_id)
+            return jsonify({'success': False, 'error': 'Lobby is full'}), 503
+        
+        if ticket.status == MATCHED:
+            # The game is charged to the player who waited
+            _release_game_slot(client_id)
+            return jsonify(dict(ticket.to_dict(), success=True)), 201
+        return jsonify(dict(ticket.to_dict(), success=True)), 202
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/lobby/<ticket_id>', methods=['GET'])
+def lobby_status(ticket_id):
+    """Ticket status; ?wait=N long-polls up to N seconds for a match"""
+    wait = request.args.get('wait', 0, type=float)
+    if wait > 0:
+        # A parked long-poll does no work; it mustn't hold a slot other requests need
+        _release_admission()
+    ticket = lobby.wait(ticket_id, wait)
+    if ticket is None:
+        return jsonify({'success': False, 'error': 'Ticket not found'}), 404
+    return jsonify(dict(ticket.to_dict(), success=True)), 200
+
+@app.route('/api/lobby/<ticket_id>', methods=['DELETE'])
+def cancel_lobby(ticket_id):
+    """Leave the lobby (a ticket that was already matched stays matched)"""
+    ticket = lobby.cancel(ticket_id)
+    if ticket is None:
+        return jsonify({'success': False, 'error': 'Ticket not found'}), 404
+    return jsonify(dict(ticket.to_dict(), success=True)), 200
+
 @app.route('/api/game/<game_id>/commit', methods=['POST'])
-def commit_number(game_id):
+@validate_body(COMMIT_BODY)
+@idempotent
+def commit_number(game_id, secret):
     """Commit to a secret number"""
     try:
-        if game_id not in active_games:
+        game_data = _get_game(game_id)
+        if game_data is None:
             return jsonify({'success': False, 'error': 'Game not found'}), 404
         
-        data = request.json
-        secret = data.get('secret')
+        game = game_data['game']
         
-        if not isinstance(secret, int) or secret < 1 or secret > 100:
+        if secret < game.min_num or secret > game.max_num:
             return jsonify({'success': False, 'error': 'Invalid number'}), 400
         
-        game_data = active_games[game_id]
-        game = game_data['game']
+        if game.game_state['phase'] != 'commitment':
+            return jsonify({'success': False, 'error': 'Secret already committed'}), 409
         
         # Commit the number
-        commitment_hash = game.commit_number(secret)
+        commitment_hash = game.commit_number(secret, validated=True)
         
         # Store the hash for verification later
         game_data['commitment_hash'] = commitment_hash
+        game_data['last_active'] = time.monotonic()
         
         return jsonify({
             'success': True,
@@ -92,31 +660,27 @@ def commit_number(game_id):
         return jsonify({'success': False, 'error': str(e)}), 400
 
 @app.route('/api/game/<game_id>/guess', methods=['POST'])
-def make_guess(game_id):
+@validate_body(GUESS_BODY)
+@idempotent
+def make_guess(game_id, guess):
     """Make a guess"""
     try:
-        if game_id not in active_games:
+        game_data = _get_game(game_id)
+        if game_data is None:
             return jsonify({'success': False, 'error': 'Game not found'}), 404
         
-        data = request.json
-        guess = data.get('guess')
-        
-        if not isinstance(guess, int):
-            return jsonify({'success': False, 'error': 'Invalid guess'}), 400
-        
-        game_data = active_games[game_id]
         game = game_data['game']
         
-        # Make the guess
-        result = game.make_guess(guess)
-        
-        if not result['valid']:
+        if guess < game.min_num or guess > game.max_num:
             return jsonify({
                 'success': False,
-                'error': result['message']
+                'error': f"Guess must be between {game.min_num} and {game.max_num}"
             }), 400
         
-        stats = game.get_game_stats()
+        # Make the guess
+        result = game.make_guess(guess, validated=True)
+        
+        game_data['last_active'] = time.monotonic()
         
         return jsonify({
             'success': True,
@@ -131,20 +695,38 @@ def make_guess(game_id):
         return jsonify({'success': False, 'error': str(e)}), 400
 
 @app.route('/api/game/<game_id>/reveal', methods=['POST'])
+@idempotent
 def reveal_game(game_id):
     """Reveal and verify the commitment"""
     try:
-        if game_id not in active_games:
+        game_data = _get_game(game_id)
+        if game_data is None:
             return jsonify({'success': False, 'error': 'Game not found'}), 404
         
-        game_data = active_games[game_id]
         game = game_data['game']
         
         # Reveal and verify
         result = game.reveal_and_verify()
+        if not result['success']:
+            # Still being played: keep the game and let the client reveal later
+            return jsonify({'success': False, 'error': result['message']}), 409
+        
+        # result['timestamp'] is when the secret was committed, not revealed
+        revealed_at = __import__('datetime').datetime.now().isoformat()
+        state = game.game_state
+        aggregates.record(
+            state['committer'], state['guesser'],
+            found=result['secret_number'] in state['guesses'],
+            guesses=result['guesses_made'],
+            commitment_valid=result['commitment_valid'])
+        # Queue for the history store; never waits on disk
+        if game_history is not None:
+            game_history.submit(build_record(game_id, game_data, result, revealed_at))
+        if commitment_archive is not None:
+            commitment_archive.submit(archive.build_record(game_id, game, result, revealed_at))
         
         # Clean up game from memory
-        del active_games[game_id]
+        _remove_game(game_id, 'finished')
         
         return jsonify({
             'success': True,
@@ -159,66 +741,284 @@ def reveal_game(game_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/game/<game_id>/audit', methods=['GET'])
+def audit_game(game_id):
+    """Archived commitments of a revealed game, checked again (?player= for one)"""
+    if commitment_archive is None:
+        return jsonify({'success': False, 'error': 'Commitment archive is disabled'}), 404
+    
+    player = request.args.get('player')
+    if player is None:
+        records = commitment_archive.find_game(game_id)
+    else:
+        record = commitment_archive.find(game_id, player)
+        records = [record] if record is not None else []
+    if not records:
+        return jsonify({'success': False, 'error': 'No archived commitment for this game'}), 404
+    
+    return jsonify({
+        'success': True,
+        'game_id': game_id,
+        'commitments': [dict(record, **archive.check_record(record)) for record in records]
+    }), 200
+
 @app.route('/api/game/<game_id>/stats', methods=['GET'])
 def get_stats(game_id):
-    """Get current game statistics"""
+    """Get current game statistics (supports If-None-Match)"""
     try:
-        if game_id not in active_games:
+        game_data = _get_game(game_id)
+        if game_data is None:
             return jsonify({'success': False, 'error': 'Game not found'}), 404
         
-        game_data = active_games[game_id]
         game = game_data['game']
-        stats = game.get_game_stats()
+        version = game.version
+        etag = f'{game_id}-{version}'
         
-        return jsonify({
-            'success': True,
-            'phase': stats['phase'],
-            'guesses_made': stats['guesses_made'],
-            'guesses_remaining': stats['guesses_remaining'],
-            'game_over': stats['game_over'],
-            'recent_guesses': stats['recent_guesses']
-        }), 200
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            # Stats only change on state transitions; reuse the body until then
+            cached = game_data.get('stats_body')
+            if cached is None or cached[0] != version:
+                stats = game.get_game_stats()
+                body = jsonify({
+                    'success': True,
+                    'phase': stats['phase'],
+                    'guesses_made': stats['guesses_made'],
+                    'guesses_remaining': stats['guesses_remaining'],
+                    'game_over': stats['game_over'],
+                    'recent_guesses': stats['recent_guesses']
+                }).get_data()
+                cached = game_data['stats_body'] = (version, body)
+            response = app.response_class(cached[1], status=200, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Top players by wins"""
+    return jsonify({'success': True, 'leaderboard': aggregates.leaderboard()}), 200
+
+@app.route('/api/stats/global', methods=['GET'])
+def get_global_stats():
+    """Aggregate statistics over every revealed game, or one player's with ?player="""
+    players = request.args.getlist('player')
+    if not players:
+        return jsonify({'success': True, 'stats': aggregates.global_stats()}), 200
+    if len(players) > 1:
+        # Several at once (router.py asks each shard for a leaderboard's players)
+        found = (aggregates.player_stats(player) for player in players)
+        return jsonify({'success': True, 'players': [stats for stats in found if stats]}), 200
+    
+    stats = aggregates.player_stats(players[0])
+    if stats is None:
+        return jsonify({'success': False, 'error': 'Player not found'}), 404
+    return jsonify({'success': True, 'stats': stats}), 200
+
+def _parse_timestamp(value):
+    """Normalize an ISO date/datetime filter so it compares like finished_at."""
+    if value is None:
+        return None
+    return __import__('datetime').datetime.fromisoformat(value).isoformat()
+
+@app.route('/api/history/export', methods=['GET'])
+def export_history():
+    """Stream finished games as NDJSON (?since, ?until, ?player, ?cursor, ?limit)"""
+    # Player names, secrets and guesses: never public
+    if game_history is None or EXPORT_TOKEN is None:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    supplied = request.headers.get('X-Export-Token', '')
+    if not hmac.compare_digest(supplied, EXPORT_TOKEN):
+        return jsonify({'success': False, 'error': 'Invalid export token'}), 403
+    
+    try:
+        filters = {
+            'since': _parse_timestamp(request.args.get('since')),
+            'until': _parse_timestamp(request.args.get('until')),
+            'player': request.args.get('player'),
+            'cursor': int(request.args.get('cursor', 0)),
+            'limit': int(request.args['limit']) if 'limit' in request.args else None
+        }
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    def generate(path):
+        conn = open_reader(path)
+        if conn is None:
+            return
+        try:
+            yield from export_ndjson(conn, serialization.dumps, **filters)
+        finally:
+            conn.close()
+    
+    # No Content-Length, so the body goes out chunked, one page at a time
+    return Response(
+        generate(game_history.path),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    )
+
+def _debug_denied():
+    """None if the request may use the debug routes, else the error response."""
+    if DEBUG_TOKEN is None:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    supplied = request.headers.get('X-Debug-Token', '')
+    if not hmac.compare_digest(supplied, DEBUG_TOKEN):
+        return jsonify({'success': False, 'error': 'Invalid debug token'}), 403
+    return None
+
+@app.route('/api/debug/memory', methods=['GET'])
+def debug_memory():
+    """Deep byte sizes of active games and, if tracing, the top allocators"""
+    denied = _debug_denied()
+    if denied is not None:
+        return denied
+    top = request.args.get('top', memory.DEFAULT_TOP, type=int)
+    return jsonify({
+        'success': True,
+        'games': memory.games_report(active_games, event_channels, top),
+        'tracemalloc': memory.tracing_report(top)
+    }), 200
+
+@app.route('/api/debug/memory/snapshot', methods=['POST'])
+def debug_memory_snapshot():
+    """Take a tracemalloc snapshot and diff it against the previous one"""
+    denied = _debug_denied()
+    if denied is not None:
+        return denied
+    top = request.args.get('top', memory.DEFAULT_TOP, type=int)
+    return jsonify(dict(memory.take_snapshot(top), success=True)), 200
+
+@app.route('/api/debug/memory/diff', methods=['GET'])
+def debug_memory_diff():
+    """Diff two kept snapshots (?from=&to=)"""
+    denied = _debug_denied()
+    if denied is not None:
+        return denied
+    try:
+        diff = memory.diff_snapshots(request.args.get('from', type=int),
+                                     request.args.get('to', type=int),
+                                     request.args.get('top', memory.DEFAULT_TOP, type=int))
+    except KeyError as e:
+        return jsonify({'success': False, 'error': e.args[0]}), 404
+    return jsonify({'success': True, 'diff': diff}), 200
+
+@app.route('/api/game/<game_id>/events', methods=['GET'])
+def game_events(game_id):
+    """Stream game events (Server-Sent Events) instead of polling stats"""
+    _get_game(game_id)
+    channel = event_channels.get(game_id)
+    if channel is None:
+        return jsonify({'success': False, 'error': 'Game not found'}), 404
+    
+    # EventSource sends Last-Event-ID on reconnect; ?offset= resumes explicitly
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+    else:
+        offset = request.args.get('offset', 0, type=int)
+    
+    return Response(
+        stream_events(channel, offset),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/game/<game_id>/spectate', methods=['GET'])
+def spectate(game_id):
+    """Watch a game live; frames are shared by all spectators"""
+    _get_game(game_id)
+    channel = event_channels.get(game_id)
+    if channel is None:
+        return jsonify({'success': False, 'error': 'Game not found'}), 404
+    
+    hub = spectator_hubs.hub_for(game_id, channel)
+    subscriber = hub.subscribe()
+    
+    def generate():
+        try:
+            yield from hub.stream(subscriber)
+        finally:
+            spectator_hubs.discard(game_id)
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/concepts', methods=['GET'])
 def get_concepts():
     """Get educational content about Arcium concepts"""
-    return jsonify({
-        'concepts': [
-            {
-                'title': 'Commitment',
-                'description': 'Your secret number is encrypted and cryptographically bound. You cannot change it without breaking the commitment hash.',
-                'key_points': [
-                    'Encrypted data stays hidden',
-                    'Hash proves commitment exists',
-                    'Can\'t change mind later',
-                    'Arcium uses this for data binding'
-                ]
-            },
-            {
-                'title': 'Reveal',
-                'description': 'After the game, your encrypted commitment is decrypted to verify you were honest.',
-                'key_points': [
-                    'Decrypt only when authorized',
-                    'Timestamp proves decision timing',
-                    'Shows secret to verify claim',
-                    'Arcium reveals results to authorized parties'
-                ]
-            },
-            {
-                'title': 'Verification',
-                'description': 'The commitment hash is verified against decrypted data to prove you didn\'t cheat.',
-                'key_points': [
-                    'Hash matches = you\'re honest',
-                    'Hash differs = you cheated',
-                    'Cryptography proves truth',
-                    'Arcium guarantees data integrity'
-                ]
-            }
-        ]
-    }), 200
+    # Quality-aware: "gzip;q=0" refuses gzip, "*" accepts it
+    encoding = 'gzip' if request.accept_encodings['gzip'] > 0 else 'identity'
+    body, etag = _concepts_bodies()[encoding]
+    
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, status=200, mimetype='application/json')
+        if encoding == 'gzip':
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={CONCEPTS_MAX_AGE}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+# Concepts never change at runtime, so clients and CDNs may cache them for a day
+CONCEPTS_MAX_AGE = 86400
+
+CONCEPTS = {
+    'concepts': [
+        {
+            'title': 'Commitment',
+            'description': 'Your secret number is encrypted and cryptographically bound. You cannot change it without breaking the commitment hash.',
+            'key_points': [
+                'Encrypted data stays hidden',
+                'Hash proves commitment exists',
+                'Can\'t change mind later',
+                'Arcium uses this for data binding'
+            ]
+        },
+        {
+            'title': 'Reveal',
+            'description': 'After the game, your encrypted commitment is decrypted to verify you were honest.',
+            'key_points': [
+                'Decrypt only when authorized',
+                'Timestamp proves decision timing',
+                'Shows secret to verify claim',
+                'Arcium reveals results to authorized parties'
+            ]
+        },
+        {
+            'title': 'Verification',
+            'description': 'The commitment hash is verified against decrypted data to prove you didn\'t cheat.',
+            'key_points': [
+                'Hash matches = you\'re honest',
+                'Hash differs = you cheated',
+                'Cryptography proves truth',
+                'Arcium guarantees data integrity'
+            ]
+        }
+    ]
+}
+
+_concepts_cache = {}
+
+def _concepts_bodies():
+    """Serialize and gzip the concepts once; later requests reuse the bytes."""
+    if not _concepts_cache:
+        body = jsonify(CONCEPTS).get_data()
+        etag = hashlib.sha256(body).hexdigest()[:16]
+        _concepts_cache['gzip'] = (gzip.compress(body, 9, mtime=0), etag + '-gz')
+        _concepts_cache['identity'] = (body, etag)
+    return _concepts_cache
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # The reloader would run this module twice, and both copies would claim the snapshot
+    app.run(debug=True, port=int(os.environ.get('PORT', '5000')),
+            use_reloader=SNAPSHOT_PATH is None)
@@ -0,0 +1,676 @@
+"""
+Append-only archive of revealed commitments, for fairness audits.
+
+Support gets asked to prove that a game from months ago was fair. Every
+revealed commitment is archived with what it takes to check it again: the
+encrypted token, the hash the players saw when it was made, the game's
+key and the revealed number. check_record() recomputes the hash from the
+token and decrypts it, straight from the archived record.
+
+A reveal only queues its record. A background writer appends records to
+an active log in batches. Once the log holds `segment_records` records it
+is sealed into a segment: the log becomes the segment's data file and a
+sorted index is written next to it. A background compactor merges the
+`fan_in` smallest segments whenever there are that many, so a lookup
+searches a handful of segments however big the archive grows.
+
+Files in the archive directory (integers big-endian):
+
+    active.log          records as appended: u32 length, then a compact
+                        JSON array (see RECORD_FIELDS)
+    NNNNNNNNNN.dat      a sealed segment's records, same format
+    NNNNNNNNNN.idx      b'ARCHIDX' + format version (1 byte), record count
+                        (u64), then one entry per record, sorted by key:
+                        key (30 bytes), record offset (u64), record
+                        length (u32); then a summary: the key of every
+                        SUMMARY_STRIDE-th entry
+
+A key is the game ID (ID_LENGTH ASCII bytes, which sort like the IDs
+themselves, so a game's commitments sit together) followed by an 8-byte
+digest of the player ID. A lookup binary-searches the mapped summary,
+then one block of SUMMARY_STRIDE entries: about 27 probes for 100 million
+records. The summary is 1/180th of the index (23 MB at 100 million), so
+it stays in the page cache and a lookup that isn't cached reads about one
+index page and one data page from disk. Startup maps the segments and
+reads only the active log, which never holds more than `segment_records`
+records.
+
+One process writes a directory: opening it for writing takes an exclusive
+lock on its `writer.lock`, and a second writer fails with ArchiveLocked.
+Shards of a router deployment each archive to their own subdirectory
+(shard_directory()).
+
+Each game has its own key, and a record is archived only once its secret
+is public, so keeping the key reveals nothing new. It lets anyone holding
+the record decrypt the token themselves.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import heapq
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+
+import serialization
+from encryption import load_fernet
+from ids import ID_LENGTH
+
+
+FORMAT_VERSION = 1
+MAGIC = b'ARCHIDX' + bytes((FORMAT_VERSION,))
+INDEX_HEADER = struct.Struct('!8sQ')
+KEY_LENGTH = ID_LENGTH + 8
+INDEX_ENTRY = struct.Struct(f'!{KEY_LENGTH}sQI')
+RECORD_LENGTH = struct.Struct('!I')
+SUMMARY_STRIDE = 128            # entries per summary key: 5 KiB of index
+
+# Order of the values in each record
+RECORD_FIELDS = ('game_id', 'player_id', 'commitment_hash', 'encrypted', 'key', 'number',
+                 'committed_at', 'revealed_at')
+
+DEFAULT_SEGMENT_RECORDS = 100000
+DEFAULT_FAN_IN = 4
+DEFAULT_FLUSH_INTERVAL = 0.5    # seconds a partial batch may wait
+DEFAULT_MAX_BACKLOG = 50000     # records queued before new ones are dropped
+
+ACTIVE_LOG = 'active.log'
+LOCK_FILE = 'writer.lock'
+_SEGMENT_NAME = re.compile(r'^(\d{10})\.(dat|idx)$')
+
+_STOP = object()
+
+
+class ArchiveLocked(Exception):
+    """Another process has the archive directory open for writing."""
+
+
+def shard_directory(root: str, shard: int) -> str:
+    """The archive directory of one shard under a shared root."""
+    return os.path.join(root, f'shard-{shard}')
+
+
+def _lock_directory(directory: str) -> int:
+    """Take the directory's writer lock, held until the returned fd is closed."""
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        raise ArchiveLocked(f"{directory} is already open for writing by another process")
+    return fd
+
+
+def archive_key(game_id: str, player_id: str) -> bytes:
+    """Index key for one commitment. ValueError if `game_id` isn't ID_LENGTH long."""
+    key = game_id.encode('ascii', 'replace')
+    if len(key) != ID_LENGTH:
+        raise ValueError(f"Game ID must be {ID_LENGTH} characters")
+    return key + hashlib.blake2b(player_id.encode(), digest_size=8).digest()
+
+
+def build_record(game_id: str, game, result: dict, revealed_at: str) -> dict:
+    """The archive record for a game that has just been revealed."""
+    committer = game.game_state['committer']
+    return {
+        'game_id': game_id,
+        'player_id': committer,
+        'commitment_hash': game.game_state['commitment_hash'],
+        'encrypted': game.protocol.commitments[committer]['encrypted'],
+        'key': game.protocol.key.decode(),
+        'number': result['secret_number'],
+        'committed_at': result['timestamp'],
+        'revealed_at': revealed_at
+    }
+
+
+def encode_record(record: dict) -> bytes:
+    return serialization.dumps([record[field] for field in RECORD_FIELDS])
+
+
+def decode_record(data: bytes) -> dict:
+    return dict(zip(RECORD_FIELDS, serialization.loads(data)))
+
+
+def check_record(record: dict) -> dict:
+    """
+    Re-check an archived commitment: the hash is the SHA-256 of the token,
+    and the token decrypts with the game's key to the archived number.
+    """
+    hash_valid = hashlib.sha256(record['encrypted'].encode()).hexdigest() \
+        == record['commitment_hash']
+    try:
+        opened = serialization.loads(
+            load_fernet()(record['key'].encode()).decrypt(record['encrypted'].encode()))
+    except Exception:
+        opened = None
+    number_valid = opened is not None and opened.get('number') == record['number'] \
+        and opened.get('player_id') == record['player_id']
+    return {
+        'hash_valid': hash_valid,
+        'number_valid': number_valid,
+        'commitment_valid': hash_valid and number_valid
+    }
+
+
+def _map(f) -> mmap.mmap:
+    """Map a segment file for lookups, which jump around: no readahead."""
+    view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_RANDOM'):
+        view.madvise(mmap.MADV_RANDOM)
+    return view
+
+
+def _segment_path(directory: str, seq: int, kind: str) -> str:
+    return os.path.join(directory, f'{seq:010d}.{kind}')
+
+
+def _read_log(path: str):
+    """(key, offset, length) of every complete record in a log or data file, and its good size."""
+    entries = []
+    offset = 0
+    with open(path, 'rb') as f:
+        while True:
+            prefix = f.read(RECORD_LENGTH.size)
+            if len(prefix) < RECORD_LENGTH.size:
+                break
+            (length,) = RECORD_LENGTH.unpack(prefix)
+            data = f.read(length)
+            if len(data) < length:
+                break       # torn write at the tail
+            record = serialization.loads(data)
+            entries.append((archive_key(record[0], record[1]),
+                            offset + RECORD_LENGTH.size, length))
+            offset += RECORD_LENGTH.size + length
+    return entries, offset
+
+
+def _write_index(path: str, entries) -> int:
+    """Write sorted (key, offset, length) entries to `path`, replacing it atomically."""
+    tmp_path = f'{path}.tmp'
+    count = 0
+    summary = []
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+            f.write(INDEX_HEADER.pack(MAGIC, 0))
+            for entry in entries:
+                if count % SUMMARY_STRIDE == 0:
+                    summary.append(entry[0])
+                f.write(INDEX_ENTRY.pack(*entry))
+                count += 1
+            f.write(b''.join(summary))
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(MAGIC, count))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def write_segment(directory: str, seq: int, items) -> int:
+    """
+    Write a sealed segment from (key, record bytes) pairs in key order.
+    Returns the number of records. Used by compaction and to build
+    archives in bulk.
+    """
+    data_path = _segment_path(directory, seq, 'dat')
+    tmp_path = f'{data_path}.tmp'
+
+    def entries(f):
+        offset = 0
+        for key, record in items:
+            f.write(RECORD_LENGTH.pack(len(record)))
+            f.write(record)
+            yield key, offset + RECORD_LENGTH.size, len(record)
+            offset += RECORD_LENGTH.size + len(record)
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+            # The index is written alongside, but renamed into place after the data
+            index_tmp = _segment_path(directory, seq, 'idx') + '.build'
+            count = _write_index(index_tmp, entries(f))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, data_path)
+        os.replace(index_tmp, _segment_path(directory, seq, 'idx'))
+    except BaseException:
+        for path in (tmp_path, _segment_path(directory, seq, 'idx') + '.build'):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        raise
+    return count
+
+
+class Segment:
+    """
+    A sealed segment with its data and index mapped for lookups.
+
+    Raises ValueError for an index that isn't one or doesn't match its
+    size; the archive then rebuilds it from the data file.
+    """
+
+    def __init__(self, directory: str, seq: int):
+        self.seq = seq
+        self.data_path = _segment_path(directory, seq, 'dat')
+        self.index_path = _segment_path(directory, seq, 'idx')
+        self._index = self._data = None
+        with open(self.index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if len(header) < INDEX_HEADER.size:
+                raise ValueError(f"{self.index_path} is not an archive index")
+            magic, self.count = INDEX_HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{self.index_path} is not a version {FORMAT_VERSION} "
+                                 "archive index")
+            self._summary_count = -(-self.count // SUMMARY_STRIDE)
+            self._summary_offset = INDEX_HEADER.size + self.count * INDEX_ENTRY.size
+            if self._summary_offset + self._summary_count * KEY_LENGTH \
+                    != os.fstat(f.fileno()).st_size:
+                raise ValueError(f"{self.index_path} is truncated")
+            if self.count:
+                self._index = _map(f)
+        with open(self.data_path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.count:
+                self._data = _map(f)
+
+    def _lower_bound(self, key: bytes) -> int:
+        """Position of the first entry whose key is >= `key`."""
+        view, length = self._index, len(key)
+        # First the summary: summary key n is entry n * SUMMARY_STRIDE's key
+        base = self._summary_offset
+        low, high = 0, self._summary_count
+        while low < high:
+            middle = (low + high) // 2
+            start = base + middle * KEY_LENGTH
+            if view[start:start + length] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return 0
+        # Then the block between the last summary key below `key` and the next
+        base, size = INDEX_HEADER.size, INDEX_ENTRY.size
+        low, high = (low - 1) * SUMMARY_STRIDE + 1, min(low * SUMMARY_STRIDE, self.count)
+        while low < high:
+            middle = (low + high) // 2
+            start = base + middle * size
+            if view[start:start + length] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _entry(self, position: int):
+        return INDEX_ENTRY.unpack_from(self._index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+
+    def get(self, key: bytes):
+        """Record bytes for `key`, or None."""
+        if not self.count:
+            return None
+        position = self._lower_bound(key)
+        if position < self.count:
+            found, offset, length = self._entry(position)
+            if found == key:
+                return self._data[offset:offset + length]
+        return None
+
+    def scan(self, prefix: bytes):
+        """Record bytes of every entry whose key starts with `prefix`."""
+        if not self.count:
+            return
+        position = self._lower_bound(prefix)
+        while position < self.count:
+            key, offset, length = self._entry(position)
+            if not key.startswith(prefix):
+                break
+            yield self._data[offset:offset + length]
+            position += 1
+
+    def items(self):
+        """(key, record bytes) for every entry, in key order."""
+        for position in range(self.count):
+            key, offset, length = self._entry(position)
+            yield key, self._data[offset:offset + length]
+
+    def remove(self):
+        """
+        Delete the files. The mappings stay readable until the last lookup
+        holding this segment lets go of it.
+        """
+        for path in (self.index_path, self.data_path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class CommitmentArchive:
+    """
+    Revealed commitments by game and player, on disk in `directory`.
+
+    submit() never blocks; find(), find_game() and verify_commitment()
+    read the archive directly and may be called from any thread.
+
+    readonly=True opens an archive another process is writing to, e.g. for
+    `manage.py audit`: nothing is created, repaired or cleaned up, and
+    submit() raises ValueError.
+    """
+
+    def __init__(self, directory: str, segment_records: int = DEFAULT_SEGMENT_RECORDS,
+                 fan_in: int = DEFAULT_FAN_IN, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_backlog: int = DEFAULT_MAX_BACKLOG, readonly: bool = False):
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        self.directory = directory
+        self.readonly = readonly
+        self.segment_records = segment_records
+        self.fan_in = fan_in
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.compactions = 0
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._lock = threading.Lock()
+        self._compact_wake = threading.Event()
+        self._stopped = False
+        self._writer = self._compactor = None
+        self._start_lock = threading.Lock()
+        self._lock_fd = None
+
+        if not readonly:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Before anything is cleaned up: the files may be another writer's
+            self._lock_fd = _lock_directory(directory)
+        self._segments = self._open_segments()      # newest first
+        self._next_seq = max((segment.seq for segment in self._segments), default=0) + 1
+        self._open_log()
+
+    # -- opening -----------------------------------------------------------
+
+    def _open_segments(self) -> list:
+        kinds = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(('.tmp', '.build')):
+                if self.readonly:
+                    continue
+                os.unlink(os.path.join(self.directory, name))   # an interrupted write
+                continue
+            match = _SEGMENT_NAME.match(name)
+            if match:
+                kinds.setdefault(int(match.group(1)), set()).add(match.group(2))
+        segments = []
+        for seq, present in kinds.items():
+            if 'dat' not in present:
+                # Sealing stopped before the log was renamed; the log still has these
+                if not self.readonly:
+                    os.unlink(_segment_path(self.directory, seq, 'idx'))
+                continue
+            try:
+                segments.append(Segment(self.directory, seq))
+            except (OSError, ValueError):
+                if self.readonly:
+                    continue    # being sealed or merged by the writing process
+                # Missing or damaged index: the data file has everything to rebuild it
+                entries, _ = _read_log(_segment_path(self.directory, seq, 'dat'))
+                _write_index(_segment_path(self.directory, seq, 'idx'), sorted(entries))
+                segments.append(Segment(self.directory, seq))
+        segments.sort(key=lambda segment: segment.seq, reverse=True)
+        return segments
+
+    def _open_log(self):
+        """Open the active log for appending, recovering what a previous process wrote."""
+        path = os.path.join(self.directory, ACTIVE_LOG)
+        entries, size = _read_log(path) if os.path.exists(path) else ([], 0)
+        if self.readonly:
+            self._log_fd = os.open(path, os.O_RDONLY) if entries else None
+            self._log_size = size
+            self._log_index = {key: (offset, length) for key, offset, length in entries}
+            return
+        self._log_fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        os.ftruncate(self._log_fd, size)
+        self._log_size = size
+        self._log_index = {key: (offset, length) for key, offset, length in entries}
+
+    # -- lookups -----------------------------------------------------------
+
+    def find(self, game_id: str, player_id: str):
+        """The archived record of `player_id`'s commitment in `game_id`, or None."""
+        try:
+            key = archive_key(game_id, player_id)
+        except ValueError:
+            return None
+        with self._lock:
+            position = self._log_index.get(key)
+            if position is not None:
+                data = os.pread(self._log_fd, position[1], position[0])
+            else:
+                data = None
+            segments = self._segments
+        if data is None:
+            for segment in segments:
+                data = segment.get(key)
+                if data is not None:
+                    break
+        if data is None:
+            return None
+        record = decode_record(data)
+        # Two players whose digests collide are told apart here
+        return record if record['player_id'] == player_id else None
+
+    def find_game(self, game_id: str) -> list:
+        """Every archived commitment of `game_id`."""
+        try:
+            prefix = archive_key(game_id, '')[:ID_LENGTH]
+        except ValueError:
+            return []
+        with self._lock:
+            found = [os.pread(self._log_fd, length, offset)
+                     for key, (offset, length) in self._log_index.items()
+                     if key.startswith(prefix)] if len(self._log_index) else []
+            segments = self._segments
+        for segment in segments:
+            found.extend(segment.scan(prefix))
+        records = {}
+        for data in found:
+            record = decode_record(data)
+            records.setdefault(record['player_id'], record)
+        return list(records.values())
+
+    def verify_commitment(self, game_id: str, player_id: str, commitment_hash: str) -> bool:
+        """
+        True if the archive holds this commitment under this hash and the
+        archived token still hashes to it: CommitRevealProtocol's
+        verify_commitment, run against the archive. check_record() also
+        decrypts.
+        """
+        record = self.find(game_id, player_id)
+        return record is not None and record['commitment_hash'] == commitment_hash \
+            and hashlib.sha256(record['encrypted'].encode()).hexdigest() == commitment_hash
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._log_index) + sum(segment.count for segment in self._segments)
+
+    # -- writing -----------------------------------------------------------
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, record: dict) -> bool:
+        """Queue a record (see build_record) without blocking; False if it was dropped."""
+        if self.readonly:
+            raise ValueError("The archive was opened read-only")
+        if self._writer is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _start(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._compactor = threading.Thread(
+                    target=self._compact_loop, name='archive-compactor', daemon=True)
+                self._compactor.start()
+                self._writer = threading.Thread(
+                    target=self._write_loop, name='archive-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+                # Segments left unmerged by a previous process
+                self._compact_wake.set()
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            while record is not None:
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+                if len(self._log_index) + len(batch) >= self.segment_records:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    record = None
+            if batch:
+                self._append(batch)
+            if len(self._log_index) >= self.segment_records:
+                self._seal()
+
+    def _append(self, batch: list):
+        chunks, entries = [], []
+        offset = self._log_size
+        for record in batch:
+            try:
+                key = archive_key(record['game_id'], record['player_id'])
+            except ValueError:
+                self.errors += 1
+                continue
+            data = encode_record(record)
+            chunks.append(RECORD_LENGTH.pack(len(data)))
+            chunks.append(data)
+            entries.append((key, (offset + RECORD_LENGTH.size, len(data))))
+            offset += RECORD_LENGTH.size + len(data)
+        try:
+            os.write(self._log_fd, b''.join(chunks))
+            os.fsync(self._log_fd)
+        except OSError:
+            self.errors += 1
+            self.dropped += len(entries)
+            os.ftruncate(self._log_fd, self._log_size)
+            return
+        with self._lock:
+            self._log_index.update(entries)
+        self._log_size = offset
+        self.written += len(entries)
+
+    def _seal(self):
+        """Turn the active log into a segment and start a new log."""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        entries = sorted((key, offset, length) for key, (offset, length) in self._log_index.items())
+        _write_index(_segment_path(self.directory, seq, 'idx'), entries)
+        with self._lock:
+            os.rename(os.path.join(self.directory, ACTIVE_LOG),
+                      _segment_path(self.directory, seq, 'dat'))
+            self._segments = [Segment(self.directory, seq)] + self._segments
+            os.close(self._log_fd)
+            self._open_log()
+        self._compact_wake.set()
+
+    # -- compaction --------------------------------------------------------
+
+    def _compact_loop(self):
+        while not self._stopped:
+            self._compact_wake.wait()
+            self._compact_wake.clear()
+            while not self._stopped and len(self._segments) >= self.fan_in:
+                try:
+                    self.compact()
+                except OSError:
+                    self.errors += 1
+                    break
+
+    def compact(self):
+        """Merge the `fan_in` smallest segments into one."""
+        with self._lock:
+            if len(self._segments) < self.fan_in:
+                return
+            inputs = sorted(self._segments, key=lambda segment: segment.count)[:self.fan_in]
+            seq = self._next_seq
+            self._next_seq += 1
+
+        def merged():
+            last = None
+            for key, data in heapq.merge(*(segment.items() for segment in inputs),
+                                         key=lambda item: item[0]):
+                if key != last:     # a record kept twice by an interrupted compaction
+                    yield key, data
+                last = key
+
+        write_segment(self.directory, seq, merged())
+        segment = Segment(self.directory, seq)
+        with self._lock:
+            self._segments = sorted([segment] + [s for s in self._segments if s not in inputs],
+                                    key=lambda s: s.seq, reverse=True)
+        for old in inputs:
+            old.remove()
+        self.compactions += 1
+
+    def close(self, timeout: float = 10.0):
+        """
+        Flush everything queued so far, stop the background threads and
+        give up the writer lock. Lookups keep working.
+        """
+        self._stopped = True
+        self._compact_wake.set()
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            # Blocking put: the stop marker must not be dropped when the queue is full
+            self._queue.put(_STOP, timeout=timeout)
+            writer.join(timeout)
+        if self._compactor is not None:
+            self._compactor.join(timeout)
+        if self._lock_fd is not None and not (writer is not None and writer.is_alive()):
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            segments = len(self._segments)
+        return {
+            'records': len(self),
+            'segments': segments,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'compactions': self.compactions,
+            'backlog': self.backlog
+        }
@@ -0,0 +1,94 @@
+"""
+Benchmark: admission control overhead per request.
+
+Times AdmissionController.admit/finish for a hot client and for a stream of
+distinct clients (exercising LRU eviction), checks client state stays
+bounded, then compares a full request through the test client with and
+without the admission hooks.
+
+Usage:
+    python benchmarks/bench_admission.py [--number 200000] [--requests 3000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Generous limits so the request benchmark measures bookkeeping, not rejections
+os.environ.setdefault('RATE_LIMIT_PER_SECOND', '1000000')
+os.environ.setdefault('RATE_LIMIT_BURST', '1000000')
+
+import app as api  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+
+
+def bench_controller(number, max_clients):
+    controller = AdmissionController(rate=1e9, burst=1e9, max_clients=max_clients)
+
+    started = time.perf_counter()
+    for _ in range(number):
+        controller.admit('203.0.113.7')
+        controller.finish()
+    hot = (time.perf_counter() - started) / number * 1e9
+
+    clients = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(number)]
+    started = time.perf_counter()
+    for client in clients:
+        controller.admit(client)
+        controller.finish()
+    churn = (time.perf_counter() - started) / number * 1e9
+
+    rejecting = AdmissionController(rate=1.0, burst=1)
+    rejecting.admit('bot')
+    started = time.perf_counter()
+    for _ in range(number):
+        rejecting.admit('bot')
+    rejected = (time.perf_counter() - started) / number * 1e9
+
+    print(f"AdmissionController (ns per admit+finish, {number} calls)")
+    print(f"  same client:          {hot:7.0f}")
+    print(f"  distinct clients:     {churn:7.0f}  (tracked: {len(controller)} / cap {max_clients})")
+    print(f"  rejection path:       {rejected:7.0f}")
+
+
+def time_requests(client, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/concepts')
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_requests(count):
+    app = api.app
+    client = app.test_client()
+    time_requests(client, count // 10)
+
+    with_admission = min(time_requests(client, count) for _ in range(3))
+    controller = api.admission
+    api.admission = None
+    without_admission = min(time_requests(client, count) for _ in range(3))
+    api.admission = controller
+
+    overhead = with_admission - without_admission
+    print(f"\nGET /api/concepts via test client (µs/request, best of 3 x {count})")
+    print(f"  without admission: {without_admission:7.1f}")
+    print(f"  with admission:    {with_admission:7.1f}")
+    print(f"  overhead:          {overhead:7.1f} ({overhead / without_admission * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=200000)
+    parser.add_argument('--max-clients', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    bench_controller(args.number, args.max_clients)
+    bench_requests(args.requests)
+
+
+if __name__ == '__main__':
+    main()
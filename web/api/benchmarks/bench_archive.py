@@ -0,0 +1,192 @@
+"""
+Benchmark: commitment archive lookups at growing sizes, up to 100M records.
+
+For each size, builds one sealed segment of that many records (what
+compaction converges to) with archive.write_segment(), opens it as a
+CommitmentArchive and times:
+  * open: what startup pays,
+  * find: one lookup by game and player, with the files in the page cache
+    (warm) and right after evicting them with posix_fadvise (cold),
+  * verify: verify_commitment(), a lookup plus hashing the token again,
+  * check: check_record() on a found record, which also decrypts it,
+  * miss: a lookup for a game that was never archived.
+Records are copies of one real archived commitment with the game ID
+changed, so they are full size (about 400 bytes) but cheap to build.
+100M records take about 44 GB of disk; --dir picks where they go.
+
+Then streams --stream records through submit() with small segments, so
+the writer seals and the compactor merges while it runs, and reports the
+segment count and lookup latency afterwards.
+
+Usage:
+    python benchmarks/bench_archive.py [--sizes 1000000,10000000] [--lookups 2000]
+    python benchmarks/bench_archive.py --sizes 100000000 --dir /var/tmp
+"""
+
+import argparse
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+import ids  # noqa: E402
+from game import GuessTheNumberGame  # noqa: E402
+
+PLAYER = 'Computer'
+
+
+def sample_record() -> dict:
+    game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
+    game.setup_game(PLAYER, 'Bench')
+    game.commit_number(42)
+    for guess in (50, 25, 42):
+        game.make_guess(guess)
+    return archive.build_record(ids.new_id(), game, game.reveal_and_verify(),
+                                '2026-03-01T12:00:00.000000')
+
+
+class Layout:
+    """N game IDs spread evenly over the ID space, so they come out sorted."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.step = (1 << ids.ID_BITS) // count
+        self.offset = random.randrange(self.step // 2)
+
+    def game_id(self, position: int) -> str:
+        return ids.encode(position * self.step + self.offset)
+
+    def absent_id(self) -> str:
+        return ids.encode(random.randrange(self.count) * self.step + self.offset + self.step // 2)
+
+
+def build(directory, record, layout):
+    """One sealed segment of layout.count copies of `record`, streamed to disk."""
+    data = archive.encode_record(record)
+    head, tail = data[:2], data[2 + ids.ID_LENGTH:]     # the game ID is the first field
+    digest = archive.archive_key(record['game_id'], PLAYER)[ids.ID_LENGTH:]
+    step, offset, encode = layout.step, layout.offset, ids.encode
+
+    def items():
+        for position in range(layout.count):
+            game_id = encode(position * step + offset).encode()
+            yield game_id + digest, head + game_id + tail
+
+    return archive.write_segment(directory, 1, items())
+
+
+def evict(directory):
+    """Drop the archive's files from the page cache."""
+    for name in os.listdir(directory):
+        fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def timed(call, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        call(*args)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def bench_size(directory, record, count, lookups):
+    layout = Layout(count)
+    started = time.perf_counter()
+    build(directory, record, layout)
+    build_s = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    opens = []
+    for _ in range(20):
+        started = time.perf_counter()
+        archive.CommitmentArchive(directory)
+        opens.append(time.perf_counter() - started)
+    opens.sort()
+
+    gc.collect()
+    evict(directory)
+    store = archive.CommitmentArchive(directory)
+    cold_ids = [(layout.game_id(random.randrange(count)), PLAYER) for _ in range(lookups)]
+    cold = timed(store.find, cold_ids)
+    warm = timed(store.find, cold_ids)
+    assert store.find(*cold_ids[0])['game_id'] == cold_ids[0][0]
+
+    hashes = [(game_id, PLAYER, record['commitment_hash']) for game_id, _ in cold_ids]
+    verify = timed(store.verify_commitment, hashes)
+    assert store.verify_commitment(*hashes[0])
+    found = [(store.find(*args),) for args in cold_ids[:200]]
+    check = timed(archive.check_record, found)
+    miss = timed(store.find, [(layout.absent_id(), PLAYER) for _ in range(lookups)])
+
+    print(f"  {count:>11,d} {size / 2 ** 30:7.1f} {build_s:8.0f} {opens[len(opens) // 2] * 1e6:8.0f}"
+          f" {cold[0]:7.0f} {cold[1]:7.0f} {warm[0]:7.1f} {warm[1]:7.1f}"
+          f" {verify[0]:8.1f} {check[0]:7.1f} {miss[0]:7.1f}")
+    for name in os.listdir(directory):
+        os.unlink(os.path.join(directory, name))
+
+
+def bench_stream(directory, record, count, segment_records, lookups):
+    store = archive.CommitmentArchive(directory, segment_records=segment_records,
+                                      flush_interval=0.05, max_backlog=count)
+    game_ids = []
+    started = time.perf_counter()
+    for _ in range(count):
+        game_id = ids.new_id()
+        game_ids.append(game_id)
+        store.submit(dict(record, game_id=game_id))
+    submitted = time.perf_counter() - started
+    while store.backlog or store.written < count:
+        time.sleep(0.01)
+    written = time.perf_counter() - started
+    # Let the compactor catch up with the last seals
+    deadline = time.monotonic() + 60
+    while store.stats()['segments'] >= store.fan_in and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stats = store.stats()
+    sample = [(game_id, PLAYER) for game_id in random.sample(game_ids, min(lookups, count))]
+    find = timed(store.find, sample)
+    store.close()
+    print(f"\nStreaming {count:,d} records through submit(), {segment_records:,d} per segment")
+    print(f"  submit {submitted / count * 1e6:.1f} µs each; all on disk after {written:.1f} s")
+    print(f"  {stats['segments']} segments after {stats['compactions']} compactions, "
+          f"{stats['records']:,d} records; find p50 {find[0]:.1f} µs, p99 {find[1]:.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='1000000,10000000')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--stream', type=int, default=200000)
+    parser.add_argument('--segment-records', type=int, default=10000)
+    parser.add_argument('--dir', default=None, help='where to build the archives')
+    args = parser.parse_args()
+
+    record = sample_record()
+    print(f"One sealed segment of N records ({len(archive.encode_record(record))} bytes of JSON "
+          f"each); µs unless noted")
+    print(f"  {'records':>11s} {'GiB':>7s} {'build s':>8s} {'open':>8s} {'cold':>7s} {'p99':>7s}"
+          f" {'warm':>7s} {'p99':>7s} {'verify':>8s} {'check':>7s} {'miss':>7s}")
+    directory = tempfile.mkdtemp(prefix='bench-archive-', dir=args.dir)
+    try:
+        for count in (int(size) for size in args.sizes.split(',')):
+            bench_size(directory, record, count, args.lookups)
+        if args.stream:
+            bench_stream(directory, record, args.stream, args.segment_records, args.lookups)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark: spectator fan-out throughput and memory per subscriber.
+
+Two measurements:
+
+  - Polled: N spectators on one game's hub, drained with poll(timeout=0) on
+    one thread after each event. This is the hub's own cost: frame
+    deliveries per second and the bytes tracemalloc sees per subscriber
+    (the Subscriber object and its set entry, not the connection).
+  - Blocking: --threads spectators, each on its own thread blocked in
+    poll() the way a streaming response is, woken by the channel's
+    Condition.notify_all() on every publish. Reports how long the last
+    waiter takes to see each event and the process RSS each blocked thread
+    adds. On a threaded server that thread, not the Subscriber, is what a
+    spectator costs.
+
+Usage:
+    python benchmarks/bench_broadcast.py [--subscribers 10000] [--events 200]
+    python benchmarks/bench_broadcast.py --threads 2000 --blocking-events 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broadcast import POLICY_DROP, SpectatorHub  # noqa: E402
+from events import GameEventChannel  # noqa: E402
+
+
+def measure_subscriber_memory(subscribers):
+    channel = GameEventChannel('bench')
+    hub = SpectatorHub(channel)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    subs = [hub.subscribe() for _ in range(subscribers)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return allocated / len(subs)
+
+
+def measure_fanout(subscribers, events, slow_fraction, max_lag):
+    channel = GameEventChannel('bench', max_events=max(256, max_lag * 2))
+    hub = SpectatorHub(channel, max_lag=max_lag, policy=POLICY_DROP)
+    subs = [hub.subscribe() for _ in range(subscribers)]
+    slow_every = int(1 / slow_fraction) if slow_fraction else 0
+
+    delivered = 0
+    bytes_out = 0
+    start = time.perf_counter()
+    for i in range(events):
+        channel.publish('feedback', {'guess': i % 100, 'feedback': '🔥 Very close!',
+                                     'attempt': i, 'remaining': 10, 'game_over': False})
+        for n, sub in enumerate(subs):
+            # Slow spectators only read every max_lag * 2 events
+            if slow_every and n % slow_every == 0 and i % (max_lag * 2):
+                continue
+            frames = hub.poll(sub, timeout=0)
+            delivered += len(frames)
+            for frame in frames:
+                bytes_out += len(frame)
+    elapsed = time.perf_counter() - start
+    return {
+        'published_per_sec': events / elapsed,
+        'deliveries_per_sec': delivered / elapsed,
+        'mb_per_sec': bytes_out / elapsed / 1e6,
+        'frames_dropped': hub.frames_dropped,
+        'elapsed': elapsed
+    }
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (Linux; 0 elsewhere)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def measure_blocking(threads, events, max_lag, gap=0.002):
+    """Spectators on their own threads, blocked in poll() between events."""
+    channel = GameEventChannel('bench', max_events=max(256, max_lag * 2))
+    hub = SpectatorHub(channel, max_lag=max_lag, policy=POLICY_DROP)
+    published_at = {}
+    last_seen = {}
+    delivered = [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(threads + 1)
+
+    def spectate():
+        sub = hub.subscribe(from_start=False)
+        ready.wait()
+        count = 0
+        while True:
+            frames = hub.poll(sub, timeout=1.0)
+            now = time.perf_counter()
+            if frames:
+                count += len(frames)
+                with lock:
+                    last = sub.cursor - 1
+                    last_seen[last] = max(last_seen.get(last, 0.0), now)
+            elif channel.closed:
+                break
+        with lock:
+            delivered[0] += count
+
+    rss_before = _rss_bytes()
+    workers = [threading.Thread(target=spectate, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    rss_per_thread = (_rss_bytes() - rss_before) / threads
+
+    for i in range(events):
+        published_at[i] = time.perf_counter()
+        channel.publish('feedback', {'guess': i % 100, 'feedback': '🔥 Very close!',
+                                     'attempt': i, 'remaining': 10, 'game_over': False})
+        # Let the waiters go back to sleep, as they would between real moves
+        time.sleep(gap)
+    channel.close()
+    for worker in workers:
+        worker.join()
+
+    wakeups = [last_seen[i] - published_at[i] for i in published_at if i in last_seen]
+    return {
+        'delivered': delivered[0],
+        'last_wakeup_ms': statistics.median(wakeups) * 1e3 if wakeups else 0.0,
+        'max_wakeup_ms': max(wakeups) * 1e3 if wakeups else 0.0,
+        'rss_per_thread': rss_per_thread,
+        'stack_size': threading.stack_size(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--slow-fraction', type=float, default=0.01,
+                        help='share of spectators that read too slowly')
+    parser.add_argument('--max-lag', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=1000,
+                        help='blocking spectators, one thread each (0 to skip)')
+    parser.add_argument('--blocking-events', type=int, default=50)
+    args = parser.parse_args()
+
+    per_sub = measure_subscriber_memory(args.subscribers)
+    result = measure_fanout(args.subscribers, args.events, args.slow_fraction, args.max_lag)
+
+    print(f"Spectator fan-out: {args.subscribers} subscribers, {args.events} events")
+    print(f"  memory per subscriber: {per_sub:.0f} bytes (hub state only, no connection)")
+    print(f"  events published/sec:  {result['published_per_sec']:,.0f}")
+    print(f"  frame deliveries/sec:  {result['deliveries_per_sec']:,.0f}")
+    print(f"  throughput:            {result['mb_per_sec']:.1f} MB/s (shared frames)")
+    print(f"  frames dropped (slow): {result['frames_dropped']}")
+
+    if args.threads:
+        blocking = measure_blocking(args.threads, args.blocking_events, args.max_lag)
+        stack = blocking['stack_size']
+        print(f"\nBlocking spectators: {args.threads} threads in poll(), "
+              f"{args.blocking_events} events")
+        print(f"  frames delivered:      {blocking['delivered']:,}")
+        print(f"  last waiter woken:     {blocking['last_wakeup_ms']:.1f} ms median, "
+              f"{blocking['max_wakeup_ms']:.1f} ms max after publish")
+        print(f"  RSS per thread:        {blocking['rss_per_thread'] / 1024:.0f} KiB "
+              f"(stack reserved: {'default' if not stack else f'{stack // 1024} KiB'})")
+
+
+if __name__ == '__main__':
+    main()
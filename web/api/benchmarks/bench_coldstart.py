@@ -0,0 +1,96 @@
+"""
+Benchmark: serverless cold start to first response.
+
+Starts fresh interpreters that import the WSGI entry point and serve a first
+request through the test client, the way a Vercel cold start does. Reports
+median import time and time to first response, plus an `-X importtime`
+breakdown of the slowest top-level packages.
+
+--eager imports the crypto stack up front, which is how the app started
+before it was made lazy, so the two can be compared.
+
+Usage:
+    python benchmarks/bench_coldstart.py [--runs 10] [--first health|create|commit] [--eager]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import time, json
+started = time.perf_counter()
+if {eager!r}:
+    import cryptography.fernet
+import wsgi
+imported = time.perf_counter()
+client = wsgi.app.test_client()
+first = {first!r}
+if first == 'health':
+    client.get('/api/health')
+else:
+    game_id = client.post('/api/game/create', json={{'mode': 'two'}}).get_json()['game_id']
+    if first == 'commit':
+        client.post('/api/game/' + game_id + '/commit', json={{'secret': 42}})
+responded = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - started) * 1000,
+                  'first_response_ms': (responded - started) * 1000}}))
+'''
+
+
+def run_once(first: str, eager: bool, importtime: bool):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD.format(first=first, eager=eager)]
+    proc = subprocess.run(command, cwd=API_DIR, capture_output=True, text=True, check=True)
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return timings, proc.stderr
+
+
+def import_breakdown(stderr: str, top: int):
+    """Sum self time per top-level package from -X importtime output."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--first', choices=('health', 'create', 'commit'), default='health',
+                        help='the first request served after import')
+    parser.add_argument('--eager', action='store_true',
+                        help='import the crypto stack up front (previous behaviour)')
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    results = [run_once(args.first, args.eager, importtime=False)[0] for _ in range(args.runs)]
+    _, stderr = run_once(args.first, args.eager, importtime=True)
+
+    imports = [r['import_ms'] for r in results]
+    firsts = [r['first_response_ms'] for r in results]
+    mode = 'eager crypto' if args.eager else 'lazy crypto'
+    print(f"Cold start over {args.runs} runs ({mode}, first request: {args.first})")
+    print(f"  import wsgi:          median {statistics.median(imports):7.1f} ms  "
+          f"min {min(imports):7.1f} ms")
+    print(f"  to first response:    median {statistics.median(firsts):7.1f} ms  "
+          f"min {min(firsts):7.1f} ms")
+    print(f"\nSlowest packages by self import time (-X importtime)")
+    for package, micros in import_breakdown(stderr, args.top):
+        print(f"  {package:24s} {micros / 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Micro-benchmarks for the encryption and game core, with regression baselines.
+
+Each benchmark is warmed up, timed over several repeats and then run once
+more under tracemalloc to record the batch's peak traced memory and the
+blocks and bytes it leaves allocated per operation. Every repeat is timed
+between two runs of a fixed pure-Python calibration loop, so a result also
+records how fast the machine was running at the time. Results can be stored as a
+baseline and later compared against it; the compare command exits with
+status 1 when any benchmark is slower than the baseline by more than the
+threshold, so it can gate changes in CI.
+
+compare looks at the best repeat, which noise can only make slower, with
+each repeat's time divided by the calibration loop's around it. That
+cancels the machine getting faster or slower between runs (CPU frequency,
+noisy neighbours on a shared VM). A benchmark over the threshold is run
+again, and only flagged if it is still over, so an unchanged tree passes
+reliably.
+
+Usage:
+    python benchmarks/bench_core.py run
+    python benchmarks/bench_core.py save [--baseline benchmarks/baseline.json]
+    python benchmarks/bench_core.py compare [--threshold 0.15]
+    python benchmarks/bench_core.py run --filter protocol
+    python benchmarks/bench_core.py save --filter make_guess   # update one entry
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encryption import CommitRevealProtocol  # noqa: E402
+from game import GuessTheNumberGame  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int):
+    """
+    Register a benchmark.
+
+    The decorated function receives `number` and returns a zero-argument
+    callable that performs `number` operations; any per-batch setup
+    happens before it returns, outside the timed region.
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, number)
+        return func
+    return register
+
+
+# -- encryption ----------------------------------------------------------------
+
+@benchmark('protocol.commit', 2000)
+def bench_protocol_commit(number):
+    protocol = CommitRevealProtocol()
+
+    def run():
+        for _ in range(number):
+            protocol.commit(42, 'Alice')
+    return run
+
+
+@benchmark('protocol.reveal', 2000)
+def bench_protocol_reveal(number):
+    protocols = []
+    for _ in range(number):
+        protocol = CommitRevealProtocol()
+        protocol.commit(42, 'Alice')
+        protocols.append(protocol)
+
+    def run():
+        for protocol in protocols:
+            protocol.reveal('Alice')
+    return run
+
+
+@benchmark('protocol.verify_commitment', 200000)
+def bench_protocol_verify(number):
+    protocol = CommitRevealProtocol()
+    commitment_hash = protocol.commit(42, 'Alice')
+
+    def run():
+        for _ in range(number):
+            protocol.verify_commitment('Alice', commitment_hash)
+    return run
+
+
+# -- game ------------------------------------------------------------------------
+
+@benchmark('game.construct', 5000)
+def bench_game_construct(number):
+    def run():
+        for _ in range(number):
+            GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
+    return run
+
+
+@benchmark('game.make_guess', 50000)
+def bench_game_make_guess(number):
+    game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=number + 1)
+    game.setup_game('Alice', 'Bob')
+    game.commit_number(100)
+
+    def run():
+        for i in range(number):
+            game.make_guess(1 + i % 99)
+    return run
+
+
+@benchmark('game.reveal_and_verify', 2000)
+def bench_game_reveal(number):
+    games = []
+    for _ in range(number):
+        game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=1)
+        game.setup_game('Alice', 'Bob')
+        game.commit_number(42)
+        game.make_guess(50)
+        games.append(game)
+
+    def run():
+        for game in games:
+            game.reveal_and_verify()
+    return run
+
+
+@benchmark('game.get_game_stats', 200000)
+def bench_game_stats(number):
+    game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
+    game.setup_game('Alice', 'Bob')
+    game.commit_number(42)
+    for guess in (50, 25, 37):
+        game.make_guess(guess)
+
+    def run():
+        for _ in range(number):
+            game.get_game_stats()
+    return run
+
+
+# -- harness -----------------------------------------------------------------
+
+CALIBRATION_NUMBER = 20000
+
+
+def calibrate(number: int = CALIBRATION_NUMBER) -> float:
+    """Nanoseconds per iteration of a fixed interpreter-bound loop."""
+    table = {}
+    started = time.perf_counter()
+    for i in range(number):
+        table[i & 255] = table.get(i & 127, 0) + i
+    return (time.perf_counter() - started) / number * 1e9
+
+
+def measure(func, number: int, repeat: int, warmup: int) -> dict:
+    """Time one benchmark, next to the calibration loop, and count its allocations."""
+    for _ in range(warmup):
+        func(max(1, number // 10))()
+        calibrate()
+
+    timings = []
+    calibrated = []
+    for _ in range(repeat):
+        run = func(number)
+        before = calibrate()
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) / number * 1e9)
+        calibrated.append(timings[-1] / ((before + calibrate()) / 2))
+
+    run = func(number)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_size, _ = tracemalloc.get_traced_memory()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    retained_blocks = sum(stat.count_diff for stat in stats)
+    retained_bytes = sum(stat.size_diff for stat in stats)
+
+    return {
+        'number': number,
+        'min_ns': min(timings),
+        'median_ns': statistics.median(timings),
+        'stdev_ns': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'calibrated': min(calibrated),    # min_ns-like, in calibration loops
+        'peak_bytes': peak - start_size,
+        'retained_bytes_per_op': retained_bytes / number,
+        'retained_blocks_per_op': retained_blocks / number,
+    }
+
+
+def run_all(name_filter: str = None, repeat: int = 15, warmup: int = 1, scale: float = 1.0,
+            names: list = None) -> dict:
+    results = {}
+    for name, (func, number) in BENCHMARKS.items():
+        if name_filter and name_filter not in name or names is not None and name not in names:
+            continue
+        results[name] = measure(func, max(1, int(number * scale)), repeat, warmup)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def relative_change(row: dict, base: dict) -> float:
+    """
+    Slowdown of row's best calibrated time against base's (raw min against
+    min for baselines saved without calibration).
+    """
+    if 'calibrated' in row and 'calibrated' in base:
+        return row['calibrated'] / base['calibrated'] - 1
+    return row['min_ns'] / base['min_ns'] - 1
+
+
+def print_results(report: dict, baseline: dict = None, threshold: float = None) -> list:
+    """Print a results table; return the names of regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':28s} {'median':>11s} {'min':>11s} {'peak KiB':>9s} "
+          f"{'kept B/op':>10s} {'blocks/op':>9s}" + ('  vs baseline' if baseline else ''))
+    for name, row in report['results'].items():
+        line = (f"{name:28s} {_format_ns(row['median_ns']):>11s} {_format_ns(row['min_ns']):>11s} "
+                f"{row['peak_bytes'] / 1024:9.1f} {row['retained_bytes_per_op']:10.1f} "
+                f"{row['retained_blocks_per_op']:9.2f}")
+        base = (baseline or {}).get('results', {}).get(name)
+        if base:
+            change = relative_change(row, base)
+            line += f"  {change * 100:+6.1f}%"
+            if threshold is not None and change > threshold:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def _format_ns(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} µs"
+    return f"{value:.0f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Core micro-benchmarks')
+    parser.add_argument('command', choices=('run', 'save', 'compare'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='allowed calibrated min slowdown before flagging (0.15 = 15%%)')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply every benchmark\'s operation count')
+    args = parser.parse_args()
+
+    report = run_all(args.filter, args.repeat, scale=args.scale)
+
+    if args.command == 'save':
+        print_results(report)
+        if args.filter and os.path.exists(args.baseline):
+            # Only the filtered benchmarks were run; keep the others' entries
+            with open(args.baseline) as f:
+                saved = json.load(f)
+            saved['results'].update(report['results'])
+            report = dict(report, results=saved['results'])
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    baseline = None
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = print_results(report, baseline, args.threshold if baseline else None)
+    if regressions:
+        # A slow patch on a busy machine can hit one benchmark; make it show up twice
+        print(f"\nRunning {', '.join(regressions)} again to confirm")
+        rerun = run_all(repeat=args.repeat, scale=args.scale, names=regressions)
+        regressions = print_results(rerun, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: request load of polling /stats vs. the SSE push channel.
+
+Plays two-player games through the Flask test client while an observer
+(the opponent's browser) follows the game either by polling
+/api/game/<id>/stats or by holding one /api/game/<id>/events stream.
+
+Usage:
+    python benchmarks/bench_events.py [--games 20] [--poll-interval 0.05]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# All benchmark traffic comes from one client; don't let rate limits skew it
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+
+from app import app  # noqa: E402
+
+
+GUESSES = [50, 25, 37, 43, 40, 42]
+
+
+def play_game(client, game_id, think_time):
+    """Commit and guess with a pause between moves, like a human player."""
+    client.post(f'/api/game/{game_id}/commit', json={'secret': 42})
+    for guess in GUESSES:
+        time.sleep(think_time)
+        data = client.post(f'/api/game/{game_id}/guess', json={'guess': guess}).get_json()
+        if data['game_over']:
+            break
+    time.sleep(think_time)
+    client.post(f'/api/game/{game_id}/reveal')
+
+
+def observe_by_polling(client, game_id, poll_interval, done):
+    """Poll stats until the game disappears; return the number of requests."""
+    requests_made = 0
+    while not done.is_set():
+        requests_made += 1
+        response = client.get(f'/api/game/{game_id}/stats')
+        if response.status_code == 404:
+            break
+        time.sleep(poll_interval)
+    return requests_made
+
+
+def observe_by_stream(client, game_id):
+    """Follow the event stream to the end; return (requests, events received)."""
+    response = client.get(f'/api/game/{game_id}/events', buffered=False)
+    events = 0
+    for chunk in response.response:
+        events += chunk.count(b'event: ')
+    response.close()
+    return 1, events
+
+
+def run(mode, games, think_time, poll_interval):
+    client = app.test_client()
+    total_requests = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        game_id = client.post('/api/game/create', json={
+            'mode': 'two', 'player1': 'Alice', 'player2': 'Bob'
+        }).get_json()['game_id']
+
+        done = threading.Event()
+        result = {}
+
+        def observer():
+            if mode == 'poll':
+                result['requests'] = observe_by_polling(
+                    app.test_client(), game_id, poll_interval, done)
+            else:
+                result['requests'], _ = observe_by_stream(app.test_client(), game_id)
+
+        thread = threading.Thread(target=observer)
+        thread.start()
+        play_game(client, game_id, think_time)
+        done.set()
+        thread.join()
+        total_requests += result['requests']
+    elapsed = time.perf_counter() - start
+    return total_requests, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--think-time', type=float, default=0.05,
+                        help='seconds between player moves')
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help='seconds between stats polls')
+    args = parser.parse_args()
+
+    poll_requests, poll_time = run('poll', args.games, args.think_time, args.poll_interval)
+    sse_requests, sse_time = run('sse', args.games, args.think_time, args.poll_interval)
+
+    print(f"Observer requests over {args.games} games")
+    print(f"  polling every {args.poll_interval * 1000:.0f}ms: "
+          f"{poll_requests:6d} requests ({poll_requests / args.games:.1f}/game, {poll_time:.2f}s)")
+    print(f"  SSE push channel:      "
+          f"{sse_requests:6d} requests ({sse_requests / args.games:.1f}/game, {sse_time:.2f}s)")
+    if sse_requests:
+        print(f"  reduction: {poll_requests / sse_requests:.1f}x fewer requests")
+
+
+if __name__ == '__main__':
+    main()
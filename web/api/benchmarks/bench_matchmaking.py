@@ -0,0 +1,142 @@
+"""
+Benchmark: lobby matchmaking throughput and latency with a large queue.
+
+Fills the lobby with tens of thousands of waiting players spread over many
+(range, difficulty) buckets, then measures:
+  * join latency for players that find an opponent (pair + game creation),
+    with a no-op game factory and with real GuessTheNumberGame creation,
+  * enqueue and cancel latency for players that have to wait,
+  * matches per second from several threads joining at once.
+
+Usage:
+    python benchmarks/bench_matchmaking.py [--waiting 50000] [--joins 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import GuessTheNumberGame  # noqa: E402
+from matchmaking import DIFFICULTIES, Matchmaker  # noqa: E402
+
+
+def null_game(waiter, joiner):
+    return 'game'
+
+
+def real_game(waiter, joiner):
+    min_num, max_num, difficulty = waiter.bucket
+    game = GuessTheNumberGame(min_num, max_num, DIFFICULTIES[difficulty])
+    game.setup_game(waiter.player, joiner.player)
+    return id(game)
+
+
+def buckets(count):
+    """Distinct (min, max, difficulty) combinations."""
+    names = list(DIFFICULTIES)
+    return [(1, 100 + i // len(names), names[i % len(names)]) for i in range(count)]
+
+
+def fill(lobby, bucket_list, waiting):
+    """Queue `waiting` players, one per bucket, round-robin over bucket_list."""
+    tickets = []
+    for i in range(waiting):
+        min_num, max_num, difficulty = bucket_list[i % len(bucket_list)]
+        tickets.append(lobby.join(f'w{i}', f'client{i}', min_num, max_num, difficulty))
+    return tickets
+
+
+def percentiles(samples):
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return pick(0.50), pick(0.99), samples[-1] * 1e6
+
+
+def bench_joins(factory, waiting, joins, seed):
+    lobby = Matchmaker(factory, max_waiting=waiting + joins)
+    bucket_list = buckets(waiting)
+    fill(lobby, bucket_list, waiting)
+    rng = random.Random(seed)
+    order = rng.sample(bucket_list, min(joins, len(bucket_list)))
+
+    latencies = []
+    started = time.perf_counter()
+    for i, (min_num, max_num, difficulty) in enumerate(order):
+        t0 = time.perf_counter()
+        lobby.join(f'j{i}', 'joiner', min_num, max_num, difficulty)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    return len(order) / elapsed, percentiles(latencies), lobby.stats()
+
+
+def bench_enqueue_cancel(waiting, joins):
+    lobby = Matchmaker(null_game, max_waiting=waiting + joins)
+    fill(lobby, buckets(waiting), waiting)
+    # Fresh buckets, so every join has to wait
+    fresh = [(2, 100 + i, 'normal') for i in range(joins)]
+    join_latencies, cancel_latencies, tickets = [], [], []
+    for i, (min_num, max_num, difficulty) in enumerate(fresh):
+        t0 = time.perf_counter()
+        tickets.append(lobby.join(f'q{i}', 'queued', min_num, max_num, difficulty))
+        join_latencies.append(time.perf_counter() - t0)
+    for ticket in tickets:
+        t0 = time.perf_counter()
+        lobby.cancel(ticket.id)
+        cancel_latencies.append(time.perf_counter() - t0)
+    return percentiles(join_latencies), percentiles(cancel_latencies)
+
+
+def bench_concurrent(threads, joins_per_thread):
+    """Pairs of threads feeding the same buckets; returns matches per second."""
+    lobby = Matchmaker(null_game, max_waiting=threads * joins_per_thread)
+    bucket_list = buckets(64)
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(n):
+        rng = random.Random(n)
+        barrier.wait()
+        for i in range(joins_per_thread):
+            min_num, max_num, difficulty = rng.choice(bucket_list)
+            lobby.join(f't{n}-{i}', f'client{n}', min_num, max_num, difficulty)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return lobby.matched / elapsed, lobby.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--waiting', type=int, default=50000, help='players already queued')
+    parser.add_argument('--joins', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"Lobby with {args.waiting} waiting players in {args.waiting} buckets")
+    print(f"  {'join that matches':26s} {'matches/s':>10s} {'p50 µs':>8s} {'p99 µs':>8s} {'max µs':>8s}")
+    for name, factory in (('no-op game factory', null_game), ('GuessTheNumberGame', real_game)):
+        rate, (p50, p99, worst), _ = bench_joins(factory, args.waiting, args.joins, args.seed)
+        print(f"  {name:26s} {rate:10.0f} {p50:8.1f} {p99:8.1f} {worst:8.1f}")
+
+    (jp50, jp99, _), (cp50, cp99, _) = bench_enqueue_cancel(args.waiting, args.joins)
+    print(f"  {'join that waits':26s} {'':10s} {jp50:8.1f} {jp99:8.1f}")
+    print(f"  {'cancel':26s} {'':10s} {cp50:8.1f} {cp99:8.1f}")
+
+    rate, stats = bench_concurrent(args.threads, args.joins // args.threads)
+    print(f"\n{args.threads} threads joining 64 buckets: {rate:.0f} matches/s "
+          f"({stats['matched']} matched, {stats['waiting']} left waiting)")
+
+
+if __name__ == '__main__':
+    main()
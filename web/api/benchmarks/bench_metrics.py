@@ -0,0 +1,106 @@
+"""
+Benchmark: cost of metrics recording on the request hot path.
+
+Times the raw registry operations, then a full request through the Flask
+test client with and without the metrics hooks installed, single-threaded
+and with several threads recording concurrently.
+
+Usage:
+    python benchmarks/bench_metrics.py [--number 200000] [--requests 3000]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# All benchmark traffic comes from one client; don't let rate limits skew it
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+
+import app as api  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+
+
+def bench_registry(number, threads):
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'bench')
+    registry.histogram('latency_seconds', 'bench')
+    labels = (('route', '/api/game/<game_id>/guess'), ('method', 'POST'))
+
+    inc = min(timeit.repeat(lambda: registry.inc('requests_total', labels),
+                            number=number, repeat=5)) / number * 1e9
+    observe = min(timeit.repeat(lambda: registry.observe('latency_seconds', 0.0042, labels),
+                                number=number, repeat=5)) / number * 1e9
+    print(f"Registry operations (ns/call, best of 5 x {number})")
+    print(f"  inc:     {inc:7.0f}")
+    print(f"  observe: {observe:7.0f}")
+
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'bench')
+    registry.histogram('latency_seconds', 'bench')
+
+    def worker():
+        for _ in range(number):
+            registry.observe('latency_seconds', 0.0042, labels)
+            registry.inc('requests_total', labels)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    counted = registry.snapshot()[('requests_total', labels)]
+    print(f"  {threads} threads: {elapsed / (number * threads) * 1e9:.0f} ns per observe+inc pair, "
+          f"{counted}/{number * threads} increments kept")
+
+
+def time_requests(client, count):
+    game_id = client.post('/api/game/create', json={'mode': 'two'}).get_json()['game_id']
+    client.post(f'/api/game/{game_id}/commit', json={'secret': 42})
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(f'/api/game/{game_id}/stats')
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench_requests(count):
+    app = api.app
+    client = app.test_client()
+    time_requests(client, count // 10)  # warm up
+
+    with_metrics = min(time_requests(client, count) for _ in range(3))
+
+    before = app.before_request_funcs[None]
+    after = app.after_request_funcs[None]
+    app.before_request_funcs[None] = [f for f in before if f is not api._start_request_timer]
+    app.after_request_funcs[None] = [f for f in after if f is not api._record_request_metrics]
+    without_metrics = min(time_requests(client, count) for _ in range(3))
+    app.before_request_funcs[None] = before
+    app.after_request_funcs[None] = after
+
+    overhead = with_metrics - without_metrics
+    print(f"\nGET /stats via test client (µs/request, best of 3 x {count})")
+    print(f"  without metrics: {without_metrics:7.1f}")
+    print(f"  with metrics:    {with_metrics:7.1f}")
+    print(f"  overhead:        {overhead:7.1f} ({overhead / without_metrics * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3000)
+    args = parser.parse_args()
+
+    bench_registry(args.number, args.threads)
+    bench_requests(args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Benchmark: binary TCP protocol (tcp_server.py) against the HTTP API.
+
+Starts both servers as subprocesses on loopback ports and measures:
+  * turn latency: one client playing single-player games one request at a
+    time, over netproto frames and over keep-alive HTTP+JSON,
+  * many sessions: --sessions TCP players connected with a game each; the
+    server's memory per session, turn latency for one more player while
+    they sit in their games, then throughput with all of them playing at
+    once (a saturation test: every session always has a turn in flight),
+  * HTTP throughput with --http-connections threads playing at once.
+
+The HTTP API is served by waitress when it is installed (keep-alive),
+otherwise by Flask's dev server.
+
+Usage:
+    python benchmarks/bench_netproto.py [--games 300] [--sessions 10000]
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(API_DIR))
+sys.path.insert(0, API_DIR)
+sys.path.insert(1, REPO_ROOT)
+
+import netproto as proto  # noqa: E402
+from router import worker_command  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(command, cwd, port, env=None):
+    process = subprocess.Popen(command, cwd=cwd, env=dict(os.environ, **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{command[1]} did not start")
+
+
+def rss_kib(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def percentiles(samples):
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return pick(0.50), pick(0.99)
+
+
+# -- sequential turn latency --------------------------------------------------
+
+def tcp_games(port, games):
+    client = proto.GameClient('127.0.0.1', port)
+    creates, turns = [], []
+    for _ in range(games):
+        t0 = time.perf_counter()
+        client.send(proto.CREATE, mode=proto.MODE_SINGLE, min=1, max=100, max_guesses=10,
+                    player1='Bench', player2='')
+        client.receive()
+        creates.append(time.perf_counter() - t0)
+        guess, game_over = 1, False
+        while not game_over:
+            t0 = time.perf_counter()
+            client.send(proto.GUESS, guess=guess)
+            _, fields = client.receive()
+            turns.append(time.perf_counter() - t0)
+            game_over, guess = fields['game_over'], guess + 1
+        client.send(proto.REVEAL)
+        client.receive()
+    client.close()
+    return creates, turns
+
+
+def http_call(conn, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else None
+    conn.request(method, path, body=payload,
+                 headers={'Content-Type': 'application/json'} if payload else {})
+    response = conn.getresponse()
+    return json.loads(response.read())
+
+
+def http_games(port, games, creates=None, turns=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    creates = [] if creates is None else creates
+    turns = [] if turns is None else turns
+    for _ in range(games):
+        t0 = time.perf_counter()
+        game_id = http_call(conn, 'POST', '/api/game/create', {'mode': 'single'})['game_id']
+        creates.append(time.perf_counter() - t0)
+        guess, game_over = 1, False
+        while not game_over:
+            t0 = time.perf_counter()
+            game_over = http_call(conn, 'POST', f'/api/game/{game_id}/guess',
+                                  {'guess': guess})['game_over']
+            turns.append(time.perf_counter() - t0)
+            guess += 1
+        http_call(conn, 'POST', f'/api/game/{game_id}/reveal')
+    conn.close()
+    return creates, turns
+
+
+# -- many concurrent TCP sessions ---------------------------------------------
+
+async def _read_message(reader):
+    length, msg_type = proto.HEADER.unpack(await reader.readexactly(proto.HEADER.size))
+    return msg_type, proto.decode(msg_type, await reader.readexactly(length))
+
+
+async def _create(reader, writer):
+    writer.write(proto.encode(proto.CREATE, mode=proto.MODE_SINGLE, min=1, max=100,
+                              max_guesses=10, player1='Bench', player2=''))
+    await _read_message(reader)
+
+
+async def _play(reader, writer, start, turns):
+    await start.wait()
+    guess, game_over = 1, False
+    while not game_over:
+        t0 = time.perf_counter()
+        writer.write(proto.encode(proto.GUESS, guess=guess))
+        _, fields = await _read_message(reader)
+        turns.append(time.perf_counter() - t0)
+        game_over, guess = fields['game_over'], guess + 1
+    writer.write(proto.encode(proto.REVEAL))
+    await _read_message(reader)
+
+
+async def tcp_many(port, sessions, server_pid):
+    idle_rss = rss_kib(server_pid)
+    connections = []
+    for _ in range(sessions):
+        connections.append(await asyncio.open_connection('127.0.0.1', port))
+    await asyncio.gather(*[_create(reader, writer) for reader, writer in connections])
+    await asyncio.sleep(0.5)
+    per_session = (rss_kib(server_pid) - idle_rss) / sessions
+
+    # One more player while everyone else sits in an open game
+    _, probe = tcp_games(port, 100)
+
+    start = asyncio.Event()
+    turns = []
+    tasks = [asyncio.create_task(_play(reader, writer, start, turns))
+             for reader, writer in connections]
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    for _, writer in connections:
+        writer.close()
+    return probe, turns, elapsed, per_session
+
+
+def http_many(port, connections, games_each):
+    turns = []
+    threads = [threading.Thread(target=http_games, args=(port, games_each, [], turns))
+               for _ in range(connections)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return turns, time.perf_counter() - started
+
+
+def raise_open_file_limit():
+    import resource
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--games', type=int, default=300, help='sequential games per protocol')
+    parser.add_argument('--sessions', type=int, default=10000, help='concurrent TCP sessions')
+    parser.add_argument('--http-connections', type=int, default=64)
+    args = parser.parse_args()
+
+    limit = raise_open_file_limit()
+    if args.sessions + 100 > limit:
+        args.sessions = limit - 100
+        print(f"(open file limit is {limit}; using {args.sessions} sessions)")
+
+    tcp_port, http_port = free_port(), free_port()
+    tcp_server = start([sys.executable, 'tcp_server.py', '--port', str(tcp_port)],
+                       REPO_ROOT, tcp_port)
+    http_server = start(worker_command('127.0.0.1', http_port), API_DIR, http_port,
+                        {'ADMISSION_CONTROL': 'off', 'GAME_HISTORY': 'off'})
+    try:
+        # Let both commitment pools fill before timing anything
+        time.sleep(1)
+        print(f"Sequential single-player games ({args.games} each, one client)")
+        print(f"  {'':18s} {'create p50':>11s} {'p99':>8s} {'turn p50':>9s} {'p99':>8s}  (µs)")
+        for name, play, port in (('TCP netproto', tcp_games, tcp_port),
+                                 ('HTTP + JSON', http_games, http_port)):
+            creates, turns = play(port, args.games)
+            (c50, c99), (t50, t99) = percentiles(creates), percentiles(turns)
+            print(f"  {name:18s} {c50:11.0f} {c99:8.0f} {t50:9.0f} {t99:8.0f}")
+        guess_bytes = len(proto.encode(proto.GUESS, guess=50))
+        answer_bytes = len(proto.encode(proto.GUESSED, guess=50, feedback=0, attempt=1,
+                                        remaining=9, game_over=0))
+        print(f"  A TCP turn is {guess_bytes} + {answer_bytes} bytes on the wire")
+
+        probe, turns, elapsed, per_session = asyncio.run(
+            tcp_many(tcp_port, args.sessions, tcp_server.pid))
+        print(f"\n{args.sessions} TCP sessions connected, each in a game: "
+              f"{per_session:.1f} KiB of server memory per session")
+        p50, p99 = percentiles(probe)
+        print(f"  one more player meanwhile: turn p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+        p50, p99 = percentiles(turns)
+        print(f"  all {args.sessions} playing at once: {len(turns) / elapsed:.0f} turns/s, "
+              f"turn p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+
+        games_each = max(1, args.games // args.http_connections * 4)
+        turns, elapsed = http_many(http_port, args.http_connections, games_each)
+        p50, p99 = percentiles(turns)
+        print(f"\n{args.http_connections} concurrent HTTP connections, all playing at once")
+        print(f"  {len(turns) / elapsed:.0f} turns/s, turn p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+    finally:
+        tcp_server.terminate()
+        http_server.terminate()
+        tcp_server.wait()
+        http_server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: write-behind throughput of the finished-game history store.
+
+Measures what a request pays to hand a record to the writer (submit
+latency), then how many records per second the background writer sustains
+into SQLite, for a few batch sizes. Compares against writing each record
+in its own transaction, which is what a synchronous insert in the reveal
+handler would cost.
+
+Usage:
+    python benchmarks/bench_persistence.py [--records 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import persistence  # noqa: E402
+from persistence import GameHistoryWriter  # noqa: E402
+
+
+def make_record(i):
+    return {
+        'game_id': f'game-{i:08d}', 'mode': 'two', 'committer': 'Alice', 'guesser': 'Bob',
+        'secret': 42, 'guesses': json.dumps([50, 25, 37, 43, 40, 42]), 'guesses_made': 6,
+        'winner': 'Bob', 'result': '✓ FOUND in 6 guesses!', 'commitment_valid': 1,
+        'created_at': '2025-11-12T10:30:00.000000', 'finished_at': '2025-11-12T10:30:45.123456'
+    }
+
+
+def bench_write_behind(path, records, batch_size):
+    writer = GameHistoryWriter(path, batch_size=batch_size, max_backlog=records + 1)
+    rows = [make_record(i) for i in range(records)]
+    started = time.perf_counter()
+    for row in rows:
+        writer.submit(row)
+    submitted = time.perf_counter()
+    writer.close(timeout=300)
+    finished = time.perf_counter()
+    return {
+        'submit_us': (submitted - started) / records * 1e6,
+        'records_per_sec': writer.written / (finished - started),
+        'batches': writer.batches,
+        'dropped': writer.dropped,
+    }
+
+
+def bench_synchronous(path, records):
+    conn = persistence.connect(path)
+    insert = persistence._INSERT
+    rows = [tuple(make_record(i).get(c) for c in persistence.COLUMNS) for i in range(records)]
+    started = time.perf_counter()
+    for row in rows:
+        with conn:
+            conn.execute(insert, row)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return {'submit_us': elapsed / records * 1e6, 'records_per_sec': records / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--sync-records', type=int, default=5000,
+                        help='records for the one-transaction-per-record baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync = bench_synchronous(os.path.join(tmp, 'sync.db'), args.sync_records)
+        print(f"Finished-game history, {args.records} records")
+        print(f"  {'mode':18s} {'submit µs':>10s} {'records/s':>11s} {'batches':>8s} {'dropped':>8s}")
+        print(f"  {'sync per-record':18s} {sync['submit_us']:10.2f} "
+              f"{sync['records_per_sec']:11.0f} {'-':>8s} {'-':>8s}")
+        for batch_size in (1, 50, 500, 2000):
+            path = os.path.join(tmp, f'batch{batch_size}.db')
+            result = bench_write_behind(path, args.records, batch_size)
+            print(f"  {f'write-behind /{batch_size}':18s} {result['submit_us']:10.2f} "
+                  f"{result['records_per_sec']:11.0f} {result['batches']:8d} {result['dropped']:8d}")
+
+
+if __name__ == '__main__':
+    main()
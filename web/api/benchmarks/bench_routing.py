@@ -0,0 +1,129 @@
+"""
+Benchmark: compact game IDs and the cost of going through router.py.
+
+Measures:
+  * generating and parsing compact base62 IDs against str(uuid4()),
+  * active_games lookups keyed by each kind of ID,
+  * request latency for GET /api/game/<id>/stats straight to a worker,
+    through the router with pooled keep-alive connections, and through the
+    router opening a new worker connection per request.
+
+The worker and the router run in this process on loopback ports.
+
+Usage:
+    python benchmarks/bench_routing.py [--requests 3000] [--games 100000]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# All benchmark traffic comes from one client; don't let rate limits skew it
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+os.environ.setdefault('GAME_HISTORY', 'off')
+
+import ids  # noqa: E402
+import router  # noqa: E402
+
+
+def per_call_ns(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+def bench_ids(games):
+    compact = ids.new_id(3)
+    print(f"IDs: {compact!r} ({len(compact)} chars) vs {str(uuid.uuid4())!r} (36 chars)")
+    print(f"  {'new_id()':26s} {per_call_ns(lambda: ids.new_id(3), 100000):8.0f} ns")
+    print(f"  {'str(uuid.uuid4())':26s} {per_call_ns(lambda: str(uuid.uuid4()), 100000):8.0f} ns")
+    print(f"  {'shard_of()':26s} {per_call_ns(lambda: ids.shard_of(compact), 100000):8.0f} ns")
+
+    for name, make in (('compact', lambda: ids.new_id(3)), ('uuid4', lambda: str(uuid.uuid4()))):
+        keys = [make() for _ in range(games)]
+        table = dict.fromkeys(keys)
+        # Fresh string objects, as parsed from a request path
+        probes = [''.join(key) for key in keys[:10000]]
+        lookup = per_call_ns(lambda: [table[key] for key in probes], 20) / len(probes)
+        print(f"  {'dict lookup, ' + name:26s} {lookup:8.0f} ns  ({games} games)")
+
+
+def start_worker():
+    """Serve the app on a loopback port; returns (port, stop)."""
+    from app import app
+    try:
+        from waitress.server import create_server
+    except ImportError:
+        # Flask's dev server closes every connection, so the pool can't help
+        print("(waitress is not installed; the worker closes every connection)")
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.port, server.shutdown
+    server = create_server(app, host='127.0.0.1', port=0, threads=router.WORKER_THREADS)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server.effective_port, server.close
+
+
+def start_router(port, max_idle):
+    front = router.make_server(router.Router([('127.0.0.1', port)], max_idle=max_idle), port=0)
+    threading.Thread(target=front.serve_forever, daemon=True).start()
+    return front
+
+
+def time_requests(port, path, count):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    samples = []
+    for _ in range(count):
+        t0 = time.perf_counter()
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        samples.append(time.perf_counter() - t0)
+        assert response.status == 200, response.status
+    conn.close()
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def bench_forwarding(count):
+    port, stop_worker = start_worker()
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/api/game/create', body=json.dumps({'mode': 'single'}),
+                 headers={'Content-Type': 'application/json'})
+    game_id = json.loads(conn.getresponse().read())['game_id']
+    conn.close()
+    path = f'/api/game/{game_id}/stats'
+
+    print(f"\nGET {path} ({count} requests, one keep-alive client)")
+    print(f"  {'':26s} {'p50 µs':>8s} {'p99 µs':>8s}")
+    p50, p99 = time_requests(port, path, count)
+    print(f"  {'direct to worker':26s} {p50:8.0f} {p99:8.0f}")
+    for name, max_idle in (('router, pooled', router.DEFAULT_MAX_IDLE), ('router, no pooling', 0)):
+        front = start_router(port, max_idle)
+        p50, p99 = time_requests(front.server_address[1], path, count)
+        stats = front.RequestHandlerClass.router.pools[0].stats()
+        print(f"  {name:26s} {p50:8.0f} {p99:8.0f}  "
+              f"({stats['opened']} worker connections opened)")
+        front.shutdown()
+    stop_worker()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--games', type=int, default=100000, help='size of the lookup table')
+    args = parser.parse_args()
+
+    bench_ids(args.games)
+    bench_forwarding(args.requests)
+
+
+if __name__ == '__main__':
+    main()
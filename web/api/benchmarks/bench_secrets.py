@@ -0,0 +1,133 @@
+"""
+Benchmark: guess latency with the secret kept only in the commitment.
+
+Times make_guess() three ways, interleaved, best of --rounds:
+  * plaintext: the secret read from the game state, as before secret_cache.py,
+  * cached: the game as it is, reading the secret from a warm SecretCache,
+  * decrypt: no cache, the Fernet token decrypted on every guess.
+Then plays whole games at a human pace on a simulated clock to show how
+often a guess misses the cache for a few TTLs, and finally measures how
+long the plaintext actually stays in memory: from put() until the
+sweeper has zeroed the buffer.
+
+Usage:
+    python benchmarks/bench_secrets.py [--guesses 20000] [--rounds 5] [--ttl 0.5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import secret_cache  # noqa: E402
+from game import GuessTheNumberGame  # noqa: E402
+
+
+class PlaintextGame(GuessTheNumberGame):
+    """The game as it was: the secret sits in game_state next to its commitment."""
+
+    def _committed(self, secret_number, commitment_hash):
+        self.game_state['secret_number'] = secret_number
+        super()._committed(secret_number, commitment_hash)
+
+    def _secret(self):
+        return self.game_state['secret_number']
+
+
+class DecryptingGame(GuessTheNumberGame):
+    """No cache: every guess decrypts the commitment."""
+
+    def _secret(self):
+        return self.protocol.peek(self.game_state['committer'])['number']
+
+
+def endless_game(cls, cache):
+    """A game that never ends: the secret is 1 and every guess is 50."""
+    game = cls(min_num=1, max_num=100, max_guesses=10 ** 9, secrets=cache)
+    game.setup_game('Alice', 'Bob')
+    game.commit_number(1)
+    return game
+
+
+def time_guesses(game, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        game.make_guess(50, validated=True)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_guess(count, rounds):
+    cache = secret_cache.SecretCache(ttl=3600)
+    games = {'plaintext': endless_game(PlaintextGame, cache),
+             'cached': endless_game(GuessTheNumberGame, cache),
+             'decrypt': endless_game(DecryptingGame, cache)}
+    timings = {label: float('inf') for label in games}
+    # Interleave so drift on a busy machine hits all three alike
+    for _ in range(rounds):
+        for label, game in games.items():
+            n = count if label != 'decrypt' else max(1, count // 10)
+            timings[label] = min(timings[label], time_guesses(game, n))
+    base = timings['plaintext']
+    print(f"make_guess() (µs/guess, best of {rounds})")
+    for label, us in timings.items():
+        print(f"  {label:10s} {us:8.2f}  {us / base:5.2f}x")
+    return timings
+
+
+def bench_pacing(ttls, seconds_per_guess, games):
+    """Whole 10-guess games on a simulated clock: cache misses per game."""
+    print(f"\nGames of 10 guesses, one every {seconds_per_guess:g} s on average "
+          f"({games} games, simulated clock)")
+    print(f"  {'ttl s':>7s} {'misses/game':>12s} {'hit rate':>9s}")
+    for ttl in ttls:
+        now = [0.0]
+        cache = secret_cache.SecretCache(ttl=ttl)
+        with mock.patch.object(secret_cache.time, 'monotonic', lambda: now[0]):
+            for _ in range(games):
+                game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10, secrets=cache)
+                game.setup_game('Alice', 'Bob')
+                game.commit_number(random.randint(1, 100))
+                while not game.game_state['game_over']:
+                    now[0] += random.expovariate(1 / seconds_per_guess)
+                    game.make_guess(random.randint(1, 100), validated=True)
+        total = cache.hits + cache.misses
+        print(f"  {ttl:7g} {cache.misses / games:12.2f} {cache.hits / total * 100:8.1f}%")
+
+
+def bench_hold(ttl, samples):
+    """Wall time from put() until the cached plaintext has been zeroed."""
+    cache = secret_cache.SecretCache(ttl=ttl, sweep_interval=ttl / 4)
+    holds = []
+    for i in range(samples):
+        started = time.monotonic()
+        cache.put(i, 1 + i % 100)
+        _, buffer = cache._entries[i]
+        while any(buffer):
+            time.sleep(0.005)
+        holds.append(time.monotonic() - started)
+    holds.sort()
+    print(f"\nPlaintext held in the cache with ttl={ttl:g} s, sweep every {ttl / 4:g} s "
+          f"({samples} untouched entries)")
+    print(f"  min {holds[0]:.3f} s, median {holds[len(holds) // 2]:.3f} s, "
+          f"max {holds[-1]:.3f} s (bound: {ttl * 1.25:.3f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--guesses', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--ttl', type=float, default=0.5, help='TTL for the hold-time test')
+    parser.add_argument('--samples', type=int, default=10)
+    args = parser.parse_args()
+
+    bench_guess(args.guesses, args.rounds)
+    bench_pacing((5, 15, secret_cache.DEFAULT_TTL, 60), 4.0, 2000)
+    bench_hold(args.ttl, args.samples)
+
+
+if __name__ == '__main__':
+    main()
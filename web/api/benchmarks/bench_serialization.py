@@ -0,0 +1,114 @@
+"""
+Benchmark: JSON encoding per endpoint, stdlib vs. the fast backend.
+
+For each endpoint's response payload, times encoding with the standard
+library and with the active fast backend (orjson when installed), checks
+the bytes are identical, then times the full endpoint through the Flask
+test client with each backend switched in.
+
+Usage:
+    python benchmarks/bench_serialization.py [--number 20000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# All benchmark traffic comes from one client; don't let rate limits skew it
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+
+import serialization  # noqa: E402
+from app import CONCEPTS, app  # noqa: E402
+from serialization import OrjsonBackend, StdlibBackend  # noqa: E402
+
+
+PAYLOADS = {
+    'create': {
+        'success': True, 'game_id': '3f2b8c1e-5d4a-4e7b-9c2d-1a6f0e8b7c3d', 'mode': 'two',
+        'player1': 'Alice', 'player2': 'Bob', 'min': 1, 'max': 100, 'max_guesses': 10
+    },
+    'commit': {
+        'success': True, 'commitment_hash': 'a3f2e1d4' * 8,
+        'message': 'Secret number committed and encrypted'
+    },
+    'guess': {
+        'success': True, 'guess': 50, 'feedback': '🔥 Very close!', 'attempt': 3,
+        'remaining': 7, 'game_over': False
+    },
+    'reveal': {
+        'success': True, 'secret_number': 42, 'commitment_valid': True, 'guesses_made': 5,
+        'result': '✓ FOUND in 5 guesses!', 'game_winner': 'Bob',
+        'timestamp': '2025-11-12T10:30:45.123456'
+    },
+    'stats': {
+        'success': True, 'phase': 'guessing', 'guesses_made': 3, 'guesses_remaining': 7,
+        'game_over': False, 'recent_guesses': [50, 25, 37]
+    },
+    'concepts': CONCEPTS,
+}
+
+COMMITMENT = {'number': 42, 'timestamp': '2025-11-12T10:30:45.123456', 'player_id': 'Alice'}
+
+
+def time_call(func, number):
+    """Best-of-5 microseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def bench_encoders(number):
+    print(f"Encoding only (µs/call, best of 5 x {number})")
+    print(f"  {'payload':10s} {'json':>8s} {'orjson':>8s} {'gain':>7s}  identical")
+    for name, payload in PAYLOADS.items():
+        slow = time_call(lambda: StdlibBackend.dumps_compact(payload), number)
+        fast = time_call(lambda: OrjsonBackend.dumps_compact(payload), number)
+        same = StdlibBackend.dumps_compact(payload) == OrjsonBackend.dumps_compact(payload)
+        print(f"  {name:10s} {slow:8.2f} {fast:8.2f} {slow / fast:6.1f}x  {same}")
+
+    enc_slow = time_call(lambda: StdlibBackend.dumps(COMMITMENT), number)
+    enc_fast = time_call(lambda: OrjsonBackend.dumps(COMMITMENT), number)
+    blob = StdlibBackend.dumps(COMMITMENT)
+    dec_slow = time_call(lambda: StdlibBackend.loads(blob), number)
+    dec_fast = time_call(lambda: OrjsonBackend.loads(blob), number)
+    print(f"  {'commit enc':10s} {enc_slow:8.2f} {enc_fast:8.2f} {enc_slow / enc_fast:6.1f}x")
+    print(f"  {'commit dec':10s} {dec_slow:8.2f} {dec_fast:8.2f} {dec_slow / dec_fast:6.1f}x")
+
+
+def bench_endpoints(number):
+    client = app.test_client()
+    game_id = client.post('/api/game/create', json={'mode': 'two'}).get_json()['game_id']
+    client.post(f'/api/game/{game_id}/commit', json={'secret': 42})
+    client.post(f'/api/game/{game_id}/guess', json={'guess': 50})
+
+    requests = {
+        'create': lambda: client.post('/api/game/create', json={'mode': 'two'}),
+        'stats': lambda: client.get(f'/api/game/{game_id}/stats'),
+        'concepts': lambda: client.get('/api/concepts'),
+        'health': lambda: client.get('/api/health'),
+    }
+    print(f"\nFull endpoint via test client (µs/request, best of 5 x {number})")
+    print(f"  {'endpoint':10s} {'json':>8s} {'orjson':>8s} {'gain':>7s}")
+    for name, call in requests.items():
+        serialization.backend = StdlibBackend
+        slow = time_call(call, number)
+        serialization.backend = OrjsonBackend
+        fast = time_call(call, number)
+        print(f"  {name:10s} {slow:8.1f} {fast:8.1f} {slow / fast:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    if serialization.orjson is None:
+        print("orjson is not installed; only the stdlib backend is available.")
+        return
+    bench_encoders(args.number)
+    bench_endpoints(max(args.number // 20, 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: warm-restart snapshots at growing game counts.
+
+For each size, writes a snapshot of that many mid-game records, then
+times opening it (what startup pays), one restore (lookup plus decode,
+what the first request for a game pays) and a lookup for an unknown ID
+(what a 404 pays while games are still pending). The records are copies
+of one real game, which keeps big sizes cheap to build and doesn't
+change the file format's costs.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--sizes 1000,10000,100000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ids  # noqa: E402
+import snapshot  # noqa: E402
+from game import GuessTheNumberGame  # noqa: E402
+
+
+def sample_record() -> bytes:
+    game = GuessTheNumberGame(min_num=1, max_num=100, max_guesses=10)
+    game.setup_game('Alice', 'Bob')
+    game.commit_number(42)
+    for guess in (50, 25, 37):
+        game.make_guess(guess)
+    game_data = {'game': game, 'mode': 'two', 'player1': 'Alice', 'player2': 'Bob',
+                 'created_at': '2025-11-12T10:30:45.123456', 'client_id': '203.0.113.7',
+                 'last_active': time.monotonic()}
+    return snapshot.encode_game(game_data, time.time(), time.monotonic())
+
+
+def bench_size(path, record, count, lookups):
+    game_ids = [ids.new_id() for _ in range(count)]
+    started = time.perf_counter()
+    snapshot.write_snapshot(path, ((game_id, record) for game_id in game_ids))
+    write_s = time.perf_counter() - started
+    size = os.path.getsize(path)
+
+    opens = []
+    for _ in range(20):
+        started = time.perf_counter()
+        snap = snapshot.Snapshot(path)
+        opens.append(time.perf_counter() - started)
+        snap.close()
+
+    snap = snapshot.Snapshot(path)
+    sample = random.sample(game_ids, min(lookups, count))
+    started = time.perf_counter()
+    for game_id in sample:
+        snapshot.decode_game(snap.take(game_id), time.time(), time.monotonic())
+    restore_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    unknown = [ids.new_id() for _ in range(lookups)]
+    started = time.perf_counter()
+    for game_id in unknown:
+        snap.take(game_id)
+    miss_us = (time.perf_counter() - started) / len(unknown) * 1e6
+    snap.close()
+
+    opens.sort()
+    print(f"  {count:>9d} {size / count:9.0f} {write_s:9.2f} {opens[len(opens) // 2] * 1e6:9.1f} "
+          f"{restore_us:10.1f} {miss_us:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    record = sample_record()
+    print(f"Snapshot of N mid-game records ({len(record)} bytes of JSON each)")
+    print(f"  {'games':>9s} {'B/game':>9s} {'write s':>9s} {'open µs':>9s} "
+          f"{'restore µs':>10s} {'miss µs':>9s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'games.snapshot')
+        for count in (int(size) for size in args.sizes.split(',')):
+            bench_size(path, record, count, args.lookups)
+
+
+if __name__ == '__main__':
+    main()
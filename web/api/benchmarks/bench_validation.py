@@ -0,0 +1,167 @@
+"""
+Benchmark: compiled request validation against the old ad-hoc checks.
+
+Times the guess endpoint, called as a WSGI app, as it is now
+(validate_body + GUESS_BODY) and as it was before validation.py: a copy of
+the old handler that parsed with request.json, checked the type by hand
+and let make_guess() check the range again. Each is timed on a valid
+guess and on three rejected bodies: malformed JSON, a string instead of a
+number, and an oversized body. Then times the parse-and-check step by itself.
+
+Usage:
+    python benchmarks/bench_validation.py [--requests 2000] [--number 20000]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# All benchmark traffic comes from one client; don't let rate limits skew it
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+os.environ.setdefault('GAME_HISTORY', 'off')
+
+from flask import jsonify, request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+from werkzeug.wrappers import Request  # noqa: E402
+
+import app as api  # noqa: E402
+
+
+@api.app.route('/bench/legacy/<game_id>/guess', methods=['POST'])
+def legacy_guess(game_id):
+    """The guess handler as it was before validation.py."""
+    try:
+        if game_id not in api.active_games:
+            return jsonify({'success': False, 'error': 'Game not found'}), 404
+        data = request.json
+        guess = data.get('guess')
+        if not isinstance(guess, int):
+            return jsonify({'success': False, 'error': 'Invalid guess'}), 400
+        game_data = api.active_games[game_id]
+        game = game_data['game']
+        result = game.make_guess(guess)
+        if not result['valid']:
+            return jsonify({'success': False, 'error': result['message']}), 400
+        game_data['last_active'] = time.monotonic()
+        return jsonify({
+            'success': True,
+            'guess': guess,
+            'feedback': result['feedback'],
+            'attempt': result['attempt'],
+            'remaining': result['remaining'],
+            'game_over': game.game_state['game_over']
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+CASES = (
+    ('valid guess', json.dumps({'guess': 50}).encode(), 200),
+    ('malformed JSON', b'{"guess": 5', 400),
+    ('wrong type', json.dumps({'guess': '50'}).encode(), 400),
+    ('oversized (64 KiB)', json.dumps({'guess': 50, 'pad': 'x' * 65536}).encode(), 413),
+)
+
+
+def endless_game():
+    """A game that never ends: the secret is 1 and every guess is 50."""
+    game_id = api._start_game('single', 'Bench', api.COMPUTER_PLAYER, 'bench',
+                              max_guesses=10 ** 9)
+    api.active_games[game_id]['game'].commit_number(1)
+    return game_id
+
+
+def environ_for(path, body):
+    """A WSGI environ built once; each request only gets a fresh input stream."""
+    return EnvironBuilder(path=path, method='POST', data=body,
+                          content_type='application/json').get_environ()
+
+
+def time_requests(wsgi_app, environ, body, count):
+    """Call the WSGI app directly; the test client's own overhead would swamp the difference."""
+    start_response = lambda status, headers, exc_info=None: None
+    started = time.perf_counter()
+    for _ in range(count):
+        env = environ.copy()
+        env['wsgi.input'] = io.BytesIO(body)
+        for _ in wsgi_app(env, start_response):
+            pass
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_requests(count, rounds):
+    wsgi_app = api.app.wsgi_app
+    client = api.app.test_client()
+    game_id = endless_game()
+    paths = (('old checks', f'/bench/legacy/{game_id}/guess'),
+             ('compiled', f'/api/game/{game_id}/guess'))
+
+    print(f"POST guess, straight into the WSGI app (µs/request, best of {rounds} x {count})")
+    print(f"  {'':20s} {'old checks':>11s} {'compiled':>9s} {'saved':>7s}")
+    for name, body, status in CASES:
+        response = client.post(paths[1][1], data=body, content_type='application/json')
+        assert response.status_code == status, (name, response.status_code)
+        environs = {label: environ_for(path, body) for label, path in paths}
+        timings = {label: float('inf') for label, _ in paths}
+        # Interleave the two so drift on a busy machine hits both alike
+        for _ in range(rounds):
+            for label, _ in paths:
+                timings[label] = min(timings[label],
+                                     time_requests(wsgi_app, environs[label], body, count))
+        old, new = timings['old checks'], timings['compiled']
+        print(f"  {name:20s} {old:11.1f} {new:9.1f} {(old - new) / old * 100:6.1f}%")
+
+
+def bench_checks(number, rounds):
+    """Request to checked values, without the rest of Flask around it."""
+    provider = api.app.json
+    parse = api.GUESS_BODY.parse
+    body = CASES[0][1]
+    environ = environ_for('/', body)
+
+    def old(req):
+        data = provider.loads(req.get_data()) if req.is_json else None
+        guess = data.get('guess')
+        if not isinstance(guess, int):
+            return 400
+        if guess < 1 or guess > 100:
+            return 400
+        return guess
+
+    def run(step):
+        # A fresh Request each time, as the server makes one per request
+        requests = [Request(dict(environ, **{'wsgi.input': io.BytesIO(body)}))
+                    for _ in range(number)]
+        started = time.perf_counter()
+        for req in requests:
+            step(req)
+        return (time.perf_counter() - started) / number * 1e9
+
+    timings = {'old checks': float('inf'), 'compiled': float('inf')}
+    for _ in range(rounds):
+        for label, step in (('old checks', old), ('compiled', parse)):
+            timings[label] = min(timings[label], run(step))
+
+    print(f"\nRead, parse and check a valid body (ns, best of {rounds} x {number})")
+    for label, ns in timings.items():
+        print(f"  {label:20s} {ns:7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    bench_requests(args.requests, args.rounds)
+    bench_checks(args.number, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Spectator fan-out for featured games.
+Thousands of spectators follow one game; each event is encoded once by the
+game's event channel and the same frame bytes are handed to every subscriber.
+"""
+
+import threading
+
+from events import HEARTBEAT_FRAME, HEARTBEAT_INTERVAL, GameEventChannel
+
+
+# Frames a spectator may fall behind before the slow-consumer policy applies
+MAX_SUBSCRIBER_LAG = 64
+
+# Slow-consumer policies
+POLICY_DROP = 'drop'              # skip the oldest pending frames and keep going
+POLICY_DISCONNECT = 'disconnect'  # end the spectator's stream
+
+
+class Subscriber:
+    """
+    One spectator connection.
+
+    A subscriber holds only a cursor into the channel's shared frame log;
+    its pending queue is the window [cursor, channel.next_offset), which is
+    bounded by the hub's max_lag. That keeps the hub's per-spectator memory
+    constant; the server thread blocked in poll() for each stream costs far
+    more (see benchmarks/bench_broadcast.py).
+    """
+
+    __slots__ = ('cursor', 'dropped', 'disconnected')
+
+    def __init__(self, cursor: int):
+        self.cursor = cursor
+        self.dropped = 0
+        self.disconnected = False
+
+
+class SpectatorHub:
+    """Fans one game's pre-encoded event frames out to many spectators."""
+
+    def __init__(self, channel: GameEventChannel, max_lag: int = MAX_SUBSCRIBER_LAG,
+                 policy: str = POLICY_DROP):
+        if policy not in (POLICY_DROP, POLICY_DISCONNECT):
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.channel = channel
+        self.max_lag = max_lag
+        self.policy = policy
+        self.subscribers = set()
+        self.frames_dropped = 0
+        self.disconnects = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, from_start: bool = True) -> Subscriber:
+        """Add a spectator, replaying retained history unless from_start is False."""
+        cursor = self.channel.base_offset if from_start else self.channel.next_offset
+        subscriber = Subscriber(cursor)
+        with self._lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a spectator."""
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def poll(self, subscriber: Subscriber, timeout: float = None) -> list:
+        """
+        Return pending frames for a spectator, waiting up to `timeout` seconds.
+
+        Applies the slow-consumer policy when the spectator is more than
+        max_lag frames behind. Returns None once the spectator is disconnected.
+        """
+        if subscriber.disconnected:
+            return None
+
+        lag = self.channel.next_offset - subscriber.cursor
+        if lag > self.max_lag:
+            if self.policy == POLICY_DISCONNECT:
+                subscriber.disconnected = True
+                self.disconnects += 1
+                self.unsubscribe(subscriber)
+                return None
+            skipped = lag - self.max_lag
+            subscriber.cursor += skipped
+            subscriber.dropped += skipped
+            self.frames_dropped += skipped
+
+        events = self.channel.read(subscriber.cursor, timeout)
+        if events:
+            subscriber.cursor = events[-1]['id'] + 1
+        return [event['frame'] for event in events]
+
+    def stream(self, subscriber: Subscriber, heartbeat: float = HEARTBEAT_INTERVAL):
+        """Generate the spectator's SSE byte stream until the game ends."""
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                frames = self.poll(subscriber, timeout=heartbeat)
+                if frames is None:
+                    return
+                if frames:
+                    yield b''.join(frames)
+                elif self.channel.closed:
+                    return
+                else:
+                    yield HEARTBEAT_FRAME
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        """Spectator counts and slow-consumer totals."""
+        return {
+            'spectators': len(self.subscribers),
+            'frames_dropped': self.frames_dropped,
+            'disconnects': self.disconnects,
+            'policy': self.policy,
+            'max_lag': self.max_lag
+        }
+
+
+class SpectatorRegistry:
+    """Creates spectator hubs on demand, one per watched game."""
+
+    def __init__(self, max_lag: int = MAX_SUBSCRIBER_LAG, policy: str = POLICY_DROP):
+        self.max_lag = max_lag
+        self.policy = policy
+        self.hubs = {}
+        self._lock = threading.Lock()
+
+    def hub_for(self, game_id: str, channel: GameEventChannel) -> SpectatorHub:
+        """Return the hub for a game, creating it on first use."""
+        hub = self.hubs.get(game_id)
+        if hub is None or hub.channel is not channel:
+            with self._lock:
+                hub = self.hubs.get(game_id)
+                if hub is None or hub.channel is not channel:
+                    hub = SpectatorHub(channel, self.max_lag, self.policy)
+                    self.hubs[game_id] = hub
+        return hub
+
+    def discard(self, game_id: str):
+        """Forget a game's hub once nobody is watching any more."""
+        with self._lock:
+            hub = self.hubs.get(game_id)
+            if hub is not None and not hub.subscribers:
+                del self.hubs[game_id]
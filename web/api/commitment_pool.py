@@ -0,0 +1,108 @@
+"""
+Pre-generated commitments for the computer opponent.
+
+Picking the computer's secret and encrypting/hashing its commitment is the
+slowest part of starting a single-player game. A background producer keeps
+a bounded pool of ready-made commitments, so starting a game is an O(1)
+pop. When the pool drops to its low watermark, the producer wakes up and
+refills it to the high watermark. A take from an empty pool is counted as
+a miss, and the caller then commits inline as before.
+"""
+
+import secrets
+import threading
+from collections import deque
+
+
+DEFAULT_CAPACITY = 64
+DEFAULT_LOW_WATERMARK = 16
+
+
+def random_secret(min_num: int, max_num: int) -> int:
+    """Uniform secret in [min_num, max_num] from the OS CSPRNG."""
+    return min_num + secrets.randbelow(max_num - min_num + 1)
+
+
+class CommitmentPool:
+    """
+    Bounded pool of items produced ahead of time by `factory()`.
+
+    Items are taken oldest first. deque.append/popleft are atomic, so
+    take() needs no lock.
+    """
+
+    def __init__(self, factory, capacity: int = DEFAULT_CAPACITY,
+                 low_watermark: int = DEFAULT_LOW_WATERMARK, name: str = 'commitment-pool'):
+        if not 0 <= low_watermark < capacity:
+            raise ValueError("low_watermark must be between 0 and capacity - 1")
+        self.factory = factory
+        self.capacity = capacity
+        self.low_watermark = low_watermark
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.errors = 0
+        self._items = deque()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def start(self):
+        """Start the producer (idempotent); it fills the pool right away."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+        self._wake.set()
+        return self
+
+    def take(self):
+        """Pop a ready item, or return None (a miss) if the pool is empty."""
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            item = None
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if len(self._items) <= self.low_watermark:
+            if self._thread is None:
+                self.start()
+            self._wake.set()
+        return item
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stopped and len(self._items) < self.capacity:
+                try:
+                    item = self.factory()
+                except Exception:
+                    # Don't spin on a broken factory; the next take() retries
+                    self.errors += 1
+                    break
+                self._items.append(item)
+                self.produced += 1
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._items),
+            'capacity': self.capacity,
+            'low_watermark': self.low_watermark,
+            'hits': self.hits,
+            'misses': self.misses,
+            'produced': self.produced,
+            'errors': self.errors
+        }
@@ -3,10 +3,57 @@ Encryption module for commit/reveal protocol.
 Demonstrates Arcium's privacy model: encrypt data, prove knowledge without revealing.
 """
 
-from cryptography.fernet import Fernet
 import hashlib
-import json
+import serialization
+import threading
 from datetime import datetime
+from time import perf_counter
+
+
+# The cryptography package is imported on first use (see load_fernet) so
+# that importing this module stays cheap on serverless cold starts.
+_Fernet = None
+_fernet_lock = threading.Lock()
+
+
+def load_fernet():
+    """
+    Import Fernet and warm up its backend once per process.
+    
+    The first encrypt/decrypt pays for OpenSSL initialization; doing it
+    here, at module level, means no game request pays it later.
+    """
+    global _Fernet
+    if _Fernet is None:
+        with _fernet_lock:
+            if _Fernet is None:
+                from cryptography.fernet import Fernet
+                warm_cipher = Fernet(Fernet.generate_key())
+                warm_cipher.decrypt(warm_cipher.encrypt(b'warm-up'))
+                hashlib.sha256(b'warm-up').hexdigest()
+                _Fernet = Fernet
+    return _Fernet
+
+
+def preload():
+    """Load and warm up the crypto stack on a background thread."""
+    thread = threading.Thread(target=load_fernet, name='crypto-preload', daemon=True)
+    thread.start()
+    return thread
+
+
+# Optional callback(stage, seconds) receiving crypto timings (see set_timing_hook)
+_timing_hook = None
+
+
+def set_timing_hook(hook):
+    """
+    Install a callback receiving (stage, seconds) for every protocol stage:
+    'encrypt', 'hash' and 'commit' on commit, 'decrypt' on reveal and peek.
+    Pass None to disable.
+    """
+    global _timing_hook
+    _timing_hook = hook
 
 
 class CommitRevealProtocol:
@@ -20,10 +67,20 @@ class CommitRevealProtocol:
     """
     
     def __init__(self):
+        Fernet = load_fernet()
         self.key = Fernet.generate_key()
         self.cipher = Fernet(self.key)
         self.commitments = {}
     
+    @classmethod
+    def restore(cls, key: bytes, commitments: dict) -> 'CommitRevealProtocol':
+        """Rebuild a protocol from its key and commitments (see snapshot.py)."""
+        protocol = cls.__new__(cls)
+        protocol.key = key
+        protocol.cipher = load_fernet()(key)
+        protocol.commitments = commitments
+        return protocol
+    
     def commit(self, secret_number: int, player_id: str) -> str:
         """
         COMMIT PHASE: Player commits to a secret number.
@@ -45,12 +102,16 @@ class CommitRevealProtocol:
             'player_id': player_id
         }
         
+        started = perf_counter()
+        
         # Serialize and encrypt
-        json_data = json.dumps(commitment_data)
-        encrypted = self.cipher.encrypt(json_data.encode())
+        json_data = serialization.dumps(commitment_data)
+        encrypted = self.cipher.encrypt(json_data)
+        encrypted_at = perf_counter()
         
         # Create hash for verification (player sees this, not the number)
         commitment_hash = hashlib.sha256(encrypted).hexdigest()
+        hashed_at = perf_counter()
         
         # Store encrypted commitment server-side (Arcium would use secure enclave)
         self.commitments[player_id] = {
@@ -59,6 +120,11 @@ class CommitRevealProtocol:
             'revealed': False
         }
         
+        if _timing_hook is not None:
+            _timing_hook('encrypt', encrypted_at - started)
+            _timing_hook('hash', hashed_at - encrypted_at)
+            _timing_hook('commit', perf_counter() - started)
+        
         return commitment_hash
     
     def reveal(self, player_id: str) -> dict:
@@ -81,15 +147,32 @@ class CommitRevealProtocol:
             raise ValueError(f"Commitment for {player_id} already revealed")
         
         # Decrypt the commitment
-        encrypted_bytes = self.commitments[player_id]['encrypted'].encode()
-        decrypted = self.cipher.decrypt(encrypted_bytes).decode()
-        commitment_data = json.loads(decrypted)
+        commitment_data = self._decrypt(player_id)
         
         # Mark as revealed
         self.commitments[player_id]['revealed'] = True
         
         return commitment_data
     
+    def peek(self, player_id: str) -> dict:
+        """
+        Decrypt a commitment without revealing it, for the game's own use:
+        feedback on guesses needs the number while it is still secret.
+        Nothing returned here may reach the guesser.
+        """
+        if player_id not in self.commitments:
+            raise ValueError(f"No commitment found for {player_id}")
+        return self._decrypt(player_id)
+    
+    def _decrypt(self, player_id: str) -> dict:
+        started = perf_counter()
+        encrypted_bytes = self.commitments[player_id]['encrypted'].encode()
+        decrypted = self.cipher.decrypt(encrypted_bytes)
+        commitment_data = serialization.loads(decrypted)
+        if _timing_hook is not None:
+            _timing_hook('decrypt', perf_counter() - started)
+        return commitment_data
+    
     def verify_commitment(self, player_id: str, commitment_hash: str) -> bool:
         """
         Verify that a commitment hash matches stored data.
@@ -0,0 +1,164 @@
+"""
+Push channel for game events.
+Streams commit, guess, feedback and reveal events to clients with
+Server-Sent Events so they no longer have to poll /stats.
+"""
+
+import json
+import threading
+import time
+
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Events kept per game for clients resuming from an offset
+MAX_BUFFERED_EVENTS = 256
+
+# Seconds a finished game's channel stays readable after the reveal
+RETAIN_AFTER_CLOSE = 60.0
+
+HEARTBEAT_FRAME = b': heartbeat\n\n'
+
+
+class GameEventChannel:
+    """
+    Ordered, offset-addressed log of events for a single game.
+
+    Every event gets a monotonically increasing id (its offset), so a
+    client that reconnects can resume exactly where it left off.
+    """
+
+    def __init__(self, game_id: str, max_events: int = MAX_BUFFERED_EVENTS):
+        self.game_id = game_id
+        self.max_events = max_events
+        self.events = []
+        self.base_offset = 0
+        self.closed = False
+        self.closed_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def next_offset(self) -> int:
+        """Offset that the next published event will receive."""
+        return self.base_offset + len(self.events)
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        """
+        Append an event and wake up every waiting reader.
+
+        The SSE frame is encoded once here; every reader streams the same bytes.
+        """
+        with self._cond:
+            event = {'id': self.next_offset, 'type': event_type, 'data': data}
+            event['frame'] = format_sse(event).encode()
+            self.events.append(event)
+            if len(self.events) > self.max_events:
+                del self.events[0]
+                self.base_offset += 1
+            if event_type == 'reveal':
+                self.close()
+            self._cond.notify_all()
+        return event
+
+    def close(self):
+        """Mark the channel finished; readers drain and then stop."""
+        with self._cond:
+            if not self.closed:
+                self.closed = True
+                self.closed_at = time.monotonic()
+            self._cond.notify_all()
+
+    def read(self, offset: int, timeout: float = None) -> list:
+        """
+        Return all retained events with id >= offset.
+
+        Blocks for up to `timeout` seconds when nothing new is available.
+        Offsets older than the retained window resume from the oldest event.
+        """
+        with self._cond:
+            if offset >= self.next_offset and not self.closed:
+                self._cond.wait(timeout)
+            start = max(offset - self.base_offset, 0)
+            return self.events[start:]
+
+
+class EventChannelRegistry:
+    """Tracks the event channel of every game, including recently finished ones."""
+
+    def __init__(self, retain_after_close: float = RETAIN_AFTER_CLOSE):
+        self.retain_after_close = retain_after_close
+        self.channels = {}
+        self._lock = threading.Lock()
+
+    def open(self, game_id: str, game) -> GameEventChannel:
+        """Create a channel for a game and subscribe it to the game's events."""
+        channel = GameEventChannel(game_id)
+        game.add_listener(channel.publish)
+        with self._lock:
+            self._sweep()
+            self.channels[game_id] = channel
+        return channel
+
+    def get(self, game_id: str):
+        """Return the channel for a game, or None if unknown or expired."""
+        return self.channels.get(game_id)
+
+    def close(self, game_id: str):
+        """Close a game's channel; it is dropped after the retention period."""
+        channel = self.channels.get(game_id)
+        if channel is not None:
+            channel.close()
+
+    def discard(self, game_id: str):
+        """Close and drop a channel now, e.g. for a game that was never registered."""
+        with self._lock:
+            channel = self.channels.pop(game_id, None)
+        if channel is not None:
+            channel.close()
+
+    def purge_closed(self):
+        """Drop every closed channel now, ignoring the retention period."""
+        with self._lock:
+            self._sweep(retain=0.0)
+
+    def _sweep(self, retain: float = None):
+        """Drop closed channels whose retention period has elapsed."""
+        retain = self.retain_after_close if retain is None else retain
+        cutoff = time.monotonic() - retain
+        expired = [
+            game_id for game_id, channel in self.channels.items()
+            if channel.closed and channel.closed_at < cutoff
+        ]
+        for game_id in expired:
+            del self.channels[game_id]
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event as a Server-Sent Events frame."""
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event['data'])}\n\n"
+    )
+
+
+def stream_events(channel: GameEventChannel, offset: int = 0,
+                  heartbeat: float = HEARTBEAT_INTERVAL):
+    """
+    Generate SSE frames for a channel starting at `offset`.
+
+    Emits a comment line every `heartbeat` seconds while idle so proxies
+    keep the connection open, and ends once the channel is closed and drained.
+    """
+    yield b'retry: 3000\n\n'
+    while True:
+        events = channel.read(offset, timeout=heartbeat)
+        if events:
+            for event in events:
+                yield event['frame']
+            offset = events[-1]['id'] + 1
+        elif channel.closed:
+            return
+        else:
+            yield HEARTBEAT_FRAME
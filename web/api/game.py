@@ -5,8 +5,12 @@ Demonstrates privacy-preserving game mechanics using Arcium principles.
 
 from encryption import CommitRevealProtocol, PrivacyExplanation
 import random
+import secret_cache
 
 
+# make_guess() feedback for the guess that found the secret
+CORRECT_FEEDBACK = "🎯 CORRECT!"
+
 class GuessTheNumberGame:
     """
     A privacy-preserving number guessing game using commit/reveal.
@@ -17,68 +21,129 @@ class GuessTheNumberGame:
     3. Each guess gets feedback (hot/cold)
     4. After guesses, Player A reveals commitment
     5. Verify Player A was honest (commitment hash matches)
+    
+    The secret itself is never part of the game state: it stays inside
+    the encrypted commitment, and feedback reads it through a short-lived
+    cache of decrypted secrets (see secret_cache.py).
     """
     
-    def __init__(self, min_num=1, max_num=100, max_guesses=10):
+    def __init__(self, min_num=1, max_num=100, max_guesses=10, protocol=None, secrets=None):
         self.min_num = min_num
         self.max_num = max_num
         self.max_guesses = max_guesses
-        self.protocol = CommitRevealProtocol()
+        # A restored game brings the protocol holding its commitment
+        self.protocol = protocol or CommitRevealProtocol()
+        self.secrets = secrets if secrets is not None else secret_cache.shared
         self.game_state = {
             'phase': 'setup',
             'committer': None,
             'guesser': None,
             'commitment_hash': None,
-            'secret_number': None,
             'guesses': [],
             'game_over': False,
             'winner': None
         }
+        # Bumped on every state transition; used for stats ETags
+        self.version = 0
+        self._listeners = []
+    
+    def add_listener(self, callback):
+        """
+        Register a callback for game events.
+        
+        The callback is invoked as callback(event_type, data) for every
+        'setup', 'commit', 'guess', 'feedback' and 'reveal' event.
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a previously added event callback."""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _emit(self, event_type: str, data: dict):
+        """Record a state transition and notify all listeners."""
+        self.version += 1
+        for callback in self._listeners:
+            callback(event_type, data)
     
     def setup_game(self, committer_name: str, guesser_name: str):
         """Initialize game with two players."""
         self.game_state['committer'] = committer_name
         self.game_state['guesser'] = guesser_name
         self.game_state['phase'] = 'commitment'
+        self._emit('setup', {
+            'committer': committer_name,
+            'guesser': guesser_name,
+            'min': self.min_num,
+            'max': self.max_num,
+            'max_guesses': self.max_guesses
+        })
     
-    def commit_number(self, secret_number: int) -> str:
+    def commit_number(self, secret_number: int, validated: bool = False) -> str:
         """
         COMMITMENT PHASE:
         Player secretly commits to their number using encryption.
+        validated=True skips the range check for a caller that already did it.
         """
-        if not (self.min_num <= secret_number <= self.max_num):
+        if not validated and not (self.min_num <= secret_number <= self.max_num):
             raise ValueError(f"Number must be between {self.min_num} and {self.max_num}")
         
-        self.game_state['secret_number'] = secret_number
-        
         # Create encrypted commitment
         commitment_hash = self.protocol.commit(secret_number, self.game_state['committer'])
-        self.game_state['commitment_hash'] = commitment_hash
-        self.game_state['phase'] = 'guessing'
+        self._committed(secret_number, commitment_hash)
         
         return commitment_hash
     
-    def make_guess(self, guess: int) -> dict:
+    def adopt_commitment(self, protocol, secret_number: int, commitment_hash: str) -> str:
+        """
+        COMMITMENT PHASE (precomputed):
+        Use a commitment the committer made ahead of time, e.g. one taken
+        from a CommitmentPool, instead of encrypting now.
+        """
+        if not (self.min_num <= secret_number <= self.max_num):
+            raise ValueError(f"Number must be between {self.min_num} and {self.max_num}")
+        if not protocol.verify_commitment(self.game_state['committer'], commitment_hash):
+            raise ValueError("Commitment was not made by this game's committer")
+        
+        self.protocol = protocol
+        self._committed(secret_number, commitment_hash)
+        
+        return commitment_hash
+    
+    def _committed(self, secret_number: int, commitment_hash: str):
+        """Record a commitment and move on to guessing."""
+        # Cached now so the first guess doesn't decrypt what we just encrypted
+        self.secrets.put(commitment_hash, secret_number)
+        self.game_state['commitment_hash'] = commitment_hash
+        self.game_state['phase'] = 'guessing'
+        self._emit('commit', {
+            'committer': self.game_state['committer'],
+            'commitment_hash': commitment_hash
+        })
+    
+    def make_guess(self, guess: int, validated: bool = False) -> dict:
         """
         GUESSING PHASE:
         Guesser makes a guess and gets feedback.
         The commitment remains encrypted during this phase.
+        validated=True skips the range check for a caller that already did it.
         """
         if self.game_state['phase'] != 'guessing':
             raise ValueError("Game is not in guessing phase")
         
-        if guess < self.min_num or guess > self.max_num:
+        if not validated and (guess < self.min_num or guess > self.max_num):
             return {
                 'valid': False,
                 'message': f"Guess must be between {self.min_num} and {self.max_num}"
             }
         
-        secret = self.game_state['secret_number']
+        secret = self._secret()
         self.game_state['guesses'].append(guess)
         
         # Provide feedback (hot/cold)
         if guess == secret:
-            feedback = "🎯 CORRECT!"
+            feedback = CORRECT_FEEDBACK
             self.game_state['game_over'] = True
             self.game_state['winner'] = self.game_state['guesser']
         elif abs(guess - secret) <= 5:
@@ -101,9 +166,34 @@ class GuessTheNumberGame:
         if len(self.game_state['guesses']) >= self.max_guesses:
             self.game_state['game_over'] = True
             self.game_state['phase'] = 'reveal'
+        if self.game_state['game_over']:
+            self.secrets.discard(self.game_state['commitment_hash'])
+        
+        self._emit('guess', {
+            'guesser': self.game_state['guesser'],
+            'guess': guess,
+            'attempt': result['attempt']
+        })
+        self._emit('feedback', {
+            'guess': guess,
+            'feedback': feedback,
+            'attempt': result['attempt'],
+            'remaining': result['remaining'],
+            'game_over': self.game_state['game_over'],
+            'winner': self.game_state['winner']
+        })
         
         return result
     
+    def _secret(self) -> int:
+        """The committed number: cached, or decrypted from the commitment on a miss."""
+        commitment_hash = self.game_state['commitment_hash']
+        secret = self.secrets.get(commitment_hash)
+        if secret is None:
+            secret = self.protocol.peek(self.game_state['committer'])['number']
+            self.secrets.put(commitment_hash, secret)
+        return secret
+    
     def reveal_and_verify(self) -> dict:
         """
         REVEAL PHASE:
@@ -145,6 +235,7 @@ class GuessTheNumberGame:
             'game_winner': self.game_state['winner'],
             'timestamp': revealed['timestamp']
         }
+        self._emit('reveal', dict(result))
         
         return result
     
@@ -0,0 +1,134 @@
+"""
+Idempotency-Key support for state-changing game requests.
+
+The first request with a given key runs normally and its serialized
+response is cached; retries with the same key are answered from the cache
+without touching the game. Concurrent duplicates wait for the first one
+to finish instead of running in parallel; if it is still running after
+PENDING_WAIT_TIMEOUT the duplicate is refused (IdempotencyPending), never
+run a second time.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# Responses are kept this long (seconds) and for at most this many keys
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 10000
+
+# How long a duplicate waits for the original request to finish
+PENDING_WAIT_TIMEOUT = 10.0
+
+
+class IdempotencyConflict(Exception):
+    """The key was reused with a different request body."""
+
+
+class IdempotencyPending(Exception):
+    """The original request with this key is still running."""
+
+
+class _Entry:
+    __slots__ = ('key', 'fingerprint', 'expires_at', 'response', 'done')
+
+    def __init__(self, key, fingerprint: str, expires_at: float):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.response = None
+        self.done = threading.Event()
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU + TTL cache of (status, body, headers) keyed by idempotency key.
+    Keys whose original request is still running are never evicted, so the
+    cache can briefly hold more than max_entries.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+
+    def reserve(self, key, fingerprint: str, timeout: float = PENDING_WAIT_TIMEOUT):
+        """
+        Claim a key or fetch its cached response.
+
+        Returns (claim, None) if the caller now owns the key and must run the
+        request, then pass `claim` to complete() or release(). Otherwise
+        returns (None, (status, body, headers)), waiting for an in-flight
+        original if needed.
+        Raises IdempotencyConflict if the key was used for a different body,
+        IdempotencyPending if the original is still running after `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                self._expire(now)
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at <= now and entry.done.is_set():
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    claim = self._entries[key] = _Entry(key, fingerprint, now + self.ttl)
+                    self._evict()
+                    return claim, None
+                self._entries.move_to_end(key)
+
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            if not entry.done.wait(max(0.0, deadline - now)):
+                raise IdempotencyPending(key)
+            if entry.response is not None:
+                return None, entry.response
+            # The original failed and released the key; try to claim it
+
+    def complete(self, claim: _Entry, status: int, body: bytes, headers: list):
+        """Store the response for a claimed key and wake waiting duplicates."""
+        claim.response = (status, body, headers)
+        claim.done.set()
+
+    def release(self, claim: _Entry):
+        """Forget a claimed key without caching (e.g. the request errored)."""
+        with self._lock:
+            if self._entries.get(claim.key) is claim:
+                del self._entries[claim.key]
+        claim.done.set()
+
+    def _expire(self, now: float):
+        """Drop expired, finished entries from the LRU end (lock held)."""
+        expired = []
+        for key, entry in self._entries.items():
+            if entry.expires_at > now:
+                break
+            if entry.done.is_set():
+                expired.append(key)
+        for key in expired:
+            del self._entries[key]
+
+    def _evict(self):
+        """Drop finished entries from the LRU end down to max_entries (lock held)."""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        evicted = []
+        for key, entry in self._entries.items():
+            if entry.done.is_set():
+                evicted.append(key)
+                if len(evicted) == excess:
+                    break
+        for key in evicted:
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,268 @@
+"""
+Incrementally maintained leaderboard and aggregate game statistics.
+
+Every revealed game updates a handful of counters and one fixed-size
+histogram bucket, so recording is O(1) (O(K) for the top-K table) and
+reads never rescan history, however many games have been played.
+Per-player totals are kept for at most max_players players: past that,
+the least recently active player outside the top K is forgotten. The
+history writer (persistence.py) keeps the same totals in SQLite with
+fold_game() and the row format below. At startup restore() loads the
+overall totals and the top K, and restore_players() the rest in the
+background, so a restart never rescans history.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+
+HISTOGRAM_BUCKETS = 20      # guesses-to-win 1..19, plus a "20+" overflow bucket
+DEFAULT_TOP_K = 10
+DEFAULT_MAX_PLAYERS = 100000
+
+
+def _empty_histogram() -> list:
+    return [0] * HISTOGRAM_BUCKETS
+
+
+def _bucket(guesses: int) -> int:
+    return min(max(guesses, 1), HISTOGRAM_BUCKETS) - 1
+
+
+class Tally:
+    """Counters shared by the overall and per-player aggregates."""
+
+    __slots__ = ('games', 'wins', 'guessed', 'found', 'guesses_to_win', 'histogram')
+
+    def __init__(self):
+        self.games = 0              # games played in either role
+        self.wins = 0
+        self.guessed = 0            # games played as the guesser
+        self.found = 0              # ...in which the secret was found
+        self.guesses_to_win = 0     # summed over found games
+        self.histogram = _empty_histogram()
+
+    # Columns of a stored tally, followed by the histogram as JSON
+    COUNTERS = ('games', 'wins', 'guessed', 'found', 'guesses_to_win')
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.COUNTERS) + (json.dumps(self.histogram),)
+
+    def load_row(self, row):
+        """Set the counters from a to_row() tuple (or a row that starts with one)."""
+        for name, value in zip(self.COUNTERS, row):
+            setattr(self, name, value)
+        self.histogram = json.loads(row[len(self.COUNTERS)])
+        return self
+
+    def add(self, other: 'Tally'):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def record_guesser(self, found: bool, guesses: int):
+        self.guessed += 1
+        if found:
+            self.found += 1
+            self.guesses_to_win += guesses
+            self.histogram[_bucket(guesses)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'win_rate': self.wins / self.games if self.games else 0.0,
+            'games_as_guesser': self.guessed,
+            'found': self.found,
+            'find_rate': self.found / self.guessed if self.guessed else 0.0,
+            'avg_guesses_to_win': self.guesses_to_win / self.found if self.found else None,
+            # Index i counts wins in i + 1 guesses; the last bucket is 20 or more
+            'guess_distribution': list(self.histogram)
+        }
+
+
+class _PlayerTally(Tally):
+    __slots__ = ('name', 'rank_seq')
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.rank_seq = 0           # when the current win count was reached
+
+    def rank_key(self) -> tuple:
+        # Wins only grow, and ties go to whoever got there first, so a
+        # player's key changes only when they win
+        return (self.wins, -self.rank_seq)
+
+
+def fold_game(overall: Tally, committer: Tally, guesser: Tally, found: bool,
+              guesses: int) -> Tally:
+    """Count one revealed game in the overall and both players' tallies; return the winner's."""
+    overall.games += 1
+    overall.record_guesser(found, guesses)
+    committer.games += 1
+    if guesser is not committer:
+        guesser.games += 1
+    guesser.record_guesser(found, guesses)
+    winning = guesser if found else committer
+    winning.wins += 1
+    return winning
+
+
+class GameAggregates:
+    """Running totals over every revealed game."""
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, max_players: int = DEFAULT_MAX_PLAYERS):
+        self.top_k = top_k
+        self.max_players = max(max_players, top_k + 2)
+        self.overall = Tally()
+        self.invalid_commitments = 0
+        self.players_evicted = 0
+        self._players = OrderedDict()   # least recently active first
+        self._top = []              # at most top_k players, best first
+        self._seq = 0
+        self._restored = set()      # players restore() loaded in full
+        self._lock = threading.Lock()
+
+    def _player(self, name: str) -> _PlayerTally:
+        """A player's tally, marked as just active (lock held)."""
+        player = self._players.get(name)
+        if player is None:
+            player = self._players[name] = _PlayerTally(name)
+        else:
+            self._players.move_to_end(name)
+        return player
+
+    def _evict(self):
+        """Forget the least recently active players beyond max_players (lock held)."""
+        players = self._players
+        while len(players) > self.max_players:
+            name, player = players.popitem(last=False)
+            if player in self._top:
+                # Leaderboard players are kept; at most top_k of these to skip
+                players[name] = player
+                continue
+            self.players_evicted += 1
+
+    def record(self, committer: str, guesser: str, found: bool, guesses: int,
+               commitment_valid: bool):
+        """Fold one revealed game into the aggregates; the committer wins if not found."""
+        with self._lock:
+            self._seq += 1
+            if not commitment_valid:
+                self.invalid_commitments += 1
+            winning = fold_game(self.overall, self._player(committer), self._player(guesser),
+                                found, guesses)
+            winning.rank_seq = self._seq
+            self._promote(winning)
+            self._evict()
+
+    def restore(self, totals, top):
+        """
+        Start from stored totals (persistence.load_totals): `totals` is the
+        overall row and `top` the leaderboard's (name, row, rank_seq).
+        Everyone else comes later through restore_players().
+        """
+        with self._lock:
+            self.overall = Tally().load_row(totals)
+            self.invalid_commitments, self._seq = totals[-2:]
+            self._players = OrderedDict()
+            for name, row, rank_seq in top:
+                player = self._players[name] = _PlayerTally(name).load_row(row)
+                player.rank_seq = rank_seq
+            self._top = sorted(self._players.values(), key=_PlayerTally.rank_key, reverse=True)
+            self._restored = set(self._players)
+
+    def restore_players(self, rows):
+        """
+        Add stored players, most recently active first, behind everyone
+        active since restore(). A player who played since is merged: their
+        stored counts are added to what they've done since.
+        """
+        with self._lock:
+            for name, row, rank_seq in rows:
+                if name in self._restored:
+                    continue
+                stored = _PlayerTally(name).load_row(row)
+                player = self._players.get(name)
+                if player is None:
+                    player = self._players[name] = stored
+                    self._players.move_to_end(name, last=False)
+                else:
+                    player.add(stored)
+                player.rank_seq = max(player.rank_seq, rank_seq)
+                if player.wins:
+                    self._promote(player)
+            self._evict()
+
+    def _promote(self, player: _PlayerTally):
+        """Re-place a player whose win count just grew (lock held)."""
+        top = self._top
+        if player in top:
+            top.sort(key=_PlayerTally.rank_key, reverse=True)
+        elif len(top) < self.top_k or player.rank_key() > top[-1].rank_key():
+            top.append(player)
+            top.sort(key=_PlayerTally.rank_key, reverse=True)
+            del top[self.top_k:]
+
+    def leaderboard(self) -> list:
+        with self._lock:
+            return [dict(player.to_dict(), rank=rank, player=player.name)
+                    for rank, player in enumerate(self._top, 1)]
+
+    def player_stats(self, name: str):
+        with self._lock:
+            player = self._players.get(name)
+            return None if player is None else dict(player.to_dict(), player=name)
+
+    def global_stats(self) -> dict:
+        with self._lock:
+            stats = self.overall.to_dict()
+            del stats['wins'], stats['win_rate'], stats['games_as_guesser']
+            stats['players'] = len(self._players)
+            stats['players_evicted'] = self.players_evicted
+            stats['invalid_commitments'] = self.invalid_commitments
+            return stats
+
+
+def merge_stats(parts: list) -> dict:
+    """
+    Sum per-shard player_stats() or global_stats() dicts into one.
+
+    Counts add up and rates are worked out again from the sums. For global
+    stats, 'players' counts a player once per shard they played on.
+    """
+    merged = dict(parts[0])
+    merged['guess_distribution'] = _empty_histogram()
+    summed = [key for key in ('games', 'wins', 'games_as_guesser', 'found', 'players',
+                              'players_evicted', 'invalid_commitments') if key in merged]
+    for key in summed:
+        merged[key] = 0
+    guesses_to_win = 0
+    for part in parts:
+        for key in summed:
+            merged[key] += part[key]
+        if part['avg_guesses_to_win'] is not None:
+            guesses_to_win += part['avg_guesses_to_win'] * part['found']
+        for bucket, count in enumerate(part['guess_distribution']):
+            merged['guess_distribution'][bucket] += count
+    guessed = merged.get('games_as_guesser', merged['games'])
+    if 'wins' in merged:
+        merged['win_rate'] = merged['wins'] / merged['games'] if merged['games'] else 0.0
+    merged['find_rate'] = merged['found'] / guessed if guessed else 0.0
+    merged['avg_guesses_to_win'] = round(guesses_to_win) / merged['found'] if merged['found'] else None
+    return merged
+
+
+def merge_leaderboards(player_stats: dict, top_k: int = DEFAULT_TOP_K) -> list:
+    """
+    The overall top `top_k`, given every player on any shard's leaderboard.
+
+    `player_stats` maps each of them to their stats summed over all shards
+    (merge_stats), so the wins compared are totals. A player in no shard's
+    top `top_k` is not a candidate, even if their total would place them.
+    Ties are broken by name: which shard's tie came first isn't known.
+    """
+    ranked = sorted(player_stats.values(), key=lambda stats: (-stats['wins'], stats['player']))
+    return [dict(stats, rank=rank) for rank, stats in enumerate(ranked[:top_k], 1)]
@@ -0,0 +1,382 @@
+"""
+Load generator for the game API.
+
+Drives the real create/commit/guess/reveal flow either in-process through
+Flask's test client or against a running server over pooled keep-alive
+HTTP connections, and reports throughput and latency percentiles per
+endpoint.
+
+Examples:
+    python loadtest.py --games 500 --concurrency 8
+    python loadtest.py --url http://127.0.0.1:5000 --rate 50 --duration 30 \\
+        --mix single=0.6,two=0.3,abandoned=0.1 --output run.json
+    python loadtest.py --games 500 --compare run.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+SCENARIOS = ('single', 'two', 'abandoned')
+
+# Open model: never run more games at once than this, however far behind
+MAX_OPEN_WORKERS = 1024
+
+
+# -- transports ---------------------------------------------------------------
+
+class InProcessTransport:
+    """Calls the Flask app directly through its test client."""
+
+    name = 'in-process'
+
+    def __init__(self):
+        # All in-process traffic shares one client address; don't throttle it
+        os.environ.setdefault('ADMISSION_CONTROL', 'off')
+        from app import app
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: dict = None, headers: dict = None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Talks to a running server, reusing keep-alive connections from a pool."""
+
+    name = 'http'
+
+    def __init__(self, base_url: str, pool_size: int, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(None)
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: dict = None, headers: dict = None):
+        try:
+            conn = self._pool.get_nowait() or self._connect()
+        except queue.Empty:
+            # More callers than pooled connections; the pool grows to fit
+            conn = self._connect()
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = dict(headers or {})
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn.request(method, self.prefix + path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._pool.put(None)
+            raise
+        if response.will_close:
+            conn.close()
+            conn = None
+        self._pool.put(conn)
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return response.status, parsed
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+# -- scenarios ----------------------------------------------------------------
+
+class Recorder:
+    """Per-worker latency samples keyed by endpoint name."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def call(self, transport, endpoint: str, method: str, path: str, body: dict = None,
+             scheduled: float = None):
+        """
+        Make one request and record its latency. With `scheduled`, latency
+        counts from then rather than from when the request went out.
+        """
+        started = time.perf_counter() if scheduled is None else scheduled
+        try:
+            status, data = transport.request(method, path, body)
+        except (http.client.HTTPException, OSError):
+            status, data = 0, None
+        self.samples.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if status == 0 or status >= 500 or (status >= 400 and endpoint != 'guess'):
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        return status, data
+
+
+def play(transport, recorder: Recorder, scenario: str, rng: random.Random,
+         scheduled: float = None):
+    """Run one game of the given scenario; `scheduled` is when it was due to start."""
+    mode = 'single' if scenario == 'single' else 'two'
+    status, data = recorder.call(transport, 'create', 'POST', '/api/game/create',
+                                 {'mode': mode, 'player1': 'Alice', 'player2': 'Bob'},
+                                 scheduled=scheduled)
+    if status != 201 or not data:
+        return
+    game_id = data['game_id']
+    low, high = data['min'], data['max']
+
+    if 'commitment_hash' not in data:
+        # Single-player games arrive with the computer's commitment already made
+        recorder.call(transport, 'commit', 'POST', f'/api/game/{game_id}/commit',
+                      {'secret': rng.randint(low, high)})
+
+    max_guesses = data['max_guesses']
+    if scenario == 'abandoned':
+        max_guesses = rng.randint(0, max_guesses // 2)
+
+    for _ in range(max_guesses):
+        guess = (low + high) // 2
+        status, result = recorder.call(transport, 'guess', 'POST',
+                                       f'/api/game/{game_id}/guess', {'guess': guess})
+        if scenario == 'two':
+            # The opponent's client checks on the game between moves
+            recorder.call(transport, 'stats', 'GET', f'/api/game/{game_id}/stats')
+        if status != 200 or not result or result['game_over']:
+            break
+        # Hot/cold feedback is not directional, so narrow the range at random
+        if rng.random() < 0.5:
+            high = max(low, guess - 1)
+        else:
+            low = min(high, guess + 1)
+
+    if scenario != 'abandoned':
+        recorder.call(transport, 'reveal', 'POST', f'/api/game/{game_id}/reveal')
+
+
+# -- driver -------------------------------------------------------------------
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(transport, concurrency: int, mix: dict, games: int = None,
+        duration: float = None, rate: float = 0.0, seed: int = None) -> dict:
+    """
+    Run the load test and return the summarized results.
+
+    With rate > 0, games arrive as a Poisson process at `rate` games/sec
+    (open model). Arrivals never wait for a free worker: `concurrency`
+    workers start, and another is added whenever a game arrives with none
+    idle, up to MAX_OPEN_WORKERS. Each game's create is timed from when it
+    was due, so any time spent waiting to be sent counts as latency.
+    Otherwise each of `concurrency` workers starts a new game as soon as
+    its previous one finishes (closed model).
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    jobs = queue.Queue(maxsize=0 if rate > 0 else concurrency * 4)
+    stop = threading.Event()
+    recorders = []
+    workers = []
+    idle = [0]
+    lock = threading.Lock()
+
+    def worker(worker_seed):
+        recorder = Recorder()
+        recorders.append(recorder)
+        worker_rng = random.Random(worker_seed)
+        while True:
+            with lock:
+                idle[0] += 1
+            job = jobs.get()
+            with lock:
+                idle[0] -= 1
+            if job is None:
+                return
+            scenario, scheduled = job
+            play(transport, recorder, scenario, worker_rng, scheduled)
+
+    def start_worker():
+        thread = threading.Thread(target=worker, args=(rng.random(),), daemon=True)
+        workers.append(thread)
+        thread.start()
+
+    def producer():
+        started = time.perf_counter()
+        next_at = started
+        issued = 0
+        while not stop.is_set():
+            if games is not None and issued >= games:
+                break
+            if duration is not None and time.perf_counter() - started >= duration:
+                break
+            scheduled = None
+            if rate > 0:
+                next_at += rng.expovariate(rate)
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                scheduled = next_at
+                with lock:
+                    behind = idle[0] <= jobs.qsize()
+                if behind and len(workers) < MAX_OPEN_WORKERS:
+                    start_worker()
+            jobs.put((rng.choices(names, weights)[0], scheduled))
+            issued += 1
+        for _ in range(len(workers)):
+            jobs.put(None)
+
+    started = time.perf_counter()
+    for _ in range(concurrency):
+        start_worker()
+    feeder = threading.Thread(target=producer, daemon=True)
+    feeder.start()
+    try:
+        feeder.join()
+        # No workers are added once the producer is done
+        for thread in workers:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+        feeder.join()
+        for thread in workers:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    return summarize(recorders, elapsed, {
+        'transport': transport.name,
+        'concurrency': concurrency,
+        'rate': rate,
+        'mix': mix,
+        'games': games,
+        'duration': duration,
+        'workers': len(workers),
+    })
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(recorders: list, elapsed: float, config: dict) -> dict:
+    samples = {}
+    errors = {}
+    for recorder in recorders:
+        for endpoint, values in recorder.samples.items():
+            samples.setdefault(endpoint, []).extend(values)
+        for endpoint, count in recorder.errors.items():
+            errors[endpoint] = errors.get(endpoint, 0) + count
+
+    endpoints = {}
+    total = 0
+    for endpoint, values in sorted(samples.items()):
+        values.sort()
+        total += len(values)
+        endpoints[endpoint] = {
+            'count': len(values),
+            'errors': errors.get(endpoint, 0),
+            'throughput': len(values) / elapsed,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': values[-1] * 1000,
+        }
+    return {
+        'config': config,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'elapsed_s': elapsed,
+        'requests': total,
+        'throughput': total / elapsed if elapsed else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"{results['requests']} requests in {results['elapsed_s']:.2f}s "
+          f"({results['throughput']:.1f} req/s, {results['config']['transport']})")
+    width = max([10] + [len(endpoint) for endpoint in results['endpoints']])
+    print(f"  {'endpoint':{width}s} {'count':>7s} {'err':>5s} {'req/s':>8s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint, row in results['endpoints'].items():
+        line = (f"  {endpoint:{width}s} {row['count']:7d} {row['errors']:5d} {row['throughput']:8.1f} "
+                f"{row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f}")
+        base = (baseline or {}).get('endpoints', {}).get(endpoint)
+        if base and base['p50_ms'] and base['p99_ms']:
+            line += (f"  p50 {(row['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f}%"
+                     f"  p99 {(row['p99_ms'] / base['p99_ms'] - 1) * 100:+.1f}%")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Guess the Number API')
+    parser.add_argument('--url', help='base URL of a running server (default: in-process)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='workers (closed loop); with --rate, workers to start with')
+    parser.add_argument('--games', type=int, help='number of games to play')
+    parser.add_argument('--duration', type=float, help='seconds to run')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='game arrivals per second (0 = closed loop)')
+    parser.add_argument('--mix', default='single=0.5,two=0.4,abandoned=0.1')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args()
+
+    if args.games is None and args.duration is None:
+        args.games = 200
+
+    if args.url:
+        transport = HTTPTransport(args.url, pool_size=args.concurrency)
+    else:
+        transport = InProcessTransport()
+    try:
+        results = run(transport, args.concurrency, parse_mix(args.mix), args.games,
+                      args.duration, args.rate, args.seed)
+    finally:
+        transport.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
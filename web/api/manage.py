@@ -0,0 +1,216 @@
+"""
+Maintenance commands for the game API.
+
+Examples:
+    python manage.py export > games.ndjson
+    python manage.py export --since 2025-11-01 --until 2025-12-01 --player Alice
+    python manage.py export --cursor 120000 --output more.ndjson
+    python manage.py memory --games 500
+    python manage.py memory --url http://127.0.0.1:5000 --token s3cret [--snapshot]
+    python manage.py audit 0009o9BkCeYIdwYUJehier [--player Alice]
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.request
+from datetime import datetime
+
+import serialization
+from persistence import DEFAULT_DB_PATH, export_ndjson, open_reader
+
+
+def _timestamp(value: str) -> str:
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date or datetime: {value!r}")
+
+
+def export(args) -> int:
+    conn = open_reader(args.db)
+    if conn is None:
+        print(f"No game history at {args.db}", file=sys.stderr)
+        return 1
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_ndjson(conn, serialization.dumps, since=args.since,
+                                   until=args.until, player=args.player,
+                                   cursor=args.cursor, limit=args.limit):
+            out.write(chunk)
+    finally:
+        conn.close()
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+    return 0
+
+
+def _print_games_report(report: dict):
+    print(f"Active games: {report['games']}, {report['total_bytes'] / 1024:.1f} KiB deep "
+          f"({report['avg_bytes_per_game']:.0f} B/game)")
+    for part, size in report['avg_bytes_by_part'].items():
+        print(f"  {part:14s} {size:10.0f} B/game")
+
+
+def _print_allocations(title: str, rows: list):
+    print(title)
+    for row in rows:
+        diff = f" ({row['bytes_diff']:+d} B, {row['blocks_diff']:+d} blocks)" if 'bytes_diff' in row else ''
+        print(f"  {row['bytes']:>10d} B {row['blocks']:>7d} blocks{diff}  {row['location']}")
+
+
+def _memory_remote(args) -> int:
+    url = args.url.rstrip('/') + '/api/debug/memory'
+    method = 'GET'
+    if args.snapshot:
+        url, method = url + '/snapshot', 'POST'
+    request = urllib.request.Request(f'{url}?top={args.top}', method=method,
+                                     headers={'X-Debug-Token': args.token or ''})
+    with urllib.request.urlopen(request) as response:
+        report = json.load(response)
+    if args.snapshot:
+        print(f"Snapshot {report['snapshot']} taken")
+        if 'diff' in report:
+            diff = report['diff']
+            _print_allocations(f"Changes since snapshot {diff['from']} "
+                               f"({diff['bytes_diff']:+d} B):", diff['top_changes'])
+        return 0
+    _print_games_report(report['games'])
+    tracing = report['tracemalloc']
+    if tracing['tracing']:
+        print(f"Traced: {tracing['traced_bytes'] / 1024:.1f} KiB "
+              f"(peak {tracing['peak_traced_bytes'] / 1024:.1f} KiB)")
+        _print_allocations('Top allocators:', tracing['top_allocators'])
+    else:
+        print("tracemalloc is off; take a snapshot (--snapshot) to start it")
+    return 0
+
+
+def _memory_local(args) -> int:
+    """Play --games games in-process and account for their memory."""
+    # All local traffic comes from one client; don't throttle or persist it
+    os.environ.setdefault('ADMISSION_CONTROL', 'off')
+    os.environ.setdefault('GAME_HISTORY', 'off')
+    import memory
+    from app import active_games, app, event_channels
+
+    client = app.test_client()
+
+    def finish(game_id):
+        for guess in range(1, 11):
+            client.post(f'/api/game/{game_id}/guess', json={'guess': guess})
+        client.post(f'/api/game/{game_id}/reveal')
+
+    # One warm-up game, so first-use imports and caches aren't billed to the games
+    game_id = client.post('/api/game/create', json={'mode': 'two'}).get_json()['game_id']
+    client.post(f'/api/game/{game_id}/commit', json={'secret': 42})
+    finish(game_id)
+    event_channels.purge_closed()
+    memory.start_tracing()
+    before = memory.take_snapshot(args.top)['snapshot']
+
+    game_ids = []
+    for i in range(args.games):
+        game_id = client.post('/api/game/create', json={'mode': 'two'}).get_json()['game_id']
+        client.post(f'/api/game/{game_id}/commit', json={'secret': 42})
+        client.post(f'/api/game/{game_id}/guess', json={'guess': 50})
+        game_ids.append(game_id)
+    during = memory.take_snapshot(args.top)
+
+    _print_games_report(memory.games_report(active_games, event_channels, args.top))
+    diff = during['diff']
+    print(f"tracemalloc: {diff['bytes_diff'] / max(args.games, 1):.0f} B allocated per game "
+          f"(committed, one guess made)")
+    _print_allocations('Top allocation changes:', diff['top_changes'])
+
+    for game_id in game_ids:
+        finish(game_id)
+    # Finished games' channels are normally kept for a while for late readers
+    event_channels.purge_closed()
+    after = memory.take_snapshot(args.top)['snapshot']
+    leak = memory.diff_snapshots(before, after, args.top)
+    print(f"\nAfter revealing all games and dropping their channels: "
+          f"{leak['bytes_diff'] / 1024:+.1f} KiB vs. start")
+    _print_allocations('Still held:', [row for row in leak['top_changes'] if row['bytes_diff'] > 0])
+    return 0
+
+
+def memory_command(args) -> int:
+    return _memory_remote(args) if args.url else _memory_local(args)
+
+
+def audit(args) -> int:
+    if not args.archive or not os.path.isdir(args.archive):
+        print(f"No commitment archive at {args.archive}", file=sys.stderr)
+        return 1
+    import archive
+    import ids
+    shard = ids.shard_of(args.game_id)
+    directory = archive.shard_directory(args.archive, shard or 0)
+    if shard is None or not os.path.isdir(directory):
+        print(f"No archived commitment for game {args.game_id}", file=sys.stderr)
+        return 1
+    store = archive.CommitmentArchive(directory, readonly=True)
+    if args.player is None:
+        records = store.find_game(args.game_id)
+    else:
+        record = store.find(args.game_id, args.player)
+        records = [record] if record is not None else []
+    if not records:
+        print(f"No archived commitment for game {args.game_id}", file=sys.stderr)
+        return 1
+    checks = [archive.check_record(record) for record in records]
+    for record, check in zip(records, checks):
+        print(json.dumps(dict(record, **check), indent=2))
+    return 0 if all(check['commitment_valid'] for check in checks) else 2
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Guess the Number API maintenance')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser(
+        'export', help='stream finished games as NDJSON',
+        description='Stream finished games as NDJSON. Each line carries its id; '
+                    'pass the last one as --cursor to resume.')
+    export_parser.add_argument('--db', default=os.environ.get('GAME_HISTORY_DB', DEFAULT_DB_PATH))
+    export_parser.add_argument('--since', type=_timestamp, help='finished at or after (ISO)')
+    export_parser.add_argument('--until', type=_timestamp, help='finished before (ISO)')
+    export_parser.add_argument('--player', help='games where this player committed or guessed')
+    export_parser.add_argument('--cursor', type=int, default=0, help='resume after this id')
+    export_parser.add_argument('--limit', type=int, help='stop after this many games')
+    export_parser.add_argument('--output', '-o', help='write to a file instead of stdout')
+    export_parser.set_defaults(handler=export)
+
+    memory_parser = commands.add_parser(
+        'memory', help='per-game byte accounting and tracemalloc reports',
+        description='Without --url, plays games in-process and reports what each one '
+                    'costs; with --url, asks a running server (needs DEBUG_TOKEN there).')
+    memory_parser.add_argument('--games', type=int, default=200, help='games to play in-process')
+    memory_parser.add_argument('--url', help='base URL of a running server')
+    memory_parser.add_argument('--token', default=os.environ.get('DEBUG_TOKEN'),
+                               help='X-Debug-Token for --url (default: $DEBUG_TOKEN)')
+    memory_parser.add_argument('--snapshot', action='store_true',
+                               help='with --url: take a snapshot and diff it with the last one')
+    memory_parser.add_argument('--top', type=int, default=10)
+    memory_parser.set_defaults(handler=memory_command)
+
+    audit_parser = commands.add_parser(
+        'audit', help="check a finished game's archived commitments",
+        description="Look up a revealed game in the commitment archive and check its "
+                    "commitments again. Exits 2 if one doesn't check out.")
+    audit_parser.add_argument('game_id')
+    audit_parser.add_argument('--player', help='only this player\'s commitment')
+    audit_parser.add_argument('--archive', default=os.environ.get('COMMITMENT_ARCHIVE'),
+                              help='archive directory (default: $COMMITMENT_ARCHIVE)')
+    audit_parser.set_defaults(handler=audit)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
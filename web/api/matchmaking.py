@@ -0,0 +1,222 @@
+"""
+Lobby and matchmaking queue for two-player games.
+
+Players waiting for an opponent sit in a FIFO per (range, difficulty)
+bucket. Join, cancel and status are O(1): buckets are OrderedDicts keyed
+by ticket id, and stale waiters are popped (amortized O(1)) from the
+front of a global join-order queue. When a second player joins a
+non-empty bucket, the pair is taken and the game created under one lock,
+so a waiter can never be matched twice or cancelled mid-match. A player is
+never paired with a ticket from their own client, so one client can't
+fill both seats of a game.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+DIFFICULTIES = {'easy': 15, 'normal': 10, 'hard': 6}   # difficulty -> max guesses
+DEFAULT_WAIT_TIMEOUT = 120.0    # seconds a player waits before the ticket expires
+DEFAULT_RESULT_TTL = 300.0      # seconds a finished ticket stays readable
+DEFAULT_MAX_WAITING = 100000    # queued players across all buckets
+MAX_STATUS_WAIT = 25.0          # cap on long-poll waits
+
+WAITING = 'waiting'
+MATCHED = 'matched'
+EXPIRED = 'expired'
+CANCELLED = 'cancelled'
+
+
+class Ticket:
+    __slots__ = ('id', 'player', 'client_id', 'bucket', 'joined', 'status',
+                 'game_id', 'role', 'opponent', 'event')
+
+    def __init__(self, ticket_id: str, player: str, client_id: str, bucket: tuple, joined: float):
+        self.id = ticket_id
+        self.player = player
+        self.client_id = client_id
+        self.bucket = bucket
+        self.joined = joined
+        self.status = WAITING
+        self.game_id = None
+        self.role = None
+        self.opponent = None
+        self.event = None       # created only when someone long-polls
+
+    def to_dict(self) -> dict:
+        min_num, max_num, difficulty = self.bucket
+        data = {
+            'ticket_id': self.id,
+            'status': self.status,
+            'player': self.player,
+            'min': min_num,
+            'max': max_num,
+            'difficulty': difficulty,
+            'max_guesses': DIFFICULTIES[difficulty]
+        }
+        if self.status == MATCHED:
+            data.update(game_id=self.game_id, role=self.role, opponent=self.opponent)
+        return data
+
+
+class Matchmaker:
+    """
+    Pairs waiting players and starts their game.
+
+    `start_game(waiter, joiner)` is called with the lock held and must
+    return the new game id. The player who waited commits the secret; the
+    one who completed the pair guesses. `on_drop(ticket)` is called (lock
+    held) when a waiting ticket is cancelled or expires.
+    """
+
+    def __init__(self, start_game, wait_timeout: float = DEFAULT_WAIT_TIMEOUT,
+                 result_ttl: float = DEFAULT_RESULT_TTL, max_waiting: int = DEFAULT_MAX_WAITING,
+                 on_drop=None):
+        self.start_game = start_game
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.max_waiting = max_waiting
+        self.on_drop = on_drop
+        self.matched = 0
+        self.expired = 0
+        self.cancelled = 0
+        self._buckets = {}
+        self._tickets = OrderedDict()   # every live ticket, oldest first
+        self._waiting = OrderedDict()   # waiting tickets across all buckets, oldest first
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def join(self, player: str, client_id: str, min_num: int, max_num: int,
+             difficulty: str):
+        """
+        Queue a player, or pair them with the oldest waiter in their bucket
+        from another client.
+
+        Returns the new ticket, or None if the lobby is full.
+        """
+        bucket = (min_num, max_num, difficulty)
+        now = time.monotonic()
+        ticket = Ticket(secrets.token_urlsafe(12), player, client_id, bucket, now)
+        with self._lock:
+            self._sweep(now)
+            queue = self._buckets.get(bucket)
+            # Skips only this client's own tickets, which its game cap keeps few
+            waiter = next((waiting for waiting in queue.values()
+                           if waiting.client_id != client_id), None) if queue else None
+            if waiter is None and len(self._waiting) >= self.max_waiting:
+                return None
+            self._tickets[ticket.id] = ticket
+            if waiter is not None:
+                try:
+                    game_id = self.start_game(waiter, ticket)
+                except BaseException:
+                    # The waiter keeps its place; the joiner is not queued
+                    del self._tickets[ticket.id]
+                    raise
+                del queue[waiter.id]
+                del self._waiting[waiter.id]
+                if not queue:
+                    del self._buckets[bucket]
+                self._pair(waiter, ticket, game_id)
+            else:
+                if queue is None:
+                    queue = self._buckets[bucket] = OrderedDict()
+                queue[ticket.id] = ticket
+                self._waiting[ticket.id] = ticket
+        return ticket
+
+    def _pair(self, waiter: Ticket, joiner: Ticket, game_id: str):
+        """Mark both tickets matched and wake a long-polling waiter (lock held)."""
+        for ticket, role, opponent in ((waiter, 'committer', joiner), (joiner, 'guesser', waiter)):
+            ticket.status = MATCHED
+            ticket.game_id = game_id
+            ticket.role = role
+            ticket.opponent = opponent.player
+            if ticket.event is not None:
+                ticket.event.set()
+        self.matched += 1
+
+    def _drop(self, ticket: Ticket, status: str):
+        """Take a waiting ticket out of its bucket (lock held)."""
+        queue = self._buckets.get(ticket.bucket)
+        if queue is not None:
+            queue.pop(ticket.id, None)
+            if not queue:
+                del self._buckets[ticket.bucket]
+        del self._waiting[ticket.id]
+        ticket.status = status
+        if status == EXPIRED:
+            self.expired += 1
+        else:
+            self.cancelled += 1
+        if ticket.event is not None:
+            ticket.event.set()
+        if self.on_drop is not None:
+            self.on_drop(ticket)
+
+    def _sweep(self, now: float):
+        """
+        Expire stale waiters and forget tickets past their readable lifetime
+        (lock held). Both maps are in join order, so this only ever looks
+        at entries it removes, plus one.
+        """
+        waiting = self._waiting
+        cutoff = now - self.wait_timeout
+        while waiting:
+            ticket = next(iter(waiting.values()))
+            if ticket.joined >= cutoff:
+                break
+            self._drop(ticket, EXPIRED)
+
+        tickets = self._tickets
+        cutoff -= self.result_ttl
+        while tickets:
+            ticket = next(iter(tickets.values()))
+            if ticket.joined >= cutoff:
+                break
+            tickets.popitem(last=False)
+
+    def get(self, ticket_id: str):
+        """Current ticket state (stale waiters are expired first), or None."""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            return self._tickets.get(ticket_id)
+
+    def wait(self, ticket_id: str, timeout: float):
+        """Like get(), but block up to `timeout` seconds while the ticket is waiting."""
+        ticket = self.get(ticket_id)
+        if ticket is None or ticket.status != WAITING or timeout <= 0:
+            return ticket
+        with self._lock:
+            if ticket.status != WAITING:
+                return ticket
+            if ticket.event is None:
+                ticket.event = threading.Event()
+            event = ticket.event
+        remaining = ticket.joined + self.wait_timeout - time.monotonic()
+        event.wait(max(0.0, min(timeout, MAX_STATUS_WAIT, remaining)))
+        return self.get(ticket_id)
+
+    def cancel(self, ticket_id: str):
+        """Leave the queue; returns the ticket (already matched ones stay matched)."""
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is not None and ticket.status == WAITING:
+                self._drop(ticket, CANCELLED)
+            return ticket
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'waiting': len(self._waiting),
+                'buckets': len(self._buckets),
+                'matched': self.matched,
+                'expired': self.expired,
+                'cancelled': self.cancelled
+            }
@@ -0,0 +1,196 @@
+"""
+Memory introspection: deep object sizes and tracemalloc snapshots.
+
+deep_sizeof() walks containers, instance __dict__s and __slots__ and sums
+sys.getsizeof() over every object it reaches once. It does not follow
+functions, bound methods, classes or modules, so a game's event listeners
+don't drag the whole event registry into its size, nor the process-wide
+SecretCache every game holds a reference to. Strings and small ints
+shared between games are counted for each game measured on its own.
+"""
+
+import sys
+import threading
+import tracemalloc
+import types
+from collections import OrderedDict, deque
+
+from secret_cache import SecretCache
+
+
+# SecretCache is shared by every game (secret_cache.shared), not part of any one
+_NOT_FOLLOWED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, types.FrameType, SecretCache)
+
+MAX_SNAPSHOTS = 4
+DEFAULT_TOP = 10
+
+
+def _slot_names(cls) -> tuple:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return tuple(names)
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Bytes held by obj and everything it references (each object counted once)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _NOT_FOLLOWED):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+
+        instance_dict = getattr(current, '__dict__', None)
+        if isinstance(instance_dict, dict):
+            stack.append(instance_dict)
+        for name in _slot_names(type(current)):
+            if name not in ('__dict__', '__weakref__'):
+                value = getattr(current, name, None)
+                if value is not None:
+                    stack.append(value)
+    return total
+
+
+def game_breakdown(game_data: dict, channel=None) -> dict:
+    """Deep sizes of one active_games entry and its parts, in bytes."""
+    game = game_data['game']
+    protocol = game.protocol
+    breakdown = {
+        'entry': deep_sizeof(game_data),
+        'game': deep_sizeof(game),
+        'game_state': deep_sizeof(game.game_state),
+        'protocol': deep_sizeof(protocol),
+        'commitments': deep_sizeof(protocol.commitments),
+        'cipher': deep_sizeof(protocol.cipher),
+    }
+    if 'stats_body' in game_data:
+        breakdown['stats_body'] = deep_sizeof(game_data['stats_body'])
+    if channel is not None:
+        breakdown['event_channel'] = deep_sizeof(channel)
+    return breakdown
+
+
+def games_report(active_games: dict, channels=None, top: int = DEFAULT_TOP) -> dict:
+    """Per-game byte accounting over all active games: totals, averages and the largest."""
+    # Copy first; requests may add or remove games while we walk them
+    games = list(active_games.items())
+    sizes = []
+    parts = {}
+    for game_id, game_data in games:
+        channel = channels.get(game_id) if channels is not None else None
+        breakdown = game_breakdown(game_data, channel)
+        sizes.append((breakdown['entry'] + breakdown.get('event_channel', 0), game_id, breakdown))
+        for name, size in breakdown.items():
+            parts[name] = parts.get(name, 0) + size
+
+    sizes.sort(key=lambda item: item[0], reverse=True)
+    count = len(sizes)
+    total = sum(size for size, _, _ in sizes)
+    return {
+        'games': count,
+        'total_bytes': total,
+        'avg_bytes_per_game': total / count if count else 0,
+        'avg_bytes_by_part': {name: size / count for name, size in parts.items()} if count else {},
+        'largest': [dict(breakdown, game_id=game_id, total=size)
+                    for size, game_id, breakdown in sizes[:top]]
+    }
+
+
+# -- tracemalloc --------------------------------------------------------------
+
+_snapshots = OrderedDict()      # snapshot number -> tracemalloc.Snapshot
+_snapshot_lock = threading.Lock()
+_snapshot_counter = 0
+
+
+def start_tracing(frames: int = 1) -> bool:
+    """Start tracemalloc if needed; returns True if it was already running."""
+    if tracemalloc.is_tracing():
+        return True
+    tracemalloc.start(frames)
+    return False
+
+
+def _stat_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    return {'location': f'{frame.filename}:{frame.lineno}', 'bytes': stat.size, 'blocks': stat.count}
+
+
+def _diff_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    return {
+        'location': f'{frame.filename}:{frame.lineno}',
+        'bytes': stat.size,
+        'bytes_diff': stat.size_diff,
+        'blocks': stat.count,
+        'blocks_diff': stat.count_diff
+    }
+
+
+def _filtered(snapshot):
+    # Leave out tracemalloc's own bookkeeping
+    return snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+
+def tracing_report(top: int = DEFAULT_TOP) -> dict:
+    """Current traced memory and the top allocation sites (tracing must be on)."""
+    if not tracemalloc.is_tracing():
+        return {'tracing': False}
+    current, peak = tracemalloc.get_traced_memory()
+    stats = _filtered(tracemalloc.take_snapshot()).statistics('lineno')[:top]
+    return {
+        'tracing': True,
+        'traced_bytes': current,
+        'peak_traced_bytes': peak,
+        'top_allocators': [_stat_dict(stat) for stat in stats],
+        'snapshots': list(_snapshots)
+    }
+
+
+def take_snapshot(top: int = DEFAULT_TOP) -> dict:
+    """
+    Take a numbered snapshot (starting tracemalloc if needed) and diff it
+    against the previous one. Only the last MAX_SNAPSHOTS are kept.
+    """
+    global _snapshot_counter
+    was_tracing = start_tracing()
+    snapshot = _filtered(tracemalloc.take_snapshot())
+    with _snapshot_lock:
+        previous_id = next(reversed(_snapshots)) if _snapshots else None
+        _snapshot_counter += 1
+        snapshot_id = _snapshot_counter
+        _snapshots[snapshot_id] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    report = {'snapshot': snapshot_id, 'tracing_was_on': was_tracing}
+    if previous_id is not None:
+        report['diff'] = diff_snapshots(previous_id, snapshot_id, top)
+    return report
+
+
+def diff_snapshots(old_id: int, new_id: int, top: int = DEFAULT_TOP) -> dict:
+    """Biggest allocation changes between two kept snapshots."""
+    with _snapshot_lock:
+        old = _snapshots.get(old_id)
+        new = _snapshots.get(new_id)
+    if old is None or new is None:
+        raise KeyError(f"Snapshot {old_id if old is None else new_id} is not kept")
+    stats = new.compare_to(old, 'lineno')
+    return {
+        'from': old_id,
+        'to': new_id,
+        'bytes_diff': sum(stat.size_diff for stat in stats),
+        'top_changes': [_diff_dict(stat) for stat in stats[:top]]
+    }
@@ -0,0 +1,220 @@
+"""
+Lightweight metrics for the game API, exposed in Prometheus text format.
+
+Recording is lock-free on the hot path: every thread writes to its own
+shard and shards are only merged when /api/metrics is scraped.
+"""
+
+import threading
+from bisect import bisect_left
+
+
+# Latency buckets in seconds, from sub-millisecond crypto to slow requests
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges with per-thread recording shards.
+
+    Each thread increments plain dict entries in its own shard, so no lock
+    is taken per observation. A lock is only taken the first time a thread
+    records and when shards are merged for exposition; shards of threads
+    that have exited are folded into a retired shard so memory stays bounded.
+    """
+
+    def __init__(self):
+        self._meta = {}
+        self._gauges = {}
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    # -- definitions ---------------------------------------------------------
+
+    def counter(self, name: str, help_text: str):
+        """Declare a counter."""
+        self._meta[name] = ('counter', help_text, None)
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        """Declare a histogram with fixed upper bounds."""
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def gauge(self, name: str, help_text: str, callback):
+        """Declare a gauge whose value is read from `callback()` at scrape time."""
+        self._meta[name] = ('gauge', help_text, None)
+        self._gauges[name] = callback
+
+    # -- recording (hot path) ------------------------------------------------
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._fold_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+            return shard
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1):
+        """Increment a counter. `labels` is a tuple of (key, value) pairs."""
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: tuple = ()):
+        """Record one histogram observation."""
+        shard = self._shard()
+        key = (name, labels)
+        buckets = self._meta[name][2]
+        cells = shard.get(key)
+        if cells is None:
+            # One cell per bucket, one for +Inf, then the running sum
+            cells = shard[key] = [0] * (len(buckets) + 2)
+        cells[bisect_left(buckets, value)] += 1
+        cells[-1] += value
+
+    # -- merging and exposition ----------------------------------------------
+
+    @staticmethod
+    def _merge_into(target: dict, shard: dict):
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                cells = target.get(key)
+                if cells is None:
+                    target[key] = list(value)
+                else:
+                    for i, cell in enumerate(value):
+                        cells[i] += cell
+            else:
+                target[key] = target.get(key, 0) + value
+
+    def _fold_dead_shards(self):
+        """Merge shards of exited threads into the retired shard (lock held)."""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge_into(self._retired, shard)
+        self._shards = alive
+
+    def snapshot(self) -> dict:
+        """Merged view of every shard: {(name, labels): value or cells}."""
+        with self._lock:
+            self._fold_dead_shards()
+            merged = {}
+            self._merge_into(merged, self._retired)
+            for _, shard in self._shards:
+                self._merge_into(merged, shard)
+        return merged
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        values = self.snapshot()
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'gauge':
+                lines.append(f"{name} {_format_value(self._gauges[name]())}")
+                continue
+            samples = by_name.get(name)
+            if not samples and kind == 'counter':
+                lines.append(f"{name} 0")
+                continue
+            for labels, value in sorted(samples or [], key=lambda item: item[0]):
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    pairs = (f'{key}="{_escape_label(value)}"' for key, value in labels)
+    return '{' + ','.join(pairs) + '}'
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def merge_expositions(texts) -> str:
+    """
+    Combine the /api/metrics output of several shards into one exposition.
+
+    Each sample gets a shard="<index>" label, and the samples of one metric
+    are kept together under a single HELP/TYPE header, as the format requires.
+    """
+    families = {}       # name -> (header lines, samples), in first-seen order
+    for shard, text in enumerate(texts):
+        label = f'shard="{shard}"'
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith('#'):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ('HELP', 'TYPE'):
+                    family = families.setdefault(parts[2], ([], []))
+                    if line not in family[0]:
+                        family[0].append(line)
+                continue
+            name, brace, rest = line.partition('{')
+            if brace:
+                sample = f'{name}{{{label},{rest}' if not rest.startswith('}') \
+                    else f'{name}{{{label}{rest}'
+            else:
+                name, _, value = line.partition(' ')
+                sample = f'{name}{{{label}}} {value}'
+            if family is None:
+                family = families.setdefault(name, ([], []))
+            family[1].append(sample)
+    lines = []
+    for header, samples in families.values():
+        lines.extend(header)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+# Shared registry used by the API and the crypto timing hook
+registry = MetricsRegistry()
+
+registry.histogram('http_request_duration_seconds',
+                   'Request latency by route and method')
+registry.counter('http_requests_total',
+                 'Requests by route, method and status code')
+registry.histogram('crypto_operation_duration_seconds',
+                   'Time spent in CommitRevealProtocol stages')
+registry.counter('games_created_total', 'Games created')
+registry.counter('games_finished_total', 'Games revealed and verified')
+registry.counter('games_abandoned_total', 'Games dropped after going idle')
+
+
+def observe_crypto(stage: str, seconds: float):
+    """Timing hook for CommitRevealProtocol (encrypt/hash/commit/decrypt)."""
+    registry.observe('crypto_operation_duration_seconds', seconds, (('stage', stage),))
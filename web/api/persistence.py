@@ -0,0 +1,341 @@
+"""
+Write-behind persistence of finished games to a local SQLite analytics store.
+
+Request handlers only append a record to an in-memory queue; a background
+writer drains it in batches, one transaction per batch, so no request ever
+waits on disk I/O. The queue is bounded: when the writer falls behind,
+new records are dropped and counted instead of growing memory.
+
+The same transaction folds the batch into per-shard leaderboard totals
+(shard_totals, player_totals), so a restarting server loads those with
+load_totals() and iter_player_totals() instead of rescanning every game. Totals start counting from
+the first batch written with these tables; older games aren't back-filled.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+
+import ids
+from leaderboard import Tally, fold_game
+
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), 'arcium_game_history.db')
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.5    # seconds a partial batch may wait
+DEFAULT_MAX_BACKLOG = 50000     # records queued before new ones are dropped
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id TEXT NOT NULL,
+    mode TEXT,
+    committer TEXT,
+    guesser TEXT,
+    secret INTEGER,
+    guesses TEXT,
+    guesses_made INTEGER,
+    winner TEXT,
+    result TEXT,
+    commitment_valid INTEGER,
+    created_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS games_finished_at ON games (finished_at);
+CREATE INDEX IF NOT EXISTS games_committer ON games (committer, id);
+CREATE INDEX IF NOT EXISTS games_guesser ON games (guesser, id);
+CREATE TABLE IF NOT EXISTS shard_totals (
+    shard INTEGER PRIMARY KEY,
+    games INTEGER, wins INTEGER, guessed INTEGER, found INTEGER, guesses_to_win INTEGER,
+    histogram TEXT,
+    invalid_commitments INTEGER,
+    seq INTEGER
+);
+CREATE TABLE IF NOT EXISTS player_totals (
+    shard INTEGER,
+    player TEXT,
+    games INTEGER, wins INTEGER, guessed INTEGER, found INTEGER, guesses_to_win INTEGER,
+    histogram TEXT,
+    rank_seq INTEGER,
+    last_seq INTEGER,
+    PRIMARY KEY (shard, player)
+);
+CREATE INDEX IF NOT EXISTS player_totals_recent ON player_totals (shard, last_seq);
+CREATE INDEX IF NOT EXISTS player_totals_wins ON player_totals (shard, wins, rank_seq);
+"""
+
+COLUMNS = ('game_id', 'mode', 'committer', 'guesser', 'secret', 'guesses', 'guesses_made',
+           'winner', 'result', 'commitment_valid', 'created_at', 'finished_at')
+
+_INSERT = f"INSERT INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+_TALLY = ', '.join(Tally.COUNTERS + ('histogram',))
+_FIELD = {column: index for index, column in enumerate(COLUMNS)}
+
+_STOP = object()
+
+EXPORT_PAGE_SIZE = 1000
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the history database, creating the schema if needed."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class GameHistoryWriter:
+    """Background batch writer for finished-game records."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_backlog: int = DEFAULT_MAX_BACKLOG):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, record: dict) -> bool:
+        """Queue a record without blocking; returns False if it was dropped."""
+        if self._thread is None:
+            self._start()
+        row = tuple(record.get(column) for column in COLUMNS)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='game-history-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        conn = connect(self.path)
+        stopping = False
+        while not stopping:
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            while row is not None:
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    row = None
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn, batch: list):
+        try:
+            with conn:
+                conn.executemany(_INSERT, batch)
+                _update_totals(conn, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error:
+            self.errors += 1
+            self.dropped += len(batch)
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        # Blocking put: the stop marker must not be dropped when the queue is full
+        self._queue.put(_STOP, timeout=timeout)
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'errors': self.errors,
+            'backlog': self.backlog
+        }
+
+
+def _update_totals(conn: sqlite3.Connection, batch: list):
+    """Fold a batch of game rows into the stored totals of their shards (in its transaction)."""
+    shards = {}
+    players = {}
+    for row in batch:
+        shard = ids.shard_of(row[_FIELD['game_id']]) or 0
+        totals = shards.get(shard)
+        if totals is None:
+            stored = conn.execute(f'SELECT {_TALLY}, invalid_commitments, seq FROM shard_totals '
+                                  'WHERE shard = ?', (shard,)).fetchone()
+            totals = shards[shard] = [Tally().load_row(stored), *stored[-2:]] if stored \
+                else [Tally(), 0, 0]
+        totals[2] += 1
+        seq = totals[2]
+        if not row[_FIELD['commitment_valid']]:
+            totals[1] += 1
+
+        tallies = []
+        for name in (row[_FIELD['committer']], row[_FIELD['guesser']]):
+            player = players.get((shard, name))
+            if player is None:
+                stored = conn.execute(f'SELECT {_TALLY}, rank_seq FROM player_totals '
+                                      'WHERE shard = ? AND player = ?', (shard, name)).fetchone()
+                # [tally, rank_seq, last_seq]
+                player = players[shard, name] = [Tally().load_row(stored), stored[-1], 0] \
+                    if stored else [Tally(), 0, 0]
+            player[2] = seq
+            tallies.append(player)
+        guesses = json.loads(row[_FIELD['guesses']] or '[]')
+        found = row[_FIELD['secret']] in guesses
+        winning = fold_game(totals[0], tallies[0][0], tallies[1][0], found,
+                            row[_FIELD['guesses_made']])
+        tallies[0 if winning is tallies[0][0] else 1][1] = seq
+
+    conn.executemany(
+        f'INSERT OR REPLACE INTO shard_totals (shard, {_TALLY}, invalid_commitments, seq) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(shard, *tally.to_row(), invalid, seq) for shard, (tally, invalid, seq) in shards.items()])
+    conn.executemany(
+        f'INSERT OR REPLACE INTO player_totals (shard, player, {_TALLY}, rank_seq, last_seq) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(shard, name, *tally.to_row(), rank_seq, last_seq)
+         for (shard, name), (tally, rank_seq, last_seq) in players.items()])
+
+
+def load_totals(conn: sqlite3.Connection, shard: int, top_k: int):
+    """
+    A shard's stored overall totals and its top_k players as (name, row,
+    rank_seq), for GameAggregates.restore(); None if nothing is stored.
+    """
+    totals = conn.execute(f'SELECT {_TALLY}, invalid_commitments, seq FROM shard_totals '
+                          'WHERE shard = ?', (shard,)).fetchone()
+    if totals is None:
+        return None
+    top = conn.execute(f'SELECT player, {_TALLY}, rank_seq FROM player_totals WHERE shard = ? '
+                       'ORDER BY wins DESC, rank_seq LIMIT ?', (shard, top_k)).fetchall()
+    return totals, [(row[0], row[1:-1], row[-1]) for row in top]
+
+
+def iter_player_totals(conn: sqlite3.Connection, shard: int, limit: int,
+                       page_size: int = EXPORT_PAGE_SIZE):
+    """Yield pages of a shard's (name, row, rank_seq), most recently active first."""
+    cursor = conn.execute(f'SELECT player, {_TALLY}, rank_seq FROM player_totals WHERE shard = ? '
+                          'ORDER BY last_seq DESC LIMIT ?', (shard, limit))
+    while True:
+        rows = cursor.fetchmany(page_size)
+        if not rows:
+            return
+        yield [(row[0], row[1:-1], row[-1]) for row in rows]
+
+
+def open_reader(path: str):
+    """Read-only connection to the history database, or None if it doesn't exist yet."""
+    if not os.path.exists(path):
+        return None
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def iter_games(conn: sqlite3.Connection, since: str = None, until: str = None,
+               player: str = None, cursor: int = 0, limit: int = None,
+               page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yield pages of finished games (lists of dicts) in id order.
+
+    Filters run in SQLite and pages are fetched by keyset (id > last id),
+    so memory stays at one page however many games match. `since` and
+    `until` bound finished_at (inclusive/exclusive); `cursor` is the last
+    id already seen.
+    """
+    conditions = ['id > ?']
+    params = []
+    if since is not None:
+        conditions.append('finished_at >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('finished_at < ?')
+        params.append(until)
+    where = ' AND '.join(conditions)
+    columns = ', '.join(('id',) + COLUMNS)
+
+    if player is None:
+        sql = f'SELECT {columns} FROM games WHERE {where} ORDER BY id LIMIT ?'
+        build_params = lambda last, size: [last] + params + [size]
+    else:
+        # One ordered index range per role, merged by id
+        sql = (f'SELECT {columns} FROM games WHERE committer = ? AND {where} UNION '
+               f'SELECT {columns} FROM games WHERE guesser = ? AND {where} ORDER BY id LIMIT ?')
+        build_params = lambda last, size: [player, last] + params + [player, last] + params + [size]
+
+    names = ('id',) + COLUMNS
+    remaining = limit
+    last = cursor
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        rows = conn.execute(sql, build_params(last, size)).fetchall()
+        if not rows:
+            return
+        page = []
+        for row in rows:
+            record = dict(zip(names, row))
+            record['guesses'] = json.loads(record['guesses']) if record['guesses'] else []
+            record['commitment_valid'] = bool(record['commitment_valid'])
+            page.append(record)
+        yield page
+        last = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+
+def export_ndjson(conn: sqlite3.Connection, dumps, **filters):
+    """Yield NDJSON bytes, one chunk per page, for iter_games(**filters)."""
+    for page in iter_games(conn, **filters):
+        yield b''.join(dumps(record) + b'\n' for record in page)
+
+
+def build_record(game_id: str, game_data: dict, result: dict, finished_at: str) -> dict:
+    """Flatten a revealed game into a history record."""
+    game = game_data['game']
+    return {
+        'game_id': game_id,
+        'mode': game_data.get('mode'),
+        'committer': game.game_state['committer'],
+        'guesser': game.game_state['guesser'],
+        'secret': result['secret_number'],
+        'guesses': json.dumps(game.game_state['guesses']),
+        'guesses_made': result['guesses_made'],
+        'winner': result['game_winner'],
+        'result': result['result'],
+        'commitment_valid': int(bool(result['commitment_valid'])),
+        'created_at': game_data.get('created_at'),
+        'finished_at': finished_at
+    }
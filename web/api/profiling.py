@@ -0,0 +1,152 @@
+"""
+Opt-in request profiling for the game API.
+
+Profiles 1-in-N requests, or any request carrying a valid X-Profile-Token
+header. The stack sampler writes per-request and aggregated collapsed-stack
+files (flamegraph.pl / speedscope / inferno format); cProfile mode writes
+per-request and aggregated .prof files (snakeviz / flameprof).
+
+Nothing is installed unless PROFILE_DIR is set, so the disabled cost is zero.
+
+Environment:
+    PROFILE_DIR       output directory; enables profiling when set
+    PROFILE_SAMPLE    profile every Nth request (0 = header-triggered only)
+    PROFILE_TOKEN     secret value for the X-Profile-Token header
+    PROFILE_MODE      'stack' (sampling, default) or 'cprofile'
+    PROFILE_INTERVAL  stack sampling interval in seconds (default 0.001)
+"""
+
+import cProfile
+import hmac
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_TOKEN'
+AGGREGATE_FILE = 'aggregate.collapsed'
+AGGREGATE_PROFILE = 'aggregate.prof'
+
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame chain root-first as 'a;b;c' for collapsed-stack files."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def write_collapsed(path: str, stacks: Counter):
+    """Write stack counts in collapsed format: '<stack> <count>' per line."""
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles selected requests."""
+
+    def __init__(self, wsgi_app, output_dir: str, sample_every: int = 0,
+                 token: str = None, mode: str = 'stack', interval: float = 0.001):
+        if mode not in ('stack', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.wsgi_app = wsgi_app
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self.token = token
+        self.mode = mode
+        self.interval = interval
+        self.aggregate = Counter()
+        self.aggregate_stats = None
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _should_profile(self, environ) -> bool:
+        if self.sample_every and next(self._counter) % self.sample_every == 0:
+            return True
+        supplied = environ.get(PROFILE_HEADER)
+        return bool(self.token and supplied and hmac.compare_digest(supplied, self.token))
+
+    def __call__(self, environ, start_response):
+        if not self._should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+
+        started = time.time()
+        name = _UNSAFE_FILENAME.sub('_', f"{environ.get('REQUEST_METHOD')}{environ.get('PATH_INFO')}")
+        base = os.path.join(self.output_dir, f"{started:.6f}-{name.strip('_')}")
+
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            result = profiler.runcall(self.wsgi_app, environ, start_response)
+            profiler.dump_stats(base + '.prof')
+            with self._lock:
+                if self.aggregate_stats is None:
+                    self.aggregate_stats = pstats.Stats(profiler)
+                else:
+                    self.aggregate_stats.add(profiler)
+                self.aggregate_stats.dump_stats(os.path.join(self.output_dir, AGGREGATE_PROFILE))
+            return result
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            stacks = sampler.stop()
+            write_collapsed(base + '.collapsed', stacks)
+            with self._lock:
+                self.aggregate.update(stacks)
+                write_collapsed(os.path.join(self.output_dir, AGGREGATE_FILE), self.aggregate)
+
+
+def install_from_env(app):
+    """Wrap app.wsgi_app with ProfilingMiddleware if PROFILE_DIR is set."""
+    output_dir = os.environ.get('PROFILE_DIR')
+    if not output_dir:
+        return None
+    middleware = ProfilingMiddleware(
+        app.wsgi_app,
+        output_dir,
+        sample_every=int(os.environ.get('PROFILE_SAMPLE', '0')),
+        token=os.environ.get('PROFILE_TOKEN') or None,
+        mode=os.environ.get('PROFILE_MODE', 'stack'),
+        interval=float(os.environ.get('PROFILE_INTERVAL', '0.001'))
+    )
+    app.wsgi_app = middleware
+    return middleware
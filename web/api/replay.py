@@ -0,0 +1,325 @@
+"""
+Replay recorded API traffic (see traffic.py) against a local instance.
+
+Requests are sent on the recorded timeline, scaled by --speed (1, 10, ... or
+max for no waiting), from many threads at once. Requests for the same game
+or lobby ticket keep their recorded order: each one waits for the one before
+it. IDs handed out during the replay are mapped onto the recorded ones as the
+responses arrive. The recording drops committed secrets. A revealed game is
+replayed with the secret its reveal returned; one that was never revealed
+gets the guess whose feedback said it hit, or else a number nobody guessed,
+so every recorded guess hits or misses as it did originally.
+
+Reports per-endpoint latency like loadtest.py. A response whose status
+differs from the recorded one counts as an error. --compare prints the
+latency deltas against an earlier run, e.g. from another build:
+
+    python replay.py traffic.log.gz --url http://127.0.0.1:5000 --speed 10 --output a.json
+    python replay.py traffic.log.gz --url http://127.0.0.1:5000 --speed 10 --compare a.json
+
+Each recorded client is sent as X-Forwarded-For. The target only believes
+it when started with TRUSTED_PROXIES=1; otherwise every request comes from
+the replaying host and shares one client's rate limit. Run the target with
+ADMISSION_CONTROL=off when comparing builds, since at --speed 10 or more
+the per-client limits answer 429 where the recording had 200.
+
+Single-player games can't be replayed exactly: the computer's secret is random.
+Lobby pairings depend on timing, so a lobby game may not form again at max
+speed. Requests for games or tickets that never got an ID in the replay are
+reported as unmapped.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from game import CORRECT_FEEDBACK
+from loadtest import HTTPTransport, InProcessTransport, Recorder, percentile, print_report, summarize
+from traffic import read_traffic
+
+
+DEFAULT_CONCURRENCY = 64
+
+_GAME_PATH = re.compile(r'^/api/game/(?!create$)([^/]+)(/.*)?$')
+_LOBBY_PATH = re.compile(r'^/api/lobby/(?!join$)([^/]+)$')
+
+
+class Step:
+    """One recorded request, with the ID it depends on (if any)."""
+
+    __slots__ = ('record', 'due', 'needs', 'rest')
+
+    def __init__(self, record: dict, due: float, needs, rest: str):
+        self.record = record
+        self.due = due          # seconds after the replay starts
+        self.needs = needs      # ('game', recorded id), ('ticket', recorded id) or None
+        self.rest = rest        # path after the ID
+
+
+def _secret_for(guesses: list, low: int) -> int:
+    """A secret that makes the recorded hit, if any, the only hit."""
+    for guess, hit in guesses:
+        if hit and isinstance(guess, int):
+            return guess
+    taken = {guess for guess, _ in guesses}
+    secret = low
+    while secret in taken:
+        secret += 1
+    return secret
+
+
+def plan(records: list, speed: float):
+    """
+    Turn records into timed steps.
+
+    Returns (steps, secrets, skipped). `secrets` maps a recorded game ID to
+    the secret its commit should use. `skipped` counts requests for IDs that
+    no recorded response handed out, e.g. games started before the recording.
+    """
+    records.sort(key=lambda record: record['ts'])
+    start = records[0]['ts'] if records else 0.0
+    issued = set()
+    ticket_min = {}
+    game_min = {}
+    for record in records:
+        response = record.get('response') or {}
+        body = record.get('body') or {}
+        ticket_id = response.get('ticket_id')
+        if ticket_id is not None:
+            issued.add(('ticket', ticket_id))
+            ticket_min[ticket_id] = body.get('min', 1)
+        game_id = response.get('game_id')
+        if game_id is not None:
+            issued.add(('game', game_id))
+            match = _LOBBY_PATH.match(record['path'])
+            ticket = ticket_id if ticket_id is not None else (match and match.group(1))
+            if ticket in ticket_min:
+                game_min[game_id] = ticket_min[ticket]
+
+    steps = []
+    guesses = {}
+    revealed = {}
+    skipped = 0
+    for record in records:
+        needs, rest = None, ''
+        match = _GAME_PATH.match(record['path'])
+        if match:
+            needs, rest = ('game', match.group(1)), match.group(2) or ''
+            response = record.get('response') or {}
+            if record['endpoint'] == 'make_guess':
+                # Running out of guesses ends a game too; only the feedback tells a hit.
+                # Recordings from before feedback was kept only have game_over.
+                hit = response['feedback'] == CORRECT_FEEDBACK if 'feedback' in response \
+                    else bool(response.get('game_over'))
+                guesses.setdefault(match.group(1), []).append((
+                    (record.get('body') or {}).get('guess'), hit))
+            elif record['endpoint'] == 'reveal_game' and 'secret_number' in response:
+                revealed[match.group(1)] = response['secret_number']
+        else:
+            match = _LOBBY_PATH.match(record['path'])
+            if match:
+                needs = ('ticket', match.group(1))
+        if needs is not None and needs not in issued:
+            skipped += 1
+            continue
+        due = 0.0 if speed == float('inf') else (record['ts'] - start) / speed
+        steps.append(Step(record, due, needs, rest))
+
+    secrets = {game_id: _secret_for(made, game_min.get(game_id, 1))
+               for game_id, made in guesses.items()}
+    secrets.update(revealed)
+    return steps, secrets, skipped
+
+
+class _Flow:
+    __slots__ = ('pending', 'busy')
+
+    def __init__(self):
+        self.pending = deque()
+        self.busy = False
+
+
+class Replayer:
+    """Sends planned steps on time, one at a time per game or ticket."""
+
+    def __init__(self, transport, steps: list, secrets: dict, concurrency: int):
+        self.transport = transport
+        self.steps = steps
+        self.secrets = secrets
+        self.recorder = Recorder()
+        self.lags = []
+        self.sent = 0
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._inflight = 0
+        self._ids = {}          # ('game' | 'ticket', recorded id) -> replayed id
+        self._flows = {}
+        self._started = 0.0
+
+    def run(self) -> float:
+        """Replay every step; returns the elapsed time."""
+        self._started = time.perf_counter()
+        for step in self.steps:
+            delay = self._started + step.due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self._lock:
+                if step.needs is None:
+                    self._submit(step)
+                else:
+                    self._flows.setdefault(step.needs, _Flow()).pending.append(step)
+                    self._pump(step.needs)
+        with self._idle:
+            while self._inflight:
+                self._idle.wait()
+        elapsed = time.perf_counter() - self._started
+        self._executor.shutdown()
+        return elapsed
+
+    @property
+    def unmapped(self) -> int:
+        """Steps still waiting for an ID the replay never handed out."""
+        return sum(len(flow.pending) for flow in self._flows.values())
+
+    # Both called with the lock held
+    def _submit(self, step: Step):
+        self._inflight += 1
+        self._executor.submit(self._send, step)
+
+    def _pump(self, key):
+        flow = self._flows.get(key)
+        if flow is None or flow.busy or not flow.pending or key not in self._ids:
+            return
+        flow.busy = True
+        self._submit(flow.pending.popleft())
+
+    def _send(self, step: Step):
+        record = step.record
+        path = record['path']
+        body = record.get('body')
+        if step.needs is not None:
+            kind, recorded_id = step.needs
+            replayed_id = self._ids[step.needs]
+            path = f'/api/game/{replayed_id}{step.rest}' if kind == 'game' \
+                else f'/api/lobby/{replayed_id}'
+            if record['endpoint'] == 'commit_number' and body and body.get('secret') is None:
+                body = dict(body, secret=self.secrets.get(recorded_id, 1))
+        if record.get('query'):
+            path += '?' + record['query']
+
+        endpoint = record['endpoint'] or 'unmatched'
+        started = time.perf_counter()
+        try:
+            status, data = self.transport.request(record['method'], path, body,
+                                                  {'X-Forwarded-For': record['client']})
+        except OSError:
+            status, data = 0, None
+        finished = time.perf_counter()
+
+        with self._lock:
+            self.sent += 1
+            self.lags.append(started - self._started - step.due)
+            self.recorder.samples.setdefault(endpoint, []).append(finished - started)
+            if status != record['status']:
+                self.recorder.errors[endpoint] = self.recorder.errors.get(endpoint, 0) + 1
+            self._learn(record.get('response'), data)
+            if step.needs is not None:
+                self._flows[step.needs].busy = False
+                self._pump(step.needs)
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.notify_all()
+
+    def _learn(self, recorded, data):
+        """Map IDs from a recorded response onto the replayed response's."""
+        if not recorded or not isinstance(data, dict):
+            return
+        for field, kind in (('game_id', 'game'), ('ticket_id', 'ticket')):
+            if recorded.get(field) is not None and data.get(field) is not None:
+                key = (kind, recorded[field])
+                if key not in self._ids:
+                    self._ids[key] = data[field]
+                    self._pump(key)
+
+
+def _speed(value: str) -> float:
+    if value == 'max':
+        return float('inf')
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded traffic against the API')
+    parser.add_argument('log', help='traffic log written with TRAFFIC_LOG')
+    parser.add_argument('--url', help='base URL of a running server (default: in-process)')
+    parser.add_argument('--speed', type=_speed, default=1.0, help="time scale, or 'max'")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='requests in flight at most')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args()
+
+    records = []
+    for record in read_traffic(args.log):
+        if args.limit is not None and len(records) >= args.limit:
+            break
+        records.append(record)
+    steps, secrets, skipped = plan(records, args.speed)
+    recorded_span = records[-1]['ts'] - records[0]['ts'] if records else 0.0
+
+    if args.url:
+        transport = HTTPTransport(args.url, pool_size=args.concurrency)
+    else:
+        transport = InProcessTransport()
+    replayer = Replayer(transport, steps, secrets, args.concurrency)
+    try:
+        elapsed = replayer.run()
+    finally:
+        transport.close()
+
+    lags = sorted(replayer.lags)
+    config = {'transport': transport.name, 'log': args.log,
+              'speed': 'max' if args.speed == float('inf') else args.speed,
+              'concurrency': args.concurrency}
+    results = summarize([replayer.recorder], elapsed, config)
+    results['replay'] = {
+        'recorded_requests': len(records),
+        'recorded_span_s': recorded_span,
+        'sent': replayer.sent,
+        'status_mismatches': sum(replayer.recorder.errors.values()),
+        'skipped': skipped,
+        'unmapped': replayer.unmapped,
+        'schedule_lag_p50_ms': percentile(lags, 0.50) * 1000,
+        'schedule_lag_p99_ms': percentile(lags, 0.99) * 1000,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    replay = results['replay']
+    print(f"Replayed {replay['sent']} of {replay['recorded_requests']} recorded requests "
+          f"({replay['recorded_span_s']:.1f}s recorded, speed {config['speed']})")
+    print(f"  skipped {replay['skipped']} (IDs from before the recording), "
+          f"unmapped {replay['unmapped']}, status differs from recording: "
+          f"{replay['status_mismatches']} (the err column)")
+    print(f"  send lag behind the timeline: p50 {replay['schedule_lag_p50_ms']:.1f} ms, "
+          f"p99 {replay['schedule_lag_p99_ms']:.1f} ms")
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Local routing front end for several API worker processes.
+
+Each worker runs with its own SHARD_ID, so every game ID it hands out names
+it as the owner (see ids.py). The router forwards /api/game/<id>/... to the
+owning worker, spreads new games over the workers round-robin, and sends
+the lobby and everything else to shard 0. Game state never leaves the
+process that created it. The leaderboard, global stats and metrics are
+asked of every worker and merged, since each worker only counts its own
+games.
+
+Connections to the workers are kept alive and pooled: a forwarded request
+normally reuses an open socket instead of paying for a TCP handshake.
+Streaming responses (events, spectate) are relayed chunk by chunk.
+--spawn serves the workers with waitress when it is installed. Flask's dev
+server closes every connection, so without waitress nothing is reused.
+
+    python router.py --spawn 4
+    python router.py --worker 127.0.0.1:5001 --worker 127.0.0.1:5002
+
+Workers given with --worker must be started with SHARD_ID set to their
+position in the list (0, 1, ...) and with TRUSTED_PROXIES=1, so they take
+the client's address from the X-Forwarded-For the router sets.
+"""
+
+import argparse
+import atexit
+import http.client
+import importlib.util
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+import ids
+import leaderboard
+import metrics
+
+
+DEFAULT_PORT = 8000
+DEFAULT_WORKER_PORT = 5001
+DEFAULT_MAX_IDLE = 32
+WORKER_THREADS = 32
+UPSTREAM_TIMEOUT = 60
+COPY_CHUNK = 64 * 1024
+
+# Headers that describe one connection and must not be passed along
+HOP_BY_HOP = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade'
+})
+
+# A reused keep-alive socket the worker already closed fails with one of these
+_STALE_CONNECTION = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+_GAME_PREFIX = '/api/game/'
+
+# GET routes answered by every worker and merged (see RouterHandler._fan_out)
+FAN_OUT_ROUTES = frozenset({'/api/leaderboard', '/api/stats/global', '/api/metrics'})
+
+
+class WorkerPool:
+    """Idle keep-alive connections to one worker, reused newest first."""
+
+    def __init__(self, host: str, port: int, max_idle: int = DEFAULT_MAX_IDLE,
+                 timeout: float = UPSTREAM_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.opened = 0
+        self.reused = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> str:
+        return f'{self.host}:{self.port}'
+
+    def acquire(self):
+        """Return (connection, reused)."""
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.opened += 1
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def release(self, conn):
+        """Keep a connection whose response was read to the end."""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+        return {'worker': self.address, 'opened': self.opened, 'reused': self.reused, 'idle': idle}
+
+
+class Router:
+    """Maps request paths to worker pools; worker i owns shard i."""
+
+    def __init__(self, workers, max_idle: int = DEFAULT_MAX_IDLE):
+        if not workers:
+            raise ValueError("At least one worker is required")
+        if len(workers) > ids.MAX_SHARD + 1:
+            raise ValueError(f"At most {ids.MAX_SHARD + 1} workers are supported")
+        self.pools = [WorkerPool(host, port, max_idle) for host, port in workers]
+        self._next_create = itertools.count()
+
+    def shard_for(self, path: str):
+        """Shard that should serve `path`, or None for a game no worker owns."""
+        if not path.startswith(_GAME_PREFIX):
+            return 0
+        game_id = path[len(_GAME_PREFIX):].split('/', 1)[0].split('?', 1)[0]
+        if game_id == 'create':
+            return next(self._next_create) % len(self.pools)
+        shard = ids.shard_of(game_id)
+        return shard if shard is not None and shard < len(self.pools) else None
+
+    def check_workers(self):
+        """Ask each worker which shard it is; returns a list of problems."""
+        problems = []
+        for shard, pool in enumerate(self.pools):
+            conn = http.client.HTTPConnection(pool.host, pool.port, timeout=5)
+            try:
+                conn.request('GET', '/api/health')
+                reported = json.loads(conn.getresponse().read()).get('shard', 0)
+            except (OSError, ValueError) as e:
+                problems.append(f"{pool.address}: not reachable ({e})")
+                continue
+            finally:
+                conn.close()
+            if reported != shard:
+                problems.append(f"{pool.address}: is shard {reported}, expected {shard}")
+        return problems
+
+    def close(self):
+        for pool in self.pools:
+            pool.close()
+
+
+def _json_error(message: str) -> bytes:
+    return json.dumps({'success': False, 'error': message}).encode() + b'\n'
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """Relays one client connection's requests to the owning workers."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    router = None       # set by make_server()
+    quiet = True
+
+    def do_GET(self):
+        self._proxy()
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = do_GET
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: bytes, headers=()):
+        self.send_response(status)
+        content_type = 'application/json'
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == 'content-type':
+                content_type = value
+            elif lowered not in HOP_BY_HOP and lowered not in ('content-length', 'date', 'server'):
+                self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _upstream_headers(self) -> list:
+        headers = [(name, value) for name, value in self.headers.items()
+                   if name.lower() not in HOP_BY_HOP and name.lower() != 'x-forwarded-for']
+        # The workers rate-limit per client. Whatever X-Forwarded-For the
+        # client sent is dropped: the workers see only the peer we saw.
+        headers.append(('X-Forwarded-For', self.client_address[0]))
+        return headers
+
+    def _proxy(self):
+        if self.command == 'GET' and self.path.split('?', 1)[0] in FAN_OUT_ROUTES:
+            self._fan_out()
+            return
+        shard = self.router.shard_for(self.path)
+        if shard is None:
+            self._reply(404, _json_error('Game not found'))
+            return
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            self.close_connection = True
+            self._reply(411, _json_error('Content-Length required'))
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+
+        pool = self.router.pools[shard]
+        try:
+            conn, response = self._send_upstream(pool, self._upstream_headers(), body)
+        except OSError:
+            self._reply(502, _json_error(f'Worker for shard {shard} is unavailable'))
+            return
+        self._relay(pool, conn, response)
+
+    def _fetch(self, pool, path, headers):
+        """GET `path` from one worker and read the whole reply: (status, headers, body)."""
+        conn, response = self._send_upstream(pool, headers, None, path)
+        try:
+            body = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            pool.release(conn)
+        return response.status, response.getheaders(), body
+
+    def _fetch_all(self, path, headers):
+        return [self._fetch(pool, path, headers) for pool in self.router.pools]
+
+    def _fan_out(self):
+        """Ask every worker and merge: these routes only count the worker's own games."""
+        path = self.path.split('?', 1)[0]
+        headers = [(name, value) for name, value in self._upstream_headers()
+                   if name.lower() != 'content-length']
+        try:
+            replies = self._fetch_all(self.path, headers)
+            for status, reply_headers, body in replies:
+                if status not in (200, 404):
+                    # e.g. a 429: pass the worker's answer on as it is
+                    self._reply(status, body, reply_headers)
+                    return
+            found = [body for status, _, body in replies if status == 200]
+            if path == '/api/metrics':
+                merged = metrics.merge_expositions(body.decode() for body in found)
+                self._reply(200, merged.encode(), [('Content-Type', 'text/plain; version=0.0.4')])
+                return
+            parts = [json.loads(body) for body in found]
+            if path == '/api/leaderboard':
+                result = {'success': True, 'leaderboard': self._merge_leaderboards(parts, headers)}
+            elif not parts:
+                self._reply(404, replies[0][2], replies[0][1])
+                return
+            elif 'players' in parts[0]:
+                result = {'success': True,
+                          'players': _merge_players(part['players'] for part in parts)}
+            else:
+                result = {'success': True,
+                          'stats': leaderboard.merge_stats([part['stats'] for part in parts])}
+        except (OSError, ValueError, KeyError) as e:
+            self._reply(502, _json_error(f'Could not merge worker replies: {e}'))
+            return
+        self._reply(200, json.dumps(result).encode())
+
+    def _merge_leaderboards(self, parts, headers):
+        # Each board's wins only count that shard's games: fetch every listed
+        # player's stats from all shards and rank on the totals
+        names = sorted({entry['player'] for part in parts for entry in part['leaderboard']})
+        if not names:
+            return []
+        query = urlencode([('player', name) for name in names])
+        lists = []
+        for status, _, body in self._fetch_all(f'/api/stats/global?{query}', headers):
+            if status == 200:
+                reply = json.loads(body)
+                # One name gets the single-player reply shape
+                lists.append(reply['players'] if 'players' in reply else [reply['stats']])
+            elif status != 404:
+                raise ValueError(f'a worker answered {status} for player stats')
+        totals = {stats['player']: stats for stats in _merge_players(lists)}
+        return leaderboard.merge_leaderboards(totals)
+
+    def _send_upstream(self, pool, headers, body, path=None):
+        while True:
+            conn, reused = pool.acquire()
+            try:
+                conn.putrequest(self.command, path or self.path, skip_host=True,
+                                skip_accept_encoding=True)
+                for name, value in headers:
+                    conn.putheader(name, value)
+                conn.endheaders(body)
+                return conn, conn.getresponse()
+            except _STALE_CONNECTION:
+                conn.close()
+                if not reused:
+                    raise
+                # The worker closed this idle socket; retry once on a fresh one
+            except BaseException:
+                conn.close()
+                raise
+
+    def _relay(self, pool, conn, response):
+        has_body = self.command != 'HEAD' and response.status not in (204, 304) \
+            and response.status >= 200
+        length = response.getheader('Content-Length')
+        chunked = has_body and length is None
+
+        self.log_request(response.status)
+        self.send_response_only(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_BY_HOP:
+                self.send_header(name, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            if chunked:
+                while True:
+                    data = response.read1(COPY_CHUNK)
+                    if not data:
+                        break
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.write(b'0\r\n\r\n')
+            elif has_body:
+                while True:
+                    data = response.read(COPY_CHUNK)
+                    if not data:
+                        break
+                    self.wfile.write(data)
+        except OSError:
+            # Client went away (e.g. a spectator closed the tab) or the worker did
+            self.close_connection = True
+            conn.close()
+            return
+
+        response.close()
+        if response.will_close:
+            conn.close()
+        else:
+            pool.release(conn)
+
+
+def _merge_players(lists) -> list:
+    """Sum per-worker lists of player stats, player by player."""
+    by_player = {}
+    for players in lists:
+        for stats in players:
+            by_player.setdefault(stats['player'], []).append(stats)
+    return [leaderboard.merge_stats(stats) for stats in by_player.values()]
+
+
+def make_server(router: Router, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                quiet: bool = True) -> ThreadingHTTPServer:
+    handler = type('BoundRouterHandler', (RouterHandler,), {'router': router, 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def worker_command(host: str, port: int) -> list:
+    """Command line serving wsgi.py on host:port."""
+    if importlib.util.find_spec('waitress') is None:
+        # Flask's dev server closes every connection, so nothing gets pooled
+        return [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run',
+                '--host', host, '--port', str(port)]
+    return [sys.executable, '-m', 'waitress', f'--listen={host}:{port}',
+            f'--threads={WORKER_THREADS}', 'wsgi:app']
+
+
+def spawn_workers(count: int, host: str = '127.0.0.1', base_port: int = DEFAULT_WORKER_PORT,
+                  startup_timeout: float = 30):
+    """Start `count` workers serving wsgi.py as shards 0..count-1."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    workers = []
+    for shard in range(count):
+        port = base_port + shard
+        env = dict(os.environ, SHARD_ID=str(shard), TRUSTED_PROXIES='1')
+        processes.append(subprocess.Popen(worker_command(host, port), cwd=here, env=env,
+                                          stdout=subprocess.DEVNULL))
+        workers.append((host, port))
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    atexit.register(stop)
+
+    deadline = time.monotonic() + startup_timeout
+    router = Router(workers)
+    while router.check_workers():
+        if time.monotonic() > deadline:
+            raise RuntimeError("Workers did not start: " + '; '.join(router.check_workers()))
+        time.sleep(0.2)
+    return workers
+
+
+def _address(value: str):
+    host, _, port = value.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got {value!r}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--worker', type=_address, action='append', default=[],
+                        metavar='HOST:PORT', help='worker for the next shard, in order')
+    parser.add_argument('--spawn', type=int, default=0, metavar='N',
+                        help='start N local workers on ports from --worker-port')
+    parser.add_argument('--worker-port', type=int, default=DEFAULT_WORKER_PORT)
+    parser.add_argument('--max-idle', type=int, default=DEFAULT_MAX_IDLE,
+                        help='idle keep-alive connections kept per worker')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    workers = list(args.worker)
+    if args.spawn:
+        workers += spawn_workers(args.spawn, base_port=args.worker_port)
+    if not workers:
+        parser.error("give --worker HOST:PORT (repeatable) or --spawn N")
+
+    router = Router(workers, max_idle=args.max_idle)
+    for problem in router.check_workers():
+        print(f"warning: {problem}", file=sys.stderr)
+    server = make_server(router, args.host, args.port, quiet=not args.verbose)
+    print(f"Routing http://{args.host}:{args.port} to {len(workers)} worker(s): "
+          + ', '.join(pool.address for pool in router.pools))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        router.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
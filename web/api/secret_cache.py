@@ -0,0 +1,179 @@
+"""
+Short-lived cache of decrypted secrets.
+
+A game keeps its secret only inside its encrypted commitment. Feedback on
+a guess needs the number, and decrypting the Fernet token on every guess
+would make a guess about ten times slower, so the plaintext is kept here
+instead, for a bounded time:
+
+  * an entry expires `ttl` seconds after it was stored, however busy its
+    game is; the next guess decrypts again,
+  * at most `capacity` entries; when full, the oldest goes first,
+  * a background sweeper drops expired entries within `sweep_interval`
+    seconds even if no game asks for them again,
+  * a game that ends drops its entry at once (discard()).
+
+Each number is held in a bytearray that is overwritten with zeros when
+its entry goes. That is as far as zeroing goes in Python: the int handed
+back by get() can't be wiped and lives until it is garbage collected
+(small ones are shared singletons), but the cache's own copy never
+outlives its TTL.
+"""
+
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CAPACITY = 10000
+DEFAULT_TTL = 30.0              # seconds
+DEFAULT_SWEEP_INTERVAL = 1.0    # seconds
+
+# Secrets that fit are stored as 8 bytes: unpacking is several times cheaper
+# than int.from_bytes. Bigger ones take 9 bytes or more, so length tells them apart.
+_INT64 = struct.Struct('!q')
+
+
+def _pack(secret: int) -> bytearray:
+    if -2 ** 63 <= secret < 2 ** 63:
+        return bytearray(_INT64.pack(secret))
+    return bytearray(secret.to_bytes((secret.bit_length() + 8) // 8, 'big', signed=True))
+
+
+def _unpack(buffer: bytearray) -> int:
+    if len(buffer) == _INT64.size:
+        return _INT64.unpack(buffer)[0]
+    return int.from_bytes(buffer, 'big', signed=True)
+
+
+def _wipe(buffer: bytearray):
+    buffer[:] = bytes(len(buffer))
+
+
+class SecretCache:
+    """
+    Secrets by key (a game's commitment hash), each expiring `ttl` seconds
+    after it was stored.
+
+    Entries are kept in the order they were stored, which with one TTL for
+    all is also the order they expire in: evicting and sweeping only ever
+    look at the front.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl: float = DEFAULT_TTL,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL, name: str = 'secret-sweeper'):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()   # key -> (expires_at, bytearray)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        The cached secret for `key`, or None (a miss) if absent or expired.
+
+        Runs on every guess, so it takes no lock. Every path that wipes a
+        buffer removes its entry first, so a value read while the entry is
+        still in place (checked again after reading) was never wiped.
+        Expired entries are left for the sweeper or the next put().
+        """
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            buffer = entry[1]
+            secret = _INT64.unpack(buffer)[0] if len(buffer) == 8 else _unpack(buffer)
+            if entries.get(key) is entry:
+                self.hits += 1      # unlocked: a racing update may be lost
+                return secret
+        self.misses += 1
+        return None
+
+    def put(self, key, secret: int):
+        """Store `secret` for `key` for the next `ttl` seconds."""
+        buffer = _pack(secret)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                _wipe(old[1])
+            while len(self._entries) >= self.capacity:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                _wipe(evicted)
+                self.evictions += 1
+            self._entries[key] = (time.monotonic() + self.ttl, buffer)
+        if self._thread is None:
+            self._start()
+        self._wake.set()
+
+    def discard(self, key):
+        """Drop and wipe the entry for `key`, if any."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                _wipe(entry[1])
+
+    def sweep(self) -> int:
+        """Drop and wipe every expired entry; returns how many went."""
+        now = time.monotonic()
+        swept = 0
+        with self._lock:
+            while self._entries:
+                key, (expires_at, buffer) = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                del self._entries[key]
+                _wipe(buffer)
+                swept += 1
+            self.expirations += swept
+        return swept
+
+    def clear(self):
+        """Drop and wipe every entry."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for _, buffer in entries:
+            _wipe(buffer)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.sweep()
+            if self._entries:
+                time.sleep(self.sweep_interval)
+            else:
+                # Nothing to expire: sleep until the next put()
+                self._wake.wait()
+                self._wake.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+# Shared by every game in the process
+shared = SecretCache()
@@ -0,0 +1,146 @@
+"""
+Pluggable JSON serialization for API responses and commitment payloads.
+Uses orjson when it is installed and falls back to the standard library.
+API responses come out as the same bytes as Flask's default encoder either
+way. orjson writes some floats differently (1e-05 as 0.00001, 1e+16 as
+1e16, NaN and Infinity as null), so a response holding one of those is
+encoded with the standard library instead. Internal payloads (dumps())
+take orjson's output as is.
+"""
+
+import json
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+# Python's repr() switches to exponent notation outside this range; orjson doesn't
+_PLAIN_FLOATS = (1e-4, 1e16)
+
+
+def _escape_non_ascii(match) -> str:
+    """Escape one character the way json.dumps(ensure_ascii=True) does."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u%04x' % code
+    code -= 0x10000
+    return '\\u%04x\\u%04x' % (0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+def _has_divergent_float(obj) -> bool:
+    """True if obj holds a float that orjson and the stdlib would write differently."""
+    low, high = _PLAIN_FLOATS
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind is float:
+            magnitude = abs(value)
+            # NaN fails both comparisons; infinity fails the second
+            if magnitude and not low <= magnitude < high:
+                return True
+        elif kind is dict:
+            stack.extend(value.values())
+        elif kind is list or kind is tuple:
+            stack.extend(value)
+    return False
+
+
+class StdlibBackend:
+    """Reference encoder: the standard library json module."""
+
+    name = 'json'
+
+    @staticmethod
+    def dumps_compact(obj, default=None) -> bytes:
+        """Sorted, compact, ASCII-only JSON (Flask's production format)."""
+        return json.dumps(
+            obj, default=default, ensure_ascii=True, sort_keys=True, separators=(',', ':')
+        ).encode()
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        """Unsorted JSON for internal payloads."""
+        return json.dumps(obj).encode()
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+class OrjsonBackend:
+    """orjson encoder, post-processed to match the stdlib byte for byte in dumps_compact()."""
+
+    name = 'orjson'
+
+    # Let Flask's `default` handle these so they serialize exactly as before
+    _OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+    @classmethod
+    def dumps_compact(cls, obj, default=None) -> bytes:
+        """Sorted, compact, ASCII-only JSON (Flask's production format)."""
+        if _has_divergent_float(obj):
+            return StdlibBackend.dumps_compact(obj, default)
+        try:
+            data = orjson.dumps(obj, default=default, option=cls._OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            # Non-string keys, huge ints, lone surrogates: let the stdlib decide
+            return StdlibBackend.dumps_compact(obj, default)
+        if data.isascii():
+            return data
+        return _NON_ASCII.sub(_escape_non_ascii, data.decode()).encode()
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        """Unsorted compact JSON for internal payloads."""
+        return orjson.dumps(obj)
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+backend = OrjsonBackend if orjson is not None else StdlibBackend
+
+
+def dumps(obj) -> bytes:
+    """Serialize an internal payload (e.g. commitment data) to bytes."""
+    return backend.dumps(obj)
+
+
+def loads(data):
+    """Deserialize JSON bytes or str."""
+    return backend.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by the fastest available encoder.
+
+    jsonify() and request.json go through it unchanged. Compact responses
+    are byte-identical to DefaultJSONProvider; pretty-printed (debug)
+    responses are delegated to it.
+    """
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return backend.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not (self.sort_keys and self.ensure_ascii):
+            return super().response(*args, **kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            backend.dumps_compact(obj, self.default) + b'\n', mimetype=self.mimetype
+        )
@@ -0,0 +1,229 @@
+"""
+Warm restarts: snapshot active games at shutdown, restore them on demand.
+
+On a graceful shutdown every active game, with its commitment state, is
+written to one local file. The next process maps that file and restores a
+game only when a request first asks for it. Startup reads a fixed-size
+header, so it takes the same time for ten games or a million.
+
+File layout (integers big-endian):
+
+    header   b'ARCSNAP' + format version (1 byte), game count (u32),
+             index offset (u64)
+    records  one compact JSON array per game (see GAME_FIELDS)
+    index    one fixed-width entry per game, sorted by game ID:
+             game ID (ID_LENGTH ASCII bytes), record offset (u64),
+             record length (u32)
+
+A lookup is a binary search over the mapped index: about 20 probes for a
+million games, and only the pages it touches are read from disk.
+
+The file holds each game's Fernet key next to its encrypted commitment,
+so it is created readable by its owner only.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+import serialization
+from encryption import CommitRevealProtocol
+from game import GuessTheNumberGame
+from ids import ID_LENGTH
+
+
+FORMAT_VERSION = 1
+MAGIC = b'ARCSNAP' + bytes((FORMAT_VERSION,))
+HEADER = struct.Struct('!8sIQ')
+INDEX_ENTRY = struct.Struct(f'!{ID_LENGTH}sQI')
+
+# Order of the values in each record
+GAME_FIELDS = ('mode', 'player1', 'player2', 'created_at', 'client_id', 'idle_since',
+               'min', 'max', 'max_guesses', 'version', 'state', 'key', 'commitments')
+
+
+def encode_game(game_data: dict, now: float, now_monotonic: float) -> bytes:
+    """One record. Idle time is kept as a wall-clock time; monotonic clocks restart."""
+    game = game_data['game']
+    return serialization.dumps([
+        game_data['mode'],
+        game_data['player1'],
+        game_data['player2'],
+        game_data['created_at'],
+        game_data['client_id'],
+        now - (now_monotonic - game_data['last_active']),
+        game.min_num,
+        game.max_num,
+        game.max_guesses,
+        game.version,
+        game.game_state,
+        game.protocol.key.decode(),
+        game.protocol.commitments,
+    ])
+
+
+def decode_game(record: bytes, now: float, now_monotonic: float) -> dict:
+    """An active_games entry rebuilt from a record. No event channel is attached."""
+    values = dict(zip(GAME_FIELDS, serialization.loads(record)))
+    protocol = CommitRevealProtocol.restore(values['key'].encode(), values['commitments'])
+    game = GuessTheNumberGame(min_num=values['min'], max_num=values['max'],
+                              max_guesses=values['max_guesses'], protocol=protocol)
+    game.game_state = values['state']
+    # Snapshots from before secret_cache.py carry the secret in plain text
+    game.game_state.pop('secret_number', None)
+    game.version = values['version']
+    game_data = {
+        'game': game,
+        'mode': values['mode'],
+        'player1': values['player1'],
+        'player2': values['player2'],
+        'created_at': values['created_at'],
+        'last_active': now_monotonic - max(0.0, now - values['idle_since']),
+        'client_id': values['client_id'],
+    }
+    # The handlers' copy of the hash; the game state has it too
+    if game.game_state['commitment_hash'] is not None:
+        game_data['commitment_hash'] = game.game_state['commitment_hash']
+    return game_data
+
+
+def write_snapshot(path: str, records) -> int:
+    """
+    Write (game_id, record bytes) pairs to `path`, replacing it atomically.
+
+    Returns the number of games written. Game IDs that aren't ID_LENGTH
+    ASCII characters are skipped.
+    """
+    index = []
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, 0))
+            offset = HEADER.size
+            for game_id, record in records:
+                key = game_id.encode('ascii', 'replace')
+                if len(key) != ID_LENGTH:
+                    continue
+                f.write(record)
+                index.append((key, offset, len(record)))
+                offset += len(record)
+            index.sort()
+            f.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in index))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, len(index), offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(index)
+
+
+class Snapshot:
+    """
+    A snapshot file mapped for lookups. Each game can be taken once.
+
+    Raises ValueError for a file that isn't a snapshot or is truncated.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._taken = set()
+        self._map = None
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a game snapshot")
+            magic, self.count, self._index_offset = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} game snapshot")
+            size = os.fstat(f.fileno()).st_size
+            if self._index_offset + self.count * INDEX_ENTRY.size != size:
+                raise ValueError(f"{path} is truncated")
+            if self.count:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        """Games not taken yet."""
+        return self.count - len(self._taken)
+
+    def _find(self, key: bytes) -> int:
+        """Index position of `key`, or -1."""
+        view, base, size = self._map, self._index_offset, INDEX_ENTRY.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = base + middle * size
+            probe = view[start:start + ID_LENGTH]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def _record(self, position: int) -> bytes:
+        _, offset, length = INDEX_ENTRY.unpack_from(self._map, self._index_offset
+                                                    + position * INDEX_ENTRY.size)
+        return self._map[offset:offset + length]
+
+    def take(self, game_id: str):
+        """The record for `game_id`, once; None if absent or already taken."""
+        if self._map is None or len(game_id) != ID_LENGTH:
+            return None
+        key = game_id.encode('ascii', 'replace')
+        with self._lock:
+            if key in self._taken:
+                return None
+            position = self._find(key)
+            if position < 0:
+                return None
+            self._taken.add(key)
+            return self._record(position)
+
+    def leftovers(self):
+        """(game_id, record) for every game never taken, e.g. to carry into the next snapshot."""
+        if self._map is None:
+            return
+        for position in range(self.count):
+            start = self._index_offset + position * INDEX_ENTRY.size
+            key = self._map[start:start + ID_LENGTH]
+            if key not in self._taken:
+                yield key.decode('ascii'), self._record(position)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def save_games(path: str, active_games: dict, previous: Snapshot = None,
+               max_idle: float = None) -> int:
+    """
+    Snapshot `active_games`, plus the games of `previous` that were never
+    restored, unless they have been idle for more than `max_idle` seconds.
+    """
+    now, now_monotonic = time.time(), time.monotonic()
+
+    def records():
+        for game_id, game_data in list(active_games.items()):
+            yield game_id, encode_game(game_data, now, now_monotonic)
+        if previous is not None:
+            for game_id, record in previous.leftovers():
+                if game_id in active_games:
+                    continue
+                if max_idle is not None and \
+                        now - serialization.loads(record)[GAME_FIELDS.index('idle_since')] > max_idle:
+                    continue
+                yield game_id, record
+
+    return write_snapshot(path, records())
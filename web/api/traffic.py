@@ -0,0 +1,208 @@
+"""
+Recording of live API traffic to a compact, append-only log.
+
+Each request becomes one JSON array: arrival time, pseudonymous client,
+method, path, query, Flask endpoint, status, server time and the sanitized
+request body. For the few endpoints that hand out IDs (game and lobby ticket
+IDs) and for guesses, it also keeps the response fields the replayer needs to
+follow each game. Records are queued and written by a background thread. Each
+batch is written as one gzip member, so the file only ever grows by appending
+and a crash loses at most the batch being written.
+
+Sanitizing:
+  * player names and client addresses become keyed hashes ("p-…", "c-…").
+    The key is random per process, so pseudonyms are stable within one
+    recording but can't be linked across restarts or reversed by guessing.
+  * committed secrets are dropped. replay.py picks secrets that give the
+    same guess outcomes.
+  * privileged and scrape routes (metrics, debug, history export) and
+    long-lived event streams are not recorded.
+
+    TRAFFIC_LOG=/var/tmp/traffic.log.gz python app.py
+    python replay.py /var/tmp/traffic.log.gz --speed 10
+"""
+
+import atexit
+import gzip
+import hashlib
+import os
+import queue
+import secrets
+import tempfile
+import threading
+
+import serialization
+
+
+FORMAT = 'arcium-traffic'
+FORMAT_VERSION = 1
+FIELDS = ('ts', 'client', 'method', 'path', 'query', 'endpoint', 'status',
+          'duration_us', 'body', 'response')
+
+DEFAULT_TRAFFIC_PATH = os.path.join(tempfile.gettempdir(), 'arcium_traffic.log.gz')
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0    # seconds a partial batch may wait
+DEFAULT_MAX_BACKLOG = 100000    # records queued before new ones are dropped
+
+EXCLUDED_PREFIXES = ('/api/metrics', '/api/debug/', '/api/history/')
+EXCLUDED_ENDPOINTS = frozenset({'game_events', 'spectate'})
+
+# Response fields kept per endpoint: the IDs a replay has to map, whether a
+# guess found the secret, and the secret once it has been revealed (public by then)
+RESPONSE_FIELDS = {
+    'create_game': ('game_id',),
+    'join_lobby': ('ticket_id', 'game_id'),
+    'lobby_status': ('game_id',),
+    'make_guess': ('game_over', 'feedback'),
+    'reveal_game': ('secret_number',),
+}
+PSEUDONYMIZED_FIELDS = ('player', 'player1', 'player2')
+DROPPED_FIELDS = ('secret',)
+
+_STOP = object()
+
+
+class TrafficRecorder:
+    """Queues sanitized request records and appends them to `path` in batches."""
+
+    def __init__(self, path: str = DEFAULT_TRAFFIC_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_backlog: int = DEFAULT_MAX_BACKLOG):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._key = secrets.token_bytes(16)
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def wants(self, path: str, endpoint) -> bool:
+        """Whether a request to this path/endpoint is recorded at all."""
+        return endpoint not in EXCLUDED_ENDPOINTS and not path.startswith(EXCLUDED_PREFIXES)
+
+    def pseudonym(self, prefix: str, value) -> str:
+        digest = hashlib.blake2b(str(value).encode(), key=self._key, digest_size=6).hexdigest()
+        return f'{prefix}-{digest}'
+
+    def sanitize(self, body):
+        """Copy of a JSON request body with names hashed and secrets removed."""
+        if not isinstance(body, dict):
+            return None
+        clean = dict(body)
+        for field in PSEUDONYMIZED_FIELDS:
+            if isinstance(clean.get(field), str):
+                clean[field] = self.pseudonym('p', clean[field])
+        for field in DROPPED_FIELDS:
+            if field in clean:
+                clean[field] = None
+        return clean
+
+    def record(self, ts: float, client: str, method: str, path: str, query: str,
+               endpoint, status: int, duration_us: int, body, response=None) -> bool:
+        """
+        Queue one request without blocking; returns False if it was dropped.
+        `body` is the parsed JSON request body and `response` the parsed
+        response, only needed for endpoints in RESPONSE_FIELDS.
+        """
+        if self._thread is None:
+            self._start()
+        kept = None
+        if response is not None and endpoint in RESPONSE_FIELDS:
+            kept = {field: response[field] for field in RESPONSE_FIELDS[endpoint]
+                    if field in response} or None
+        row = [round(ts, 6), self.pseudonym('c', client), method, path, query or None,
+               endpoint, status, duration_us, self.sanitize(body), kept]
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='traffic-recorder', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._append([{'format': FORMAT, 'version': FORMAT_VERSION, 'fields': list(FIELDS)}])
+        stopping = False
+        while not stopping:
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            while row is not None:
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    row = None
+            if batch and self._append(batch):
+                self.written += len(batch)
+
+    def _append(self, rows: list) -> bool:
+        data = b''.join(serialization.dumps(row) + b'\n' for row in rows)
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(gzip.compress(data, 6))
+        except OSError:
+            self.errors += 1
+            self.dropped += len(rows)
+            return False
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        # Blocking put: the stop marker must not be dropped when the queue is full
+        self._queue.put(_STOP, timeout=timeout)
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'backlog': self.backlog
+        }
+
+
+def read_traffic(path: str):
+    """
+    Yield recorded requests as dicts, in file order. Recordings appended to
+    the same file are read one after another. A batch cut short by a crash
+    ends the read.
+    """
+    fields = FIELDS
+    with gzip.open(path, 'rb') as f:
+        try:
+            for line in f:
+                item = serialization.loads(line)
+                if isinstance(item, dict):
+                    if item.get('format') != FORMAT or item.get('version') != FORMAT_VERSION:
+                        raise ValueError(f"{path} is not a version {FORMAT_VERSION} traffic log")
+                    fields = tuple(item['fields'])
+                    continue
+                yield dict(zip(fields, item))
+        except (EOFError, gzip.BadGzipFile):
+            return
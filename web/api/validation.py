@@ -0,0 +1,194 @@
+"""
+Declarative request body validation for the game API.
+
+Each route declares a Schema at import time; compile() turns it into
+read(request), which returns the JSON object, and check(data), which
+loops over bound Field.accepts methods; parse(request) does both. Nothing
+is raised to reject a request. A request is screened in the cheapest
+order possible:
+
+  1. Content-Length against the schema's max_body, before anything is read,
+  2. the Content-Type, then one parse with the fast JSON backend,
+  3. each field's type, range, choices and length.
+
+A body without a Content-Length (chunked) is read only up to the app's
+MAX_CONTENT_LENGTH; set it to max_body_limit() of the app's schemas.
+
+A rejection returns a (status, body) pair encoded when the schema was
+compiled. Handlers get plain, already-checked values as keyword arguments
+and can skip their own type checks. The JSON object itself is left on
+flask.g as `json_body`, so later hooks don't parse the body again:
+
+    GUESS_BODY = Schema(Field('guess', int, error='Invalid guess'))
+
+    @app.route('/api/game/<game_id>/guess', methods=['POST'])
+    @validate_body(GUESS_BODY)
+    def make_guess(game_id, guess): ...
+"""
+
+import functools
+
+from flask import current_app, g, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import serialization
+
+
+DEFAULT_MAX_BODY = 1024         # bytes; real request bodies are well under 200
+MAX_STRING_LENGTH = 64
+
+_MISSING = object()
+
+
+class Field:
+    """One top-level JSON field: its type, default and allowed values."""
+
+    __slots__ = ('name', 'kind', 'default', 'min', 'max', 'choices', 'max_length', 'error',
+                 'dest')
+
+    def __init__(self, name: str, kind: type, default=_MISSING, min=None, max=None,
+                 choices=None, max_length: int = None, error: str = None, dest: str = None):
+        if kind not in (int, str):
+            raise TypeError(f"Unsupported field type {kind.__name__}")
+        self.name = name
+        self.dest = dest or name    # the view's keyword argument
+        self.kind = kind
+        self.default = default      # _MISSING means the field is required
+        self.min = min
+        self.max = max
+        self.choices = tuple(choices) if choices is not None else None
+        if kind is str and max_length is None:
+            max_length = MAX_STRING_LENGTH
+        self.max_length = max_length
+        self.error = error or self._describe()
+
+    def _describe(self) -> str:
+        if self.choices is not None:
+            return f"{self.name} must be one of: {', '.join(map(str, self.choices))}"
+        if self.kind is int:
+            if self.min is not None and self.max is not None:
+                return f"{self.name} must be an integer between {self.min} and {self.max}"
+            return f"{self.name} must be an integer"
+        return f"{self.name} must be a string of 1 to {self.max_length} characters"
+
+    def accepts(self, value) -> bool:
+        """True if a value the client sent is acceptable."""
+        # type() rather than isinstance(): True is an int, but not a guess
+        if type(value) is not self.kind:
+            return False
+        if self.choices is not None and value not in self.choices:
+            return False
+        if self.min is not None and value < self.min:
+            return False
+        if self.max is not None and value > self.max:
+            return False
+        return self.kind is not str or 0 < len(value) <= self.max_length
+
+
+class Schema:
+    """The fields of one request body. compile() once, then call parse(request)."""
+
+    def __init__(self, *fields: Field, max_body: int = DEFAULT_MAX_BODY):
+        self.fields = fields
+        self.max_body = max_body
+        self.read = None
+        self.check = None
+        self.parse = None
+
+    def compile(self) -> 'Schema':
+        """
+        Build read(request) -> the JSON object, check(data) -> the checked
+        values by dest, and parse(request) doing both; each returns a
+        (status, body) pair instead for a rejection.
+        """
+        max_body = self.max_body
+        loads = serialization.backend.loads
+        too_large = (413, _error_body(f'Request body is larger than {max_body} bytes'))
+        media_type = (400, _error_body('Content-Type must be application/json'))
+        malformed = (400, _error_body('Malformed JSON body'))
+        not_an_object = (400, _error_body('Request body must be a JSON object'))
+        checks = tuple((field.name, field.dest, field.default, field.accepts,
+                        (400, _error_body(field.error))) for field in self.fields)
+
+        def read(request):
+            # Straight from the environ: request.content_length parses the headers again
+            try:
+                if int(request.environ.get('CONTENT_LENGTH') or 0) > max_body:
+                    return too_large
+            except ValueError:
+                pass    # werkzeug treats a malformed length as no body
+            try:
+                body = request.get_data()
+            except RequestEntityTooLarge:
+                return too_large
+            if not body:
+                return {}
+            if len(body) > max_body:    # chunked: no Content-Length to go by
+                return too_large
+            if not request.is_json:
+                return media_type
+            try:
+                data = loads(body)
+            except ValueError:
+                return malformed
+            return data if type(data) is dict else not_an_object
+
+        def check(data):
+            values = {}
+            for name, dest, default, accepts, reject in checks:
+                value = data.get(name, default)
+                if value is _MISSING:
+                    return reject
+                # The default is trusted as is; only values the client sent are checked
+                if value is not default and not accepts(value):
+                    return reject
+                values[dest] = value
+            return values
+
+        def parse(request):
+            data = read(request)
+            return data if type(data) is tuple else check(data)
+
+        self.read, self.check, self.parse = read, check, parse
+        return self
+
+
+def max_body_limit(*schemas: Schema) -> int:
+    """
+    A MAX_CONTENT_LENGTH for an app whose bodies are all checked by these
+    schemas: one byte over the largest max_body, so a chunked body that is
+    too large is still seen to be too large.
+    """
+    return max(schema.max_body for schema in schemas) + 1
+
+
+def _error_body(message: str) -> bytes:
+    """The bytes jsonify() would send for this error."""
+    return serialization.backend.dumps_compact({'success': False, 'error': message}) + b'\n'
+
+
+def validate_body(schema: Schema):
+    """
+    Route decorator: check the JSON body against `schema` and pass its
+    fields to the view as keyword arguments.
+    """
+    if schema.parse is None:
+        schema.compile()
+    read, check = schema.read, schema.check
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Unwrap the proxy once instead of on every attribute read() looks at
+            outcome = read(request._get_current_object())
+            if type(outcome) is not tuple:
+                g.json_body = outcome
+                outcome = check(outcome)
+            if type(outcome) is tuple:
+                status, body = outcome
+                return current_app.response_class(body, status=status,
+                                                  mimetype='application/json')
+            kwargs.update(outcome)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,5 +1,13 @@
 """WSGI entry point for Vercel serverless deployment"""
-from app import app
+from app import app, computer_commitments
+import encryption
+
+# Warm up the crypto stack off the request path: health and concepts
+# requests never wait for it, and game requests usually find it ready.
+encryption.preload()
+
+# Start filling the computer's commitment pool in the background too
+computer_commitments.start()
 
 if __name__ == '__main__':
     app.run()
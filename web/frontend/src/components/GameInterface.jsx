@@ -32,9 +32,16 @@ export default function GameInterface() {
       if (data.success) {
         setGameId(data.game_id);
         setMode(selectedMode);
-        setGameState(selectedMode === 'single' ? 'commitment' : 'commitment');
         setGuesses([]);
-        setFeedback('');
+        if (data.commitment_hash) {
+          // Single player: the computer has already committed its secret
+          setCommitmentHash(data.commitment_hash);
+          setGameState('guessing');
+          setFeedback('🤖 Computer committed to a secret number!');
+        } else {
+          setGameState('commitment');
+          setFeedback('');
+        }
       }
     } catch (error) {
       console.error('Error creating game:', error);